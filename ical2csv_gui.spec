@@ -4,10 +4,10 @@ block_cipher = None
 
 
 a = Analysis(['src\\ical2csv_gui.py'],
-             pathex=['C:\\Users\\christian\\Documents\\libreoffice-ical-importer'],
+             pathex=['C:\\Users\\christian\\Documents\\libreoffice-ical-importer', 'src\\pythonpath'],
              binaries=[],
              datas=[('C:\\Users\\christian\\AppData\\Local\\Programs\\Python\\Python38-32\\Lib\\site-packages\\ics\\grammar\\contentline.ebnf', 'ics\\grammar\\')],
-             hiddenimports=[],
+             hiddenimports=['icalreader.fastparser', 'icalreader.icsparser'],
              hookspath=[],
              runtime_hooks=[],
              excludes=[],
@@ -0,0 +1,193 @@
+#! /usr/bin/env python3
+
+#
+# Measurements of the resources used for reading iCalendar files, which help
+# to compare the backends and the representations of events.
+#
+
+import gc
+import os
+import sys
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+
+import click
+
+# the iCalendar reader is shared with the LibreOffice extension
+sys.path.append(str(Path(__file__).resolve().parent / 'pythonpath'))
+from icalreader import ATTRIBUTES, AUTO, BACKEND_NAMES, CALENDAR, available_backends, get_backend
+
+
+def retained_memory(function):
+    """Calls a function and returns its result together with the number of
+    bytes allocated by it that are still in use afterwards."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def value_sizes(records, names):
+    """Returns the bytes of the values of every attribute of the records.
+
+    Objects shared by multiple records (e.g. timezones, empty tuples or the
+    same string) are only counted once."""
+    seen = set()
+    sizes = dict.fromkeys(names, 0)
+
+    def add(name, value):
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        sizes[name] += sys.getsizeof(value)
+        if isinstance(value, tuple):
+            for v in value:
+                add(name, v)
+
+    for record in records:
+        for name in names:
+            add(name, getattr(record, name))
+    return sizes
+
+
+def read_ics_events(filename):
+    """Returns the events of a calendar as objects of the ics library."""
+    import ics
+    with open(filename, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return retained_memory(lambda: list(ics.Calendar(text).events))
+
+
+def write_repetitive_calendar(filename, events, rooms):
+    """Writes a calendar of room bookings, whose locations, organizers,
+    status, classification and categories repeat across the events."""
+    begin = datetime(2024, 1, 1, 8)
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        f.write('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//benchmark//EN\r\n')
+        for i in range(events):
+            room = i % rooms
+            start = begin + timedelta(days=i // (rooms * 8), hours=i // rooms % 8)
+            f.write('BEGIN:VEVENT\r\n'
+                    'UID:booking-{i}@example.org\r\n'
+                    'DTSTAMP:20231201T120000Z\r\n'
+                    'DTSTART:{start:%Y%m%dT%H%M%S}\r\n'
+                    'DTEND:{end:%Y%m%dT%H%M%S}\r\n'
+                    'SUMMARY:Booking {i}\r\n'
+                    'LOCATION:Building {building}\\, Room {room:03d}\r\n'
+                    'ORGANIZER:mailto:room-{room:03d}@example.org\r\n'
+                    'STATUS:{status}\r\n'
+                    'CLASS:{classification}\r\n'
+                    'CATEGORIES:{categories}\r\n'
+                    'END:VEVENT\r\n'.format(
+                        i=i, start=start, end=start + timedelta(minutes=45), building=room // 10 + 1, room=room,
+                        status=('CONFIRMED', 'TENTATIVE', 'CANCELLED')[i % 7 % 3],
+                        classification=('PUBLIC', 'PRIVATE')[i % 5 == 0],
+                        categories=('Meeting,Internal', 'Workshop', 'Meeting,External')[i % 3]))
+        f.write('END:VCALENDAR\r\n')
+
+
+def peak_rss(icalendar_file, backend, interned):
+    """Reads all events of a calendar into a list in a new process and
+    returns the peak resident set size of that process in KiB before and
+    after reading."""
+    command = [sys.executable, __file__, 'read-all', '--backend', backend, icalendar_file]
+    if not interned:
+        command.append('--not-interned')
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    before, after = output.split()
+    return int(before), int(after)
+
+
+@click.group()
+def benchmark():
+    """Measures the resources used for reading iCalendar files."""
+
+
+@benchmark.command()
+@click.option('--fields', is_flag=True, default=False,
+              help='Shows the bytes per event of every attribute as well.')
+@click.option('--ics-events', is_flag=True, default=False,
+              help='Compares with the full Event objects of the ics library (slow).')
+@click.argument('icalendar_file', type=click.Path(exists=True, dir_okay=False))
+def records(fields, ics_events, icalendar_file):
+    """Measures the memory held by the event records of a calendar file.
+
+    All events are read into a list with every available backend and the
+    memory still allocated afterwards is reported per event. The list itself
+    is included, which adds 8 bytes per event."""
+    click.echo('{:<12} {:>8} {:>12}'.format('backend', 'events', 'bytes/event'))
+    for backend in available_backends():
+        # modules and caches of the backend are loaded before measuring
+        list(islice(backend.read_events(icalendar_file), 1))
+        events, size = retained_memory(lambda: list(backend.read_events(icalendar_file)))
+        click.echo('{:<12} {:>8} {:>12.0f}'.format(backend.name, len(events), size / max(len(events), 1)))
+        if fields:
+            for name, field_size in value_sizes(events, ATTRIBUTES + [CALENDAR]).items():
+                click.echo('  {:<18} {:>20.0f}'.format(name, field_size / max(len(events), 1)))
+            record_size = sum(sys.getsizeof(e) for e in events)
+            click.echo('  {:<18} {:>20.0f}'.format('(record)', record_size / max(len(events), 1)))
+        del events
+    if ics_events:
+        events, size = read_ics_events(icalendar_file)
+        click.echo('{:<12} {:>8} {:>12.0f}'.format('ics.Event', len(events), size / max(len(events), 1)))
+
+
+@benchmark.command()
+@click.option('--backend', type=click.Choice([AUTO] + BACKEND_NAMES), default=AUTO, show_default=True,
+              help='Parser backend used for reading the events.')
+@click.option('--events', type=click.IntRange(min=1), default=50000, show_default=True,
+              help='Number of events of the generated calendar.')
+@click.option('--rooms', type=click.IntRange(min=1), default=30, show_default=True,
+              help='Number of distinct locations and organizers of the generated calendar.')
+@click.argument('icalendar_file', type=click.Path(exists=True, dir_okay=False), required=False)
+def rss(backend, events, rooms, icalendar_file):
+    """Measures the peak memory of reading all events of a calendar with and
+    without sharing repeated values (see icalreader.interning).
+
+    Without a calendar file, a calendar of room bookings is generated, whose
+    locations, organizers, status, classification and categories repeat. The
+    peak resident set size is measured in a new process for each variant, the
+    memory used by the interpreter and the loaded modules is subtracted."""
+    backend = get_backend(backend).name
+    with tempfile.TemporaryDirectory(prefix='benchmark_') as directory:
+        if icalendar_file is None:
+            icalendar_file = os.path.join(directory, 'rooms.ics')
+            write_repetitive_calendar(icalendar_file, events, rooms)
+        peaks = {}
+        for interned in (False, True):
+            before, after = peak_rss(icalendar_file, backend, interned)
+            peaks[interned] = after - before
+    click.echo('{:<12} {:>14} {:>14}'.format('values', 'peak RSS KiB', 'reduction'))
+    click.echo('{:<12} {:>14}'.format('copied', peaks[False]))
+    click.echo('{:<12} {:>14} {:>13.0%}'.format('shared', peaks[True], 1 - peaks[True] / max(peaks[False], 1)))
+
+
+@benchmark.command('read-all', hidden=True)
+@click.option('--backend', default=AUTO)
+@click.option('--not-interned', is_flag=True, default=False)
+@click.argument('icalendar_file')
+def read_all(backend, not_interned, icalendar_file):
+    """Reads all events into a list and prints the peak resident set size
+    in KiB before and after reading (used by the command rss)."""
+    import resource
+    backend = get_backend(backend)
+    # modules of the backend are loaded before measuring
+    list(islice(backend.read_events(icalendar_file), 1))
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    events = list(backend.read_events(icalendar_file, interned=not not_interned))
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    click.echo('{} {}'.format(before, after))
+    del events
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,327 @@
+#! /usr/bin/env python3
+
+#
+# Batch conversion of iCalendar files into spreadsheet files with a headless
+# LibreOffice. This script has to be run by the Python interpreter of
+# LibreOffice (or any Python with access to the uno module).
+#
+
+import os
+import sys
+import time
+import queue
+import shutil
+import logging
+import logging.handlers
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+import click
+
+# the iCalendar reader and the importer are shared with the LibreOffice extension
+sys.path.append(str(Path(__file__).resolve().parent / 'pythonpath'))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import uno
+from com.sun.star.beans import PropertyValue
+from com.sun.star.connection import NoConnectException
+from com.sun.star.uno import Exception as UnoException, RuntimeException
+
+from icalreader import DateRange, ParseError
+from import_ical import IcalImporter
+
+
+logger = logging.getLogger('convert_ods')
+
+LOG_FILENAME = 'convert_ods.log'
+
+# filters for storing the converted documents
+FILTERS = {
+    'ods': 'calc8',
+    'xlsx': 'Calc MS Excel 2007 XML',
+}
+
+# seconds to wait for a newly started office to accept connections
+STARTUP_TIMEOUT = 60
+
+
+def properties(**values):
+    """Returns a tuple of PropertyValue structs for UNO calls."""
+    result = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        result.append(prop)
+    return tuple(result)
+
+
+class OfficeConnection:
+    """A connection to a LibreOffice process, which is kept for many conversions.
+
+    Without a program, the connection is made to an office that is already
+    listening on the given port. Otherwise a headless office is started with
+    its own user profile and started again whenever it has crashed."""
+
+    def __init__(self, host='localhost', port=2002, program=None):
+        self.host = host
+        self.port = port
+        self.program = program
+        self.process = None
+        self.profile = None
+        self.ctx = None
+        self.desktop = None
+
+    def __repr__(self):
+        return '<OfficeConnection {}:{}>'.format(self.host, self.port)
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def url(self):
+        return 'socket,host={},port={};urp;StarOffice.ComponentContext'.format(self.host, self.port)
+
+    def start(self):
+        """Starts a headless office listening on the port of this connection."""
+        if self.profile is None:
+            # every office process needs its own user profile
+            self.profile = tempfile.mkdtemp(prefix='convert_ods_profile_')
+        logger.info('Starting office {} on port {}...'.format(self.program, self.port))
+        self.process = subprocess.Popen([
+            self.program, '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+            '--accept={}'.format(self.url),
+            '-env:UserInstallation={}'.format(uno.systemPathToFileUrl(self.profile)),
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def connect(self):
+        """Connects to the office, after starting it if necessary."""
+        if self.program is not None and (self.process is None or self.process.poll() is not None):
+            self.start()
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                self.ctx = resolver.resolve('uno:' + self.url)
+                break
+            except NoConnectException:
+                if time.monotonic() > deadline or (self.process is not None and self.process.poll() is not None):
+                    raise
+                # wait until the office accepts connections
+                time.sleep(0.25)
+        self.desktop = self.ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', self.ctx)
+        logger.debug('Connected to office at {}.'.format(self.url))
+
+    def is_alive(self):
+        """Checks whether the office still answers over the connection."""
+        if self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()
+            return True
+        except RuntimeException:
+            return False
+
+    def reconnect(self):
+        """Connects again after the office has crashed or closed the connection."""
+        logger.warning('Connection to office at {} lost, reconnecting...'.format(self.url))
+        self.ctx = self.desktop = None
+        if self.process is not None and self.process.poll() is None:
+            # the process hangs, so it is replaced by a new one
+            self.process.kill()
+            self.process.wait()
+        self.connect()
+
+    def close(self):
+        """Terminates a started office and removes its profile."""
+        if self.process is not None:
+            try:
+                if self.desktop is not None:
+                    self.desktop.terminate()
+            except RuntimeException:
+                pass
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        self.ctx = self.desktop = None
+        if self.profile is not None:
+            shutil.rmtree(self.profile, ignore_errors=True)
+            self.profile = None
+
+
+def convert(connection, icalendar_file, output_file, file_format, date_range=None):
+    """Converts a single iCalendar file into a spreadsheet file."""
+    doc = connection.desktop.loadComponentFromURL('private:factory/scalc', '_blank', 0,
+                                                  properties(Hidden=True))
+    try:
+        importer = IcalImporter(connection.ctx, interactive=False)
+        importer.fill_table(connection.ctx, icalendar_file, date_range, doc=doc)
+        doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output_file)),
+                       properties(FilterName=FILTERS[file_format], Overwrite=True))
+    finally:
+        try:
+            doc.close(True)
+        except RuntimeException:
+            # the office might have crashed during the conversion
+            pass
+
+
+def work(connection, jobs, file_format, date_range, retries, failed):
+    """Converts the files of the job queue until it is empty."""
+    while True:
+        try:
+            icalendar_file, output_file = jobs.get_nowait()
+        except queue.Empty:
+            return
+        for attempt in range(retries + 1):
+            try:
+                started = time.perf_counter()
+                convert(connection, icalendar_file, output_file, file_format, date_range)
+                logger.info('Converted {} into {} in {:.1f} s.'.format(icalendar_file, output_file,
+                                                                       time.perf_counter() - started))
+                break
+            except (UnicodeDecodeError, ParseError) as e:
+                logger.error('iCalendar file {} not valid: {}'.format(icalendar_file, e))
+                failed.append(icalendar_file)
+                break
+            except RuntimeException as e:
+                logger.error('Office error while converting {}: {}'.format(icalendar_file, e))
+                if connection.is_alive():
+                    failed.append(icalendar_file)
+                    break
+                try:
+                    connection.reconnect()
+                except (NoConnectException, OSError) as e:
+                    # the files left in the queue are converted by the other offices
+                    logger.error('Office could not be restarted: {}'.format(e))
+                    failed.append(icalendar_file)
+                    return
+            except (UnoException, Exception) as e:
+                # checked UNO exceptions like IOException of storeToURL are no RuntimeException
+                logger.error('Error while converting {}: {}'.format(icalendar_file, e))
+                failed.append(icalendar_file)
+                break
+        else:
+            failed.append(icalendar_file)
+
+
+def drain(jobs):
+    """Removes all files left in the job queue and returns their names."""
+    files = []
+    while True:
+        try:
+            icalendar_file, _output_file = jobs.get_nowait()
+        except queue.Empty:
+            return files
+        files.append(icalendar_file)
+
+
+def validate_connect(ctx, param, value):
+    """Splits HOST:PORT of a running office, the port is optional."""
+    if value is None:
+        return None
+    host, colon, port = value.rpartition(':')
+    if not colon:
+        return value, None
+    try:
+        return host or 'localhost', int(port)
+    except ValueError:
+        raise click.BadParameter('{} is not a valid port.'.format(port))
+
+
+@click.command()
+@click.option('--verbose', '-v', is_flag=True, help='Enables verbose mode.', default=False)
+@click.option('--format', 'file_format', type=click.Choice(list(FILTERS)), default='ods', show_default=True,
+              help='Format of the created spreadsheet files.')
+@click.option('--output-dir', type=click.Path(file_okay=False, writable=True), default=None,
+              help='Directory for the created files. [default: directory of each iCalendar file]')
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only convert events ending on or after this date (YYYY-MM-DD).')
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only convert events starting on or before this date (YYYY-MM-DD).')
+@click.option('--soffice', default='soffice', show_default=True,
+              help='Office program that is started headless for the conversions.')
+@click.option('--connect', 'connect', default=None, metavar='HOST[:PORT]', callback=validate_connect,
+              help='Uses an already running office listening on HOST:PORT instead of starting one. '
+                   'Without a port, the one given by --port is used.')
+@click.option('--port', type=int, default=2002, show_default=True,
+              help='First port used by the started offices.')
+@click.option('--offices', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of offices started to convert files in parallel.')
+@click.option('--retries', type=click.IntRange(min=0), default=2, show_default=True,
+              help='Number of times a file is converted again after the office has crashed.')
+@click.argument('icalendar_files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def convert_ods(verbose, file_format, output_dir, date_from, date_to, soffice, connect, port, offices,
+                retries, icalendar_files):
+    """Converts iCalendar files into ODS or XLSX files with a headless LibreOffice.
+
+    The offices are started once and reused for all files."""
+    try:
+        date_range = DateRange(date_from, date_to)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if output_dir:
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError as e:
+            raise click.BadParameter(str(e), param_hint='--output-dir')
+    if connect:
+        host, connect_port = connect
+        connections = [OfficeConnection(host, port if connect_port is None else connect_port)]
+    else:
+        connections = [OfficeConnection('localhost', port + i, soffice) for i in range(offices)]
+    jobs = queue.Queue()
+    for icalendar_file in icalendar_files:
+        directory = output_dir or os.path.dirname(icalendar_file)
+        output_file = os.path.join(directory, '{}.{}'.format(Path(icalendar_file).stem, file_format))
+        jobs.put((icalendar_file, output_file))
+    failed = []
+    started = time.perf_counter()
+    threads = []
+    try:
+        for connection in connections:
+            connection.connect()
+            thread = threading.Thread(target=work, args=(connection, jobs, file_format, date_range, retries,
+                                                         failed))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+    finally:
+        for connection in connections:
+            connection.close()
+    # files are left in the queue if no office could be restarted
+    failed.extend(drain(jobs))
+    logger.info('Converted {} of {} files in {:.1f} s.'.format(len(icalendar_files) - len(failed),
+                                                              len(icalendar_files),
+                                                              time.perf_counter() - started))
+    if failed:
+        sys.exit(1)
+
+
+def create_logger():
+    # create logger for this application
+    global logger
+    logger.setLevel(logging.DEBUG)
+    log_to_file = logging.handlers.RotatingFileHandler(LOG_FILENAME, maxBytes=262144,
+                                                       backupCount=5, encoding='utf-8')
+    log_to_file.setLevel(logging.DEBUG)
+    logger.addHandler(log_to_file)
+    log_to_screen = logging.StreamHandler(sys.stdout)
+    log_to_screen.setLevel(logging.INFO)
+    logger.addHandler(log_to_screen)
+
+if __name__ == '__main__':
+    create_logger()
+    convert_ods()
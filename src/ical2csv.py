@@ -4,12 +4,16 @@ import sys
 import csv
 import logging
 import logging.handlers
+from pathlib import Path
 
 import click
-from arrow.arrow import Arrow
-from datetime import timedelta
-from ics import Calendar
-from ics.grammar.parse import ParseError
+from datetime import datetime, timedelta
+
+# the iCalendar reader is shared with the LibreOffice extension
+sys.path.append(str(Path(__file__).resolve().parent / 'pythonpath'))
+from icalreader import (ATTRIBUTES, AUTO, BACKEND_NAMES, CALENDAR, DateRange, EncodedValues, EventTable,
+                        MappedCalendar, ParseError, RecordCache, check_columns, count_calendars, default_jobs,
+                        get_backend, open_indexed, read_events_parallel)
 
 
 logger = logging.getLogger('ical2csv')
@@ -17,61 +21,214 @@ logger = logging.getLogger('ical2csv')
 LOG_FILENAME = 'ical2csv.log'
 
 
-def read_ical_file(filename):
-    """Reads an iCalendar file and returns all events from that file."""
-    logger.info('Reading iCalendar file...')
-    with open(filename, 'r') as calendar_file:
-        c = Calendar(calendar_file.read())
+def read_ical_file(filename, backend=AUTO, columns=None, date_range=None, mapped=False, indexed=False,
+                   jobs=1, cache=None):
+    """Reads an iCalendar file and yields all events from that file.
+
+    Events are read one at a time, so that the whole file never has to be
+    kept in memory. If columns are given, only these attributes are decoded.
+    If a date range is given, only events within that range are yielded.
+    With mapped set, the file is memory mapped and indexed before reading.
+    With indexed set, the index is additionally stored in a file and reused
+    by later runs as long as the iCalendar file does not change. With more
+    than one job, the events are parsed by multiple processes, which implies
+    mapped. If a record cache is given, the events are read from the cache
+    if the file has been read with the same backend and options before.
+    Otherwise they are stored in the cache while being read."""
+    events = iter_ical_file(filename, get_backend(backend), columns, date_range, mapped, indexed, jobs, cache,
+                            count=False)
+    next(events)
+    yield from events
+
+def open_ical_file(filename, backend=AUTO, columns=None, date_range=None, mapped=False, indexed=False,
+                   jobs=1, cache=None):
+    """Starts reading an iCalendar file like read_ical_file.
+
+    Returns the number of calendars in the file and an iterator over its
+    events. The number is taken from the record cache, the index or the
+    mapped file, only a file that is read as a stream is scanned for it."""
+    events = iter_ical_file(filename, get_backend(backend), columns, date_range, mapped, indexed, jobs, cache,
+                            count=True)
+    return next(events), events
+
+def iter_ical_file(filename, backend, columns, date_range, mapped, indexed, jobs, cache, count):
+    """Yields the number of calendars in an iCalendar file followed by its events.
+
+    The number is None if count is not set and it is not known anyway."""
+    if cache is not None:
+        key = cache.key(filename, backend, columns, date_range)
+        cached = cache.load(key)
+        if cached is not None:
+            calendars, records = cached
+            logger.info('Reading events from cache {}...'.format(cache.path(key)))
+            yield calendars
+            yield from records
+            logger.info('iCalendar file read.')
+            return
+        # the cache entry needs the number of calendars for later runs
+        events = parse_ical_file(filename, backend, columns, date_range, mapped, indexed, jobs, count=True)
+        calendars = next(events)
+        yield calendars
+        yield from cache.store(key, events, columns, calendars)
+    else:
+        yield from parse_ical_file(filename, backend, columns, date_range, mapped, indexed, jobs, count)
+
+def parse_ical_file(filename, backend, columns, date_range, mapped, indexed, jobs, count):
+    """Parses an iCalendar file with the given backend and yields the number
+    of its calendars followed by all events (see iter_ical_file)."""
+    logger.info('Reading iCalendar file with backend {}...'.format(backend.name))
+    if indexed:
+        calendar, index = open_indexed(filename)
+        with calendar:
+            yield calendar.calendar_count
+            events = index.select(date_range)
+            logger.info('Index of iCalendar file selects {} of {} events.'.format(len(events), len(index)))
+            if jobs > 1:
+                yield from read_events_parallel(calendar, jobs, backend.name, events, columns=columns)
+            else:
+                yield from backend.read_components(calendar.iter_components(events), columns=columns)
+    elif mapped or jobs > 1:
+        with MappedCalendar(filename) as calendar:
+            yield calendar.calendar_count
+            logger.info('iCalendar file contains {} events.'.format(len(calendar)))
+            if jobs > 1:
+                logger.info('Parsing events with {} processes...'.format(jobs))
+                yield from read_events_parallel(calendar, jobs, backend.name, columns=columns,
+                                                date_range=date_range)
+            else:
+                yield from backend.read_components(calendar.iter_components(), columns=columns,
+                                                   date_range=date_range)
+    else:
+        # only the calendars are looked for, their components are left to the parser
+        yield count_calendars(filename) if count else None
+        with open(filename, 'r', encoding='utf-8') as calendar_file:
+            yield from backend.read_events(calendar_file, columns=columns, date_range=date_range)
     logger.info('iCalendar file read.')
-    return c.events
 
-def write_csv_file(events, filename):
-    attr = ['name', 'begin', 'end', 'duration', 'uid', 'description', 'created',
-            'last_modified', 'location', 'url', 'transparent', 'alarms',
-            'attendees', 'categories', 'status', 'organizer', 'classification']
+def write_csv_file(events, filename, columns=ATTRIBUTES):
+    attr = columns
+    # repeated values like locations are marshalled only once
+    encoded = EncodedValues(marshal_data)
     logger.info('Writing CSV file...')
     with open(filename, 'w', newline='') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=attr)
         writer.writeheader()
         # iterate over all events and add data to table
         for event in events:
-            writer.writerow( { k: marshal_data(getattr(event, k)) for k in attr } )
+            writer.writerow( { k: encoded.get(k, getattr(event, k)) for k in attr } )
+    logger.info('CSV file written.')
+
+def write_csv_table(table, filename, columns=ATTRIBUTES):
+    """Writes an event table into a CSV file, marshalling every distinct value only once."""
+    logger.info('Writing CSV file...')
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        writer.writerows(zip(*[table.map_column(k, marshal_data) for k in columns]))
     logger.info('CSV file written.')
 
 def marshal_data(data):
     """Marshals the data for export into a CSV file."""
-    if not data:
+    if type(data) == int:
+        return str(data)
+    elif not data:
         return ''
     elif type(data) == str:
         return data
-    elif type(data) == Arrow:
-        return data.format('DD.MM.YYYY HH:mm:ss')
+    elif type(data) == datetime:
+        return data.strftime('%d.%m.%Y %H:%M:%S')
     elif type(data) == timedelta:
         return str(data)
-    elif type(data) == set:
-        return ', '.join([x for x in data])
+    elif type(data) == bool:
+        return str(data)
+    elif type(data) == tuple:
+        return ', '.join([marshal_data(x) for x in data])
     else:
         logger.error('Unsupported type: {}'.format(type(data)))
         raise ValueError()
 
+def validate_backend(ctx, param, value):
+    """Checks whether the chosen backend can be used with the installed packages."""
+    try:
+        get_backend(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
+def validate_columns(ctx, param, value):
+    """Splits the comma separated list of columns and checks the column names."""
+    if value is None:
+        return None
+    try:
+        return check_columns([c.strip() for c in value.split(',') if c.strip()])
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
 @click.command()
 @click.option('--verbose', '-v', is_flag=True, help='Enables verbose mode.', default=False)
+@click.option('--backend', type=click.Choice([AUTO] + BACKEND_NAMES), default=AUTO, show_default=True,
+              callback=validate_backend, help='Parser backend, auto chooses the fastest one that is installed.')
+@click.option('--columns', callback=validate_columns, default=None,
+              help='Comma separated list of columns to export, e.g. name,begin,end,duration. '
+                   'Properties of other columns are not decoded at all. [default: all columns]')
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only export events ending on or after this date (YYYY-MM-DD).')
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only export events starting on or before this date (YYYY-MM-DD).')
+@click.option('--mmap', 'mapped', is_flag=True, default=False,
+              help='Memory maps the file and indexes all events before reading them.')
+@click.option('--index', 'indexed', is_flag=True, default=False,
+              help='Like --mmap, but stores the index in a file next to the iCalendar file (or in the '
+                   'cache directory) and reuses it as long as the iCalendar file is unchanged.')
+@click.option('--jobs', '-j', type=click.IntRange(min=0), default=1, show_default=True,
+              help='Number of processes parsing the events, 0 uses all CPU cores.')
+@click.option('--sort', is_flag=True, default=False,
+              help='Sorts the events by their begin instead of keeping the order of the file.')
+@click.option('--no-cache', 'no_cache', is_flag=True, default=False,
+              help='Neither reads events from the cache nor stores them in it.')
+@click.option('--cache-dir', type=click.Path(file_okay=False, writable=True), default=None,
+              help='Directory for cached events. [default: ~/.cache/icalreader/records]')
+@click.option('--cache-size', type=click.IntRange(min=0), default=256, show_default=True,
+              help='Maximum size of the cache directory in MiB, least recently used events are '
+                   'removed first.')
 @click.argument('iCalendar_file', type=click.Path(exists=True)) # iCalendar file that should be converted into CSV format
 @click.argument('CSV_file', type=click.Path(exists=False, writable=True), default=None, required=False) # CSV file that should be created. If no value was given, the file extension .csv will be added to the iCalendar file.
 @click.version_option('0.1')
-def convert_ical_file(verbose, icalendar_file, csv_file):
+def convert_ical_file(verbose, backend, columns, date_from, date_to, mapped, indexed, jobs, sort,
+                      no_cache, cache_dir, cache_size, icalendar_file, csv_file):
     """Simple tool to convert an iCalendar file into a CSV file to be used in LibreOffice Calc."""
+    try:
+        date_range = DateRange(date_from, date_to)
+    except ValueError as e:
+        raise click.UsageError(str(e))
     try:
         if csv_file == None:
             csv_file = '{}.csv'.format(icalendar_file)
             logger.info('Writing to CSV file: {}'.format(csv_file))
-        write_csv_file(read_ical_file(icalendar_file), csv_file)
+        if columns is None:
+            columns = ATTRIBUTES
+        if jobs == 0:
+            jobs = default_jobs()
+        cache = None if no_cache else RecordCache(cache_dir, cache_size * 1024 * 1024)
+        # the begin is needed for sorting even if it is not exported
+        decoded = columns if not sort or 'begin' in columns else columns + ['begin']
+        calendars, events = open_ical_file(icalendar_file, backend, decoded, date_range, mapped, indexed,
+                                           jobs, cache)
+        # events of concatenated calendars are told apart by the index of their calendar
+        if calendars > 1:
+            logger.info('iCalendar file contains {} calendars.'.format(calendars))
+            exported = columns + [CALENDAR]
+        else:
+            exported = columns
+        if sort:
+            # all events are kept column by column, which takes far less memory than records
+            table = EventTable.build(events, decoded)
+            write_csv_table(table.sorted(), csv_file, exported)
+        else:
+            write_csv_file(events, csv_file, exported)
     except UnicodeDecodeError as e:
         logger.error('Error while reading file.')
         logger.error(e)
-    except NotImplementedError as e:
-        logger.error('iCalendar file contains multiple calendars. This is currently not supported.')
-        logger.error(e)
     except ParseError as e:
         logger.error('iCalendar file not valid.')
         logger.error(e)
@@ -8,15 +8,28 @@
 # Source: https://forum.openoffice.org/en/forum/viewtopic.php?f=45&t=69540
 #
 
+import os
+import csv
 import sys
+import time
+import queue
+import shutil
+import tempfile
 import logging
+import threading
 import gettext
 from pathlib import Path
-from datetime import timedelta
+from functools import partial
+from collections import Counter
+from contextlib import ExitStack, closing, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-from arrow.arrow import Arrow
-from ics import Calendar
-from ics.grammar.parse import ParseError
+from icalreader import (ATTRIBUTES, CALENDAR, DateRange, EncodedValues, EventIndex, InterpreterContext,
+                        MappedCalendar, ParseError, UpdatePlan, default_jobs, get_backend, read_files_parallel,
+                        serial_date, serial_dates, serial_duration, serial_durations)
+from icalreader.contentline import parse_datetime
+from icalreader.shards import MAX_ROWS, ROWS, Sharding
 
 import uno
 import msgbox
@@ -26,18 +39,70 @@ from com.sun.star.util import Time
 from com.sun.star.lang import Locale
 from com.sun.star.uno import RuntimeException
 from com.sun.star.task import XJobExecutor
+from com.sun.star.awt import XActionListener
+from com.sun.star.sheet.SheetLinkMode import NONE as LINK_NONE, VALUE as LINK_VALUE
 from com.sun.star.ui.dialogs.TemplateDescription import FILEOPEN_SIMPLE
 
 
+# number of rows written into the worksheet with a single UNO call
+DEFAULT_BLOCK_SIZE = 1000
+
+# number of marshalled blocks the parsing thread may read ahead of the writes
+QUEUE_DEPTH = 4
+
+# ways of getting the rows into the worksheet (see CellWriter and CsvWriter)
+CELL_WRITER = 'cells'
+CSV_WRITER = 'csv'
+
+# ways of setting the column widths: estimated from the texts (see ColumnWidths) or measured by Calc
+ESTIMATED_WIDTHS = 'estimate'
+OPTIMAL_WIDTHS = 'optimal'
+
+# columns with points in time and durations, which are written as serial numbers
+DATETIME_COLUMNS = ('begin', 'end', 'created', 'last_modified')
+DURATION_COLUMNS = ('duration',)
+
+# number format of every column with serial numbers, the format codes are given for FORMAT_LOCALE
+COLUMN_FORMATS = {
+    'begin': 'DD.MM.YYYY HH:MM:SS',
+    'end': 'DD.MM.YYYY HH:MM:SS',
+    'created': 'DD.MM.YYYY HH:MM:SS',
+    'last_modified': 'DD.MM.YYYY HH:MM:SS',
+    'duration': '[HH]:MM:SS',
+}
+
+# locale of the format codes, which does not depend on the locale of the office
+FORMAT_LOCALE = ('en', 'US')
+
+# additional column with the name of the file of every event, when multiple files are combined
+SOURCE_COLUMN = 'source'
+
+# characters that are not allowed in the names of worksheets
+INVALID_SHEET_CHARACTERS = str.maketrans({c: '_' for c in '[]*?:/\\'})
+
+
 class IcalImporter(unohelper.Base, XJobExecutor):
     """Handles a click on the menu item for importing an iCalendar file.
 
     After the click on the menu item, a file picker dialog is shown for the
-    user to choose the file that should be imported. Only the file extension
-    .ics is supported and only one file is imported!"""
+    user to choose the files that should be imported. Only the file extension
+    .ics is supported. Multiple files are imported into a sheet per file or,
+    if requested, into a single sheet (see fill_tables()), but an update
+    always uses only the first file."""
 
-    def __init__(self, ctx):
+    def __init__(self, ctx, interactive=True):
         self.ctx = ctx
+        # without user interface, no progress is shown and no message boxes are used
+        self.interactive = interactive
+        # cells of repeated values like locations are only marshalled once
+        self.encoded = EncodedValues(self.marshal_data)
+        self.block_size = DEFAULT_BLOCK_SIZE
+        self.split = ROWS
+        self.rows_per_sheet = MAX_ROWS
+        self.writer = CELL_WRITER
+        self.widths = ESTIMATED_WIDTHS
+        self.combine = False
+        self.jobs = default_jobs()
         self.init_logging()
         self.init_localization()
 
@@ -47,6 +112,9 @@ class IcalImporter(unohelper.Base, XJobExecutor):
         This code is inspired by the LibreOffice extension "Code Highligher 2"
         licensed under the GNU General Public License version 3."""
         self.logger = logging.getLogger('import_ical')
+        if self.logger.handlers:
+            # handlers were already added by another instance
+            return
         formatter = logging.Formatter('%(asctime)s %(levelname)s [%(funcName)s::%(lineno)d] %(message)s')
         self.logger.setLevel(logging.DEBUG)
         console_handler = logging.StreamHandler()
@@ -75,8 +143,11 @@ class IcalImporter(unohelper.Base, XJobExecutor):
         self.logger.debug(f'Extensions: {pip.getExtensionList()}')
         extension_path = pip.getPackageLocation('de.ichmann.libreoffice.import_ical')
         self.logger.debug(f'Extension path: {extension_path}')
-        # load translation for locale
-        localizations_dir = Path(uno.fileUrlToSystemPath(extension_path)) / 'localizations'
+        # load translation for locale, from the source tree if the extension is not installed
+        if extension_path:
+            localizations_dir = Path(uno.fileUrlToSystemPath(extension_path)) / 'localizations'
+        else:
+            localizations_dir = Path(__file__).resolve().parent.parent / 'localizations'
         self.logger.debug(f'Locales folder: {localizations_dir}')
         gettext.install('import_ical', localizations_dir, names=['_'])
         self.logger.debug('Translations from gettext installed.')
@@ -93,109 +164,850 @@ class IcalImporter(unohelper.Base, XJobExecutor):
         smgr = self.ctx.ServiceManager
         self.log_python_version()
 
+        # the argument of the job may restrict the import to a date range
+        try:
+            date_range = DateRange.from_argument(arg)
+        except ValueError as e:
+            self.logger.error(f'Invalid date range in argument "{arg}": {e}')
+            date_range = None
+        if date_range:
+            self.logger.info(f'Importing only events in date range {date_range}.')
+        # further words in the argument choose between a full import and an update
+        options = job_options(arg)
+        update = 'update' in options
+        mark_deleted = 'mark_deleted' in options
+        try:
+            self.block_size = max(1, int(options.get('block_size', DEFAULT_BLOCK_SIZE)))
+        except ValueError:
+            self.logger.error(f'Invalid block size in argument "{arg}".')
+        # large calendars are split over multiple sheets by row count or by date
+        try:
+            self.split = options.get('split', ROWS)
+            self.rows_per_sheet = int(options.get('rows_per_sheet', MAX_ROWS))
+            Sharding(self.split, self.rows_per_sheet)
+        except ValueError as e:
+            self.logger.error(f'Invalid split of sheets in argument "{arg}": {e}')
+            self.split, self.rows_per_sheet = ROWS, MAX_ROWS
+        self.writer = options.get('writer', CELL_WRITER)
+        if self.writer not in (CELL_WRITER, CSV_WRITER):
+            self.logger.error(f'Invalid writer in argument "{arg}".')
+            self.writer = CELL_WRITER
+        self.widths = options.get('widths', ESTIMATED_WIDTHS)
+        if self.widths not in (ESTIMATED_WIDTHS, OPTIMAL_WIDTHS):
+            self.logger.error(f'Invalid column widths in argument "{arg}".')
+            self.widths = ESTIMATED_WIDTHS
+        # multiple files are imported into a sheet per file unless they should be combined
+        self.combine = 'combine' in options
+        try:
+            self.jobs = max(1, int(options.get('jobs', default_jobs())))
+        except ValueError:
+            self.logger.error(f'Invalid number of jobs in argument "{arg}".')
+
         file_dialog = smgr.createInstanceWithContext('com.sun.star.ui.dialogs.FilePicker', self.ctx)
         file_dialog.initialize((FILEOPEN_SIMPLE,))
         file_dialog.appendFilter(_('iCalendar file (.ics)'), '*.ics')
         file_dialog.setTitle(_('Open iCalendar file'))
-        file_dialog.setMultiSelectionMode(False)
+        file_dialog.setMultiSelectionMode(not update)
         ok = file_dialog.execute()
         if ok:
-            list_of_files = file_dialog.getFiles()
+            list_of_files = [uno.fileUrlToSystemPath(url) for url in file_dialog.getSelectedFiles()]
             file_dialog.dispose()
             try:
-                self.fill_table(self.ctx, uno.fileUrlToSystemPath(list_of_files[0]))
+                if update:
+                    completed = self.update_table(self.ctx, list_of_files[0], date_range, mark_deleted)
+                elif len(list_of_files) > 1:
+                    completed = self.fill_tables(self.ctx, list_of_files, date_range)
+                else:
+                    completed = self.fill_table(self.ctx, list_of_files[0], date_range)
             except UnicodeDecodeError as e:
                 show_message_box(self.ctx, _('Error'), _('Calendar file has an invalid character endoding,\nshould be Unicode UTF-8.'))
                 self.logger.error(e)
             except RuntimeException as e:
                 show_message_box(self.ctx, _('Error'), _('An UNO error occured.'))
                 self.logger.error(e)
-            except NotImplementedError as e:
-                show_message_box(self.ctx, _('Error'), _('File contains multiple calendars.\nThis is not yet supported.'))
-                self.logger.error(e)
             except ParseError as e:
                 show_message_box(self.ctx, _('Error'), _('Calendar file is not valid.'))
                 self.logger.error(e)
             else:
-                show_message_box(self.ctx, _('Calender imported'), _('Calendar file was successfully imported.'))
+                if completed:
+                    show_message_box(self.ctx, _('Calender imported'), _('Calendar file was successfully imported.'))
+                else:
+                    show_message_box(self.ctx, _('Import cancelled'), _('The import was cancelled.\nAll events read so far have been imported.'))
 
-    def fill_table(self, ctx, filename):
-        """Fills the first worksheet with data from an iCalendar file.
+    def fill_table(self, ctx, filename, date_range=None, doc=None):
+        """Fills the active worksheet of a document (by default the current
+        one) with data from an iCalendar file.
 
-        All events from a given iCalendar file are imported. Every column
+        All events from a given iCalendar file are imported, if no date range
+        is given. Otherwise only events within that range are imported. Every column
         represents a attribute from the file and has a corrsponding header. The
-        cells will be configured with a number format depending on the type of data
-        of that column (datetime, timedelta, string, etc.)."""
+        rows are written in blocks of block_size rows with a single call each,
+        while the next blocks are already parsed by a worker thread (see
+        background_blocks()). The import can be cancelled between two blocks,
+        keeping the rows written so far. The columns will be configured with a
+        number format depending on the type of data of that column (datetime,
+        timedelta, string, etc.). Files with multiple calendars get an
+        additional column with the index of the calendar of every event.
+        Events that do not fit into the active sheet are written into further
+        sheets, which may also be split by the year or month of the events
+        (see icalreader.shards). With the CSV writer, rows are written into
+        temporary CSV files instead, which are loaded by the CSV filter of
+        Calc at the end (see CsvWriter). Returns False if the import was
+        cancelled. The widths of the columns are estimated from the lengths of
+        their texts or, if requested, measured by Calc."""
+        sharding = Sharding(self.split, self.rows_per_sheet)
+        with MappedCalendar(filename, errors='replace') as calendar:
+            # the index of the mapped file gives the number of events up front
+            self.logger.info(f'Calendar file contains {len(calendar)} events in {calendar.calendar_count} '
+                             f'calendars.')
+            columns = ATTRIBUTES + [CALENDAR] if calendar.calendar_count > 1 else ATTRIBUTES
+            widths = ColumnWidths(columns)
+            # the prefilter of the date range gives the number of imported events up front as well
+            selected = calendar.select(date_range)
+            if date_range:
+                self.logger.info(f'{len(selected)} events are within the date range.')
+            events = self.read_ical_file(calendar, selected)
+            blocks = self.sharded_blocks(events, sharding.assign, widths, columns)
+            # the active sheet gets a header even if there are no events at all
+            first_shard = ('', 0) if sharding.policy == ROWS else None
+            return self.write_blocks(ctx, doc, blocks, len(selected), columns, widths, first_shard)
+
+    def fill_tables(self, ctx, filenames, date_range=None, doc=None):
+        """Fills worksheets of a document (by default the current one) with
+        data from multiple iCalendar files.
+
+        The files are parsed concurrently by a pool of workers (see
+        file_pool()), each file as a whole, while the events of the files
+        parsed first are already written. The events of every file are written
+        into their own sheets, named after the file and split like by
+        fill_table(). If the files should be combined, all events are written
+        into the active sheet instead, with an additional column giving the
+        name of the file of every event. Returns False if the import was
+        cancelled."""
+        names = sheet_names(filenames)
+        # counting the events of all files up front only scans for their boundaries
+        # (and the properties needed by the date range)
+        total, calendars = 0, 1
+        for filename in filenames:
+            with MappedCalendar(filename, errors='replace') as calendar:
+                total += len(calendar.select(date_range))
+                calendars = max(calendars, calendar.calendar_count)
+        self.logger.info(f'{len(filenames)} calendar files contain {total} events.')
+        columns = ATTRIBUTES + [CALENDAR] if calendars > 1 else ATTRIBUTES
+        if self.combine:
+            columns = columns + [SOURCE_COLUMN]
+        widths = ColumnWidths(columns)
+        results = read_files_parallel(filenames, backend=get_backend().name,
+                                      executor=file_pool(min(self.jobs, len(filenames))),
+                                      errors='replace', date_range=date_range)
+        if self.combine:
+            sharding = Sharding(self.split, self.rows_per_sheet)
+            events = (SourcedEvent(e, os.path.basename(filename)) for filename, records in results
+                      for e in records)
+            blocks = self.sharded_blocks(events, sharding.assign, widths, columns)
+            first_shard = ('', 0) if sharding.policy == ROWS else None
+        else:
+            blocks = self.file_blocks(results, names, widths, columns)
+            first_shard = None
+        return self.write_blocks(ctx, doc, blocks, total, columns, widths, first_shard)
+
+    def file_blocks(self, results, names, widths=None, columns=ATTRIBUTES):
+        """Yields the blocks of the events of multiple files, sharded per file.
+
+        The results are pairs of filename and events. The shards of every file
+        are named after the file (see sheet_names()) and the year or month of
+        their events, if the sheets are split by date."""
+        for filename, records in results:
+            sharding = Sharding(self.split, self.rows_per_sheet)
+
+            def assign(record, name=names[filename]):
+                base, part = sharding.assign(record)
+                if base == '':
+                    return name, part
+                return f'{name} {base if base is not None else _("Without date")}', part
+
+            yield from self.sharded_blocks(records, assign, widths, columns)
+
+    def write_blocks(self, ctx, doc, blocks, total, columns=ATTRIBUTES, widths=None, first_shard=None):
+        """Writes sharded blocks of rows into the worksheets of a document (by
+        default the current one) and formats their columns.
+
+        The blocks are marshalled by a worker thread (see background_blocks())
+        and written by the chosen writer. If a first shard is given, its sheet
+        is opened even without any events. Returns False if the import was
+        cancelled."""
+        if doc is None:
+            smgr = ctx.ServiceManager
+            desktop = smgr.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+            doc = desktop.getCurrentComponent()
+        active_sheet = doc.getCurrentController().getActiveSheet()
+        writer_class = CsvWriter if self.writer == CSV_WRITER else CellWriter
+        open_sheet = partial(self.shard_sheet, doc, active_sheet, columns)
+        # the whole import is a single undo step without repainting the document in between
+        with import_session(doc, _('Import iCalendar')), writer_class(open_sheet, self.logger, columns) as writer:
+            if first_shard is not None:
+                writer.add_shard(first_shard)
+            # rows that are only loaded when the writer finishes are counted a second time
+            with ImportProgress(ctx, doc, _('Import iCalendar'), total, self.logger, self.interactive,
+                                final=total if writer.LOADS_ON_FINISH else 0) as progress:
+                # iterate over all events and add data to the tables block by block
+                with closing(background_blocks(blocks)) as blocks:
+                    for shard, block in blocks:
+                        writer.write(shard, block)
+                        progress.advance(len(block))
+                        if progress.cancelled:
+                            break
+                shards = writer.finish(progress)
+            if len(shards) > 1:
+                self.logger.info(f'Events were split into {len(shards)} sheets.')
+            number_formats = NumberFormatRegistry(doc)
+            for sheet, rows in shards.values():
+                number_formats.apply(sheet, columns, 1, rows)
+                if self.widths == OPTIMAL_WIDTHS or widths is None:
+                    # mark all columns and let Calc measure their optimal width
+                    selection = sheet.getCellRangeByPosition(0, 0, len(columns)-1, rows)
+                    for c in selection.Columns:
+                        c.OptimalWidth = True
+                else:
+                    widths.apply(sheet)
+        return not progress.cancelled
+
+    def shard_sheet(self, doc, active_sheet, columns, shard):
+        """Returns the worksheet for a shard of events with its header written.
+
+        When splitting by row count only, the first shard is written into the
+        active sheet and further sheets are named after it. Otherwise sheets
+        are named after the year or month of their events. Missing sheets are
+        appended to the document."""
+        base, part = shard
+        if shard == ('', 0):
+            sheet = active_sheet
+        else:
+            name = (base or active_sheet.getName()) if base is not None else _('Without date')
+            if part > 0:
+                name = f'{name} ({part + 1})'
+            sheets = doc.getSheets()
+            if not sheets.hasByName(name):
+                sheets.insertNewByName(name, sheets.getCount())
+            sheet = sheets.getByName(name)
+        # write attributes into table header
+        sheet.getCellRangeByPosition(0, 0, len(columns)-1, 0).setDataArray((tuple(columns),))
+        return sheet
+
+    def update_table(self, ctx, filename, date_range=None, mark_deleted=False):
+        """Updates the events previously imported into the active worksheet.
+
+        The rows of the worksheet are matched with the events of the iCalendar
+        file by their UID. Only rows of events whose last modification has
+        changed are written again and new events are appended below the last
+        row. If mark_deleted is set, rows of events that no longer exist in the
+        file are marked in an additional column. Worksheets that do not contain
+        imported events are filled completely like by fill_table(). Returns
+        False if the update was cancelled."""
         smgr = ctx.ServiceManager
         desktop = smgr.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
         doc = desktop.getCurrentComponent()
         sheet = doc.getCurrentController().getActiveSheet()
-        # write attributes into table header
-        attr = ['name', 'begin', 'end', 'duration', 'uid', 'description', 'created',
-                'last_modified', 'location', 'url', 'transparent', 'alarms',
-                'attendees', 'categories', 'status', 'organizer', 'classification']
-        for column, name in enumerate(attr):
-            cell = sheet.getCellByPosition(column, 0)
-            cell.String = name
-        # iterate over all events and add data to table
-        for row, e in enumerate(self.read_ical_file(filename)):
-            for column, name in enumerate(attr):
-                cell = sheet.getCellByPosition(column, row+1)
-                self.fill_cell_with_data(doc, getattr(e, name), cell)
-        # mark all columns and set them to optimal width
-        selection = sheet.getCellRangeByPosition(0, 1, len(attr)-1, 1)
-        for c in selection.Columns:
-            c.OptimalWidth = True
-
-    def read_ical_file(self, filename):
-        """Reads an iCalendar file and returns all events from that file."""
-        with open(filename, 'r', encoding='utf-8', errors='replace') as calendar_file:
-            c = Calendar(calendar_file.read())
-        return c.events
-
-    def fill_cell_with_data(self, doc, data, cell):
-        """Fills a single cell with given data.
-
-        Before the data is stored in the cell of an worksheet, the type of the data
-        is checked. All necessary conversion and type casts are done before the
-        value of the cell is set."""
-        number_format = doc.getNumberFormats()
-        local_settings = Locale()
-        local_settings.Language = 'de'
-        if not data:
-            cell.String = ''
+        header = list(sheet.getCellRangeByPosition(0, 0, len(ATTRIBUTES)+1, 0).getDataArray()[0])
+        if header[:len(ATTRIBUTES)] != ATTRIBUTES:
+            self.logger.info('Worksheet does not contain imported events, importing all events.')
+            return self.fill_table(ctx, filename, date_range)
+        # the index of the calendar is kept up to date as well, if it has been imported
+        columns = ATTRIBUTES + [CALENDAR] if header[len(ATTRIBUTES)] == CALENDAR else ATTRIBUTES
+        # find the last used row and read UID and last modification of all rows at once
+        cursor = sheet.createCursor()
+        cursor.gotoEndOfUsedArea(False)
+        last_row = cursor.getRangeAddress().EndRow
+        rows = []
+        if last_row > 0:
+            uid_column = header.index('uid')
+            modified_column = header.index('last_modified')
+            uids = sheet.getCellRangeByPosition(uid_column, 1, uid_column, last_row).getDataArray()
+            modified = sheet.getCellRangeByPosition(modified_column, 1, modified_column, last_row).getDataArray()
+            rows = [(u[0], m[0]) for u, m in zip(uids, modified)]
+        with import_session(doc, _('Update iCalendar')):
+            with MappedCalendar(filename, errors='replace') as calendar:
+                index = EventIndex.build(calendar, None)
+                events = index.select(date_range) if date_range else None
+                plan = UpdatePlan.build(index, rows, events, revision=self.format_revision)
+                self.logger.info(f'Updating worksheet: {plan}')
+                # rows below the header of changed events and of new events appended at the end
+                targets = [(i, row+1) for i, row in plan.changed]
+                targets += [(i, last_row+1+n) for n, i in enumerate(plan.new) if last_row+1+n <= MAX_ROWS]
+                dropped = len(plan.new) - (MAX_ROWS - last_row)
+                if dropped > 0:
+                    self.logger.error(f'Worksheet is full, {dropped} new events are not imported.')
+                targets.sort()
+                records = get_backend().read_components(calendar.iter_components([i for i, _row in targets]))
+                with ImportProgress(ctx, doc, _('Update iCalendar'), len(targets), self.logger,
+                                    self.interactive) as progress:
+                    for n, ((_index, row), e) in enumerate(zip(targets, records), 1):
+                        target = sheet.getCellRangeByPosition(0, row, len(columns)-1, row)
+                        target.setDataArray(self.marshal_rows([e], columns))
+                        if n % self.block_size == 0 or n == len(targets):
+                            progress.advance(n - progress.rows)
+                            if progress.cancelled:
+                                targets = targets[:n]
+                                break
+            if targets:
+                NumberFormatRegistry(doc).apply(sheet, columns, 1, max(row for _index, row in targets))
+            if mark_deleted and last_row > 0:
+                column = header.index('deleted') if 'deleted' in header else len(columns)
+                sheet.getCellByPosition(column, 0).String = 'deleted'
+                deleted = set(plan.deleted)
+                flags = tuple((str(True) if row in deleted else '',) for row in range(last_row))
+                sheet.getCellRangeByPosition(column, 1, column, last_row).setDataArray(flags)
+        return not progress.cancelled
+
+    def format_revision(self, last_modified):
+        """Converts a raw LAST-MODIFIED value like it is written into a cell."""
+        return self.marshal_data(parse_datetime(last_modified))
+
+    def read_ical_file(self, calendar, events=None):
+        """Yields all events from a memory mapped iCalendar file.
+
+        The events are decoded one at a time from their slice of the file
+        while the table is filled, so that memory usage stays bounded even for
+        very large calendars. If the indices of events are given (e.g. of the
+        events within a date range, see MappedCalendar.select()), all other
+        events are skipped without being decoded."""
+        backend = get_backend()
+        yield from backend.read_components(calendar.iter_components(events))
+
+    def sharded_blocks(self, events, assign, widths=None, columns=ATTRIBUTES):
+        """Yields the events as pairs of shard and a block of at most block_size
+        rows for setDataArray().
+
+        The shard of every event is given by the assign function (see
+        icalreader.shards.Sharding.assign()). Events are collected per shard,
+        so blocks of different shards may be yielded in any order, but the
+        rows of each shard keep their order. The lengths of the texts of all
+        rows are added to the column widths."""
+        pending = {}
+        for e in events:
+            shard = assign(e)
+            rows = pending.setdefault(shard, [])
+            rows.append(e)
+            if len(rows) == self.block_size:
+                del pending[shard]
+                yield shard, self.marshal_block(rows, widths, columns)
+        for shard, rows in pending.items():
+            yield shard, self.marshal_block(rows, widths, columns)
+
+    def marshal_block(self, events, widths=None, columns=ATTRIBUTES):
+        """Converts a block of events into rows and adds them to the column widths."""
+        block = self.marshal_rows(events, columns)
+        if widths is not None:
+            widths.add_rows(block)
+        return block
+
+    def marshal_rows(self, events, names=ATTRIBUTES):
+        """Converts a block of events into rows for setDataArray().
+
+        The values are converted column by column, so that all points in time
+        and durations of a column are converted in a single batch."""
+        columns = []
+        for name in names:
+            values = [getattr(e, name) for e in events]
+            if name in DATETIME_COLUMNS:
+                columns.append(serial_dates(values))
+            elif name in DURATION_COLUMNS:
+                columns.append(serial_durations(values))
+            else:
+                columns.append([self.encoded.get(name, v) for v in values])
+        return tuple(zip(*columns))
+
+    def marshal_data(self, data):
+        """Converts a single value into the content of a cell.
+
+        Cells can only hold strings and numbers. Points in time are converted
+        into serial date numbers and durations into fractions of days, so that
+        Calc can calculate with them. Their display is set by the number format
+        of the whole column (see NumberFormatRegistry)."""
+        if type(data) is int:
+            return data
+        elif not data:
+            return ''
         elif isinstance(data, str):
-            cell.String = data
-        elif isinstance(data, Arrow):
-            # write datetime into cell
-            cell.String = data.format('DD.MM.YYYY HH:mm:ss')
-            # set number format for cell
-            format_string = 'TT.MM.JJJJ HH:MM:SS'
-            number_format_id = number_format.queryKey(
-                format_string, local_settings, True)
-            # check whether a value was found for the requested format (-1 == no value)
-            if number_format_id == -1:
-                number_format_id = number_format.addNew(
-                    format_string, local_settings)
-            cell.NumberFormat = number_format_id
+            return data
+        elif isinstance(data, datetime):
+            return serial_date(data)
         elif isinstance(data, timedelta):
-            # write datetime into cell
-            cell.String = str(data)
-            # set number format for cell
-            format_string = 'HH:MM:SS'
-            number_format_id = number_format.queryKey(
-                format_string, local_settings, True)
-            # check whether a value was found for the requested format (-1 == no value)
-            if number_format_id == -1:
-                number_format_id = number_format.addNew(
-                    format_string, local_settings)
-            cell.NumberFormat = number_format_id
-        elif isinstance(data, set):
-            cell.String = ', '.join([x for x in data])
+            return serial_duration(data)
+        elif isinstance(data, bool):
+            return str(data)
+        elif isinstance(data, tuple):
+            return ', '.join([str(x) for x in data])
         else:
             self.logger.error('Unsupported data type: {}'.format(type(data)))
-            # return data without conversion to trigger an exception
-            return data
+            raise ValueError(f'Unsupported data type: {type(data)}')
+
+
+
+class NumberFormatRegistry:
+    """Resolves the keys of number formats of a document and applies them to columns.
+
+    Every format is looked up (or added) only once per registry, so a single
+    registry should be used for a whole import."""
+
+    def __init__(self, doc, locale=FORMAT_LOCALE):
+        self.doc = doc
+        self.number_formats = doc.getNumberFormats()
+        self.locale = Locale()
+        self.locale.Language, self.locale.Country = locale
+        self.keys = {}
+
+    def key(self, format_string):
+        """Returns the key of a number format, which is added if necessary."""
+        if format_string not in self.keys:
+            key = self.number_formats.queryKey(format_string, self.locale, True)
+            # check whether a value was found for the requested format (-1 == no value)
+            if key == -1:
+                key = self.number_formats.addNew(format_string, self.locale)
+            self.keys[format_string] = key
+        return self.keys[format_string]
+
+    def apply(self, sheet, columns, first_row, last_row, formats=COLUMN_FORMATS):
+        """Sets the number formats of the given rows of all columns with a format.
+
+        All columns sharing a format are set with a single property change."""
+        if last_row < first_row:
+            return
+        columns_by_format = {}
+        for column, name in enumerate(columns):
+            if name in formats:
+                columns_by_format.setdefault(formats[name], []).append(column)
+        for format_string, format_columns in columns_by_format.items():
+            ranges = self.doc.createInstance('com.sun.star.sheet.SheetCellRanges')
+            addresses = [sheet.getCellRangeByPosition(c, first_row, c, last_row).getRangeAddress()
+                         for c in format_columns]
+            ranges.addRangeAddresses(tuple(addresses), False)
+            ranges.NumberFormat = self.key(format_string)
+
+
+class ColumnWidths:
+    """Estimates the widths of columns from the lengths of their texts.
+
+    The number of characters of every value is counted while the rows are
+    marshalled. The width of a column is given by a percentile of these
+    counts (so that a few very long texts do not make a column very wide)
+    times the average width of a character of the font of the sheet. Serial
+    numbers are counted with the length of their number format."""
+
+    # percentile of the text lengths that determines the width of a column
+    PERCENTILE = 0.95
+    # average width of a character relative to the font height
+    CHARACTER_WIDTH = 0.55
+    # widths in 1/100 mm
+    PADDING = 200
+    MIN_WIDTH = 800
+    MAX_WIDTH = 12000
+    # 1/100 mm per point
+    POINT = 2540 / 72
+
+    def __init__(self, columns):
+        self.columns = columns
+        # the header is part of every column
+        self.lengths = [Counter({len(name): 1}) for name in columns]
+        self.format_lengths = [len(COLUMN_FORMATS[name].replace('[', '').replace(']', ''))
+                               if name in COLUMN_FORMATS else None for name in columns]
+
+    def add_rows(self, rows):
+        """Counts the lengths of the values of marshalled rows."""
+        for lengths, format_length, values in zip(self.lengths, self.format_lengths, zip(*rows)):
+            for value in values:
+                if value == '':
+                    continue
+                if format_length is not None and not isinstance(value, str):
+                    lengths[format_length] += 1
+                elif not isinstance(value, str):
+                    lengths[len(str(value))] += 1
+                elif '\n' in value:
+                    lengths[max(len(line) for line in value.split('\n'))] += 1
+                else:
+                    lengths[len(value)] += 1
+
+    def characters(self, column):
+        """Returns the number of characters that fits into a column."""
+        lengths = self.lengths[column]
+        limit = self.PERCENTILE * sum(lengths.values())
+        count = 0
+        for length in sorted(lengths):
+            count += lengths[length]
+            if count >= limit:
+                return length
+        return 0
+
+    def apply(self, sheet):
+        """Sets the estimated widths of all columns of a sheet."""
+        font_height = sheet.getCellByPosition(0, 0).CharHeight
+        character = font_height * self.CHARACTER_WIDTH * self.POINT
+        columns = sheet.getColumns()
+        for column in range(len(self.columns)):
+            width = round(self.characters(column) * character) + self.PADDING
+            columns.getByIndex(column).Width = min(max(width, self.MIN_WIDTH), self.MAX_WIDTH)
+
+
+class CellWriter:
+    """Writes blocks of rows directly into the cells of the worksheets."""
+
+    # whether the rows only get into the worksheets when finishing
+    LOADS_ON_FINISH = False
+
+    def __init__(self, open_sheet, logger, columns=ATTRIBUTES):
+        self.open_sheet = open_sheet
+        self.logger = logger
+        self.columns = columns
+        # sheet and number of written rows for every shard
+        self.shards = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def add_shard(self, shard):
+        """Opens the worksheet for a shard of events."""
+        self.shards[shard] = [self.open_sheet(shard), 0]
+
+    def write(self, shard, block):
+        """Writes a block of rows below the rows already written for its shard."""
+        if shard not in self.shards:
+            self.add_shard(shard)
+        sheet, rows = self.shards[shard]
+        target = sheet.getCellRangeByPosition(0, rows+1, len(self.columns)-1, rows+len(block))
+        target.setDataArray(block)
+        self.shards[shard][1] = rows + len(block)
+
+    def finish(self, progress=None):
+        """Returns the sheet and number of written rows for every shard."""
+        return self.shards
+
+
+class CsvWriter:
+    """Writes blocks of rows into temporary CSV files loaded by Calc at the end.
+
+    Every shard is written into its own CSV file. When all rows are written,
+    the files are loaded by the native CSV filter of Calc into the worksheets
+    by linking the sheets to the files and removing the links again, which
+    keeps only the values. Serial numbers are written in fixed-point notation
+    and loaded with the English locale, text columns are loaded as text, so
+    that the type of every value is kept."""
+
+    FILTER_NAME = 'Text - txt - csv (StarCalc)'
+
+    LOADS_ON_FINISH = True
+
+    def __init__(self, open_sheet, logger, columns=ATTRIBUTES):
+        self.open_sheet = open_sheet
+        self.logger = logger
+        self.columns = columns
+        self.directory = None
+        # name, file, CSV writer and number of written rows for every shard
+        self.files = {}
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix='import_ical_')
+        return self
+
+    def __exit__(self, *args):
+        for entry in self.files.values():
+            entry[1].close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def add_shard(self, shard):
+        """Creates the CSV file for a shard of events."""
+        name = f'shard{len(self.files)}'
+        f = open(os.path.join(self.directory, name + '.csv'), 'w', encoding='utf-8', newline='')
+        writer = csv.writer(f)
+        writer.writerow(self.columns)
+        self.files[shard] = [name, f, writer, 0]
+
+    def write(self, shard, block):
+        """Appends a block of rows to the CSV file of its shard."""
+        if shard not in self.files:
+            self.add_shard(shard)
+        entry = self.files[shard]
+        entry[2].writerows([fixed_point(value) for value in row] for row in block)
+        entry[3] += len(block)
+
+    def finish(self, progress=None):
+        """Loads all CSV files into their worksheets.
+
+        The loading is reported to the progress, if given, one file at a time.
+        If the import is cancelled while the files are loaded, the remaining
+        files are skipped. Rows written before a cancellation are loaded.
+        Returns the sheet and number of written rows for every loaded shard."""
+        started = time.perf_counter()
+        cancelled_before = progress is not None and progress.cancelled
+        shards = {}
+        for n, (shard, (name, f, writer, rows)) in enumerate(self.files.items(), 1):
+            f.close()
+            if progress is not None:
+                if progress.cancelled and not cancelled_before:
+                    self.logger.warning(f'Loading cancelled, {len(self.files) - len(shards)} CSV files skipped.')
+                    break
+                progress.advance_final(0, _('Loading sheet {} of {}...').format(n, len(self.files)))
+            sheet = self.open_sheet(shard)
+            sheet.link(uno.systemPathToFileUrl(f.name), name, self.FILTER_NAME, self.filter_options(),
+                       LINK_VALUE)
+            # keep the loaded values, but not the link to the temporary file
+            sheet.setLinkMode(LINK_NONE)
+            shards[shard] = [sheet, rows]
+            if progress is not None:
+                progress.advance_final(rows, _('Loading sheet {} of {}...').format(n, len(self.files)))
+        elapsed = time.perf_counter() - started
+        self.logger.info(f'Loaded {len(shards)} CSV files with the CSV filter in {elapsed:.1f} s.')
+        return shards
+
+    def filter_options(self):
+        """Returns the options of the CSV filter for the exported columns.
+
+        The options are: field separator (comma), text delimiter (double
+        quote), character set (UTF-8), first line, column types (standard for
+        serial numbers, text otherwise) and the locale of the numbers (en-US)."""
+        numeric = set(DATETIME_COLUMNS) | set(DURATION_COLUMNS) | {CALENDAR}
+        types = '/'.join(f'{i}/{1 if name in numeric else 2}' for i, name in enumerate(self.columns, 1))
+        return f'44,34,76,1,{types},1033,false,false'
+
+
+def fixed_point(value):
+    """Returns a float in fixed-point notation for a CSV file.
+
+    The CSV filter of Calc reads numbers in scientific notation (like the
+    repr of short durations) as text, unless special numbers are detected,
+    which would turn other texts into numbers as well."""
+    if type(value) is float:
+        return f'{value:.15f}'.rstrip('0').rstrip('.')
+    return value
+
+
+class ImportProgress(unohelper.Base, XActionListener):
+    """Shows the progress of an import and lets the user cancel it.
+
+    The progress is shown by the status indicator of the document frame. A
+    small dialog offers a button to cancel the import, which is checked after
+    every written block, when the user interface gets the chance to process
+    its events. The throughput is logged when the import ends. Without user
+    interface, only the throughput is logged.
+
+    Work that is done after all rows have been written (like loading CSV
+    files) is given by its extent in final, so that the progress only
+    reaches its end when that work is done as well (see advance_final())."""
+
+    def __init__(self, ctx, doc, title, total, logger, interactive=True, final=0):
+        self.ctx = ctx
+        self.title = title
+        self.total = total
+        self.logger = logger
+        self.interactive = interactive
+        self.final = final
+        self.rows = 0
+        self.finished = 0
+        self.cancelled = False
+        self.started = None
+        self.indicator = None
+        self.dialog = None
+        self.toolkit = ctx.ServiceManager.createInstanceWithContext('com.sun.star.awt.Toolkit', ctx)
+        self.frame = doc.getCurrentController().getFrame()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        if self.interactive:
+            self.indicator = self.frame.createStatusIndicator()
+            self.indicator.start(self.title, max(self.total + self.final, 1))
+            self.dialog = self.create_dialog()
+        return self
+
+    def __exit__(self, *args):
+        if self.dialog is not None:
+            self.dialog.dispose()
+            self.dialog = None
+        if self.indicator is not None:
+            self.indicator.end()
+            self.indicator = None
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0
+        state = 'cancelled' if self.cancelled else 'finished'
+        self.logger.info(f'{self.title} {state}: {self.rows} rows in {elapsed:.1f} s ({rate:.0f} rows/s).')
+
+    def create_dialog(self):
+        """Creates and shows the non-modal dialog with the cancel button."""
+        smgr = self.ctx.ServiceManager
+        model = smgr.createInstanceWithContext('com.sun.star.awt.UnoControlDialogModel', self.ctx)
+        model.Width = 150
+        model.Height = 45
+        model.Title = self.title
+        label = model.createInstance('com.sun.star.awt.UnoControlFixedTextModel')
+        label.PositionX, label.PositionY, label.Width, label.Height = 5, 5, 140, 12
+        model.insertByName('progress', label)
+        button = model.createInstance('com.sun.star.awt.UnoControlButtonModel')
+        button.PositionX, button.PositionY, button.Width, button.Height = 50, 24, 50, 14
+        button.Label = _('Cancel')
+        model.insertByName('cancel', button)
+        dialog = smgr.createInstanceWithContext('com.sun.star.awt.UnoControlDialog', self.ctx)
+        dialog.setModel(model)
+        dialog.getControl('cancel').addActionListener(self)
+        dialog.createPeer(self.toolkit, None)
+        dialog.setVisible(True)
+        return dialog
+
+    def advance(self, rows):
+        """Reports newly written rows and lets the user interface process its events."""
+        self.rows += rows
+        self.show(_('{} of {} events').format(self.rows, self.total))
+
+    def advance_final(self, amount, text):
+        """Reports progress of the work after all rows have been written."""
+        self.finished += amount
+        self.show(text)
+
+    def show(self, text):
+        """Shows the progress and lets the user interface process its events."""
+        if not self.interactive:
+            return
+        self.indicator.setValue(min(self.rows, self.total) + min(self.finished, self.final))
+        self.dialog.getControl('progress').setText(text)
+        # a click on the cancel button is only noticed while events are processed
+        self.toolkit.reschedule()
+
+    def actionPerformed(self, event):
+        self.cancelled = True
+
+    def disposing(self, event):
+        pass
+
+
+class SourcedEvent:
+    """An event record together with the name of the file it was read from."""
+
+    __slots__ = ('record', 'source')
+
+    def __init__(self, record, source):
+        self.record = record
+        self.source = source
+
+    def __getattr__(self, name):
+        return getattr(self.record, name)
+
+
+def sheet_names(filenames):
+    """Returns a unique name of a worksheet for every file, based on its name."""
+    names = {}
+    used = set()
+    for filename in filenames:
+        base = Path(filename).stem.translate(INVALID_SHEET_CHARACTERS).strip("' ") or '_'
+        name, n = base, 1
+        while name.lower() in used:
+            n += 1
+            name = f'{base} ({n})'
+        used.add(name.lower())
+        names[filename] = name
+    return names
+
+
+def file_pool(jobs):
+    """Returns a pool of workers for parsing multiple files.
+
+    Worker processes are started with a Python interpreter, which is not the
+    executable of the office when running inside LibreOffice. In that case
+    the interpreter bundled with LibreOffice next to it is used or, if there
+    is none, a pool of threads. The interpreter is only used for the workers
+    of this pool (see InterpreterContext), as the one set by multiprocessing
+    itself would apply to everything else running in the office as well."""
+    if not sys.executable:
+        # embedded interpreters do not always know their executable
+        return ThreadPoolExecutor(jobs)
+    executable = Path(sys.executable)
+    if not executable.name.lower().startswith('python'):
+        candidates = [executable.with_name(name) for name in ('python.exe', 'python', 'python3')]
+        executable = next((c for c in candidates if c.is_file()), None)
+    if executable is None:
+        return ThreadPoolExecutor(jobs)
+    return ProcessPoolExecutor(jobs, mp_context=InterpreterContext(str(executable)))
+
+
+def background_blocks(blocks, depth=QUEUE_DEPTH):
+    """Yields the blocks of a generator that is run by a worker thread.
+
+    The worker reads at most depth blocks ahead, so that parsing the next
+    blocks overlaps with writing the current one without holding the whole
+    calendar in memory. Only the caller talks to UNO. Exceptions of the
+    worker are raised by the caller. Closing this generator stops the worker
+    and waits for it to finish."""
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        """Puts an item into the queue unless the caller has stopped reading."""
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def work():
+        try:
+            for block in blocks:
+                if not put((block, None)):
+                    return
+            put((None, None))
+        except BaseException as e:
+            put((None, e))
+
+    worker = threading.Thread(target=work, name='import_ical reader', daemon=True)
+    worker.start()
+    try:
+        while True:
+            block, error = ready.get()
+            if error is not None:
+                raise error
+            if block is None:
+                return
+            yield block
+    finally:
+        stop.set()
+        worker.join()
+
+
+@contextmanager
+def import_session(doc, title):
+    """Suspends repainting, recalculation and undo recording of a document.
+
+    All changes made within the session are grouped into a single undo action
+    with the given title. The state of the document is restored when the
+    session ends, even if the import fails."""
+    restore = ExitStack()
+    try:
+        undo_manager = doc.getUndoManager()
+        undo_manager.enterUndoContext(title)
+        restore.callback(undo_manager.leaveUndoContext)
+        doc.lockControllers()
+        restore.callback(doc.unlockControllers)
+        doc.addActionLock()
+        restore.callback(doc.removeActionLock)
+        # callbacks run in reverse order, so the document is recalculated while it is still locked
+        automatic_calculation = doc.isAutomaticCalculationEnabled()
+        doc.enableAutomaticCalculation(False)
+        restore.callback(doc.enableAutomaticCalculation, automatic_calculation)
+        yield
+    finally:
+        restore.close()
+
+
+def job_options(argument):
+    """Returns the options of a job argument like "update;block_size=5000".
+
+    Words without value are returned with the value True."""
+    options = {}
+    for part in str(argument or '').replace('&', ';').split(';'):
+        key, equals, value = part.partition('=')
+        if key.strip():
+            options[key.strip().lower()] = value.strip() if equals else True
+    return options
 
 
 def show_message_box(ctx, title, message):
@@ -219,30 +1031,20 @@ g_ImplementationHelper.addImplementation(
 
 
 if __name__ == '__main__':
-    import os
+    from convert_ods import OfficeConnection
 
     # start LibreOffice, listen for connections and open testing document
     os.system("/usr/bin/libreoffice --calc '--accept=socket,host=localhost,port=2002;urp;' &")
     #os.system(r'start "C:\Program Files\LibreOffice\program\soffice" -accept="socket,host=0,port=2002;urp;"')
 
-    # get local context info
-    localContext = uno.getComponentContext()
-    resolver = localContext.ServiceManager.createInstanceWithContext(
-        "com.sun.star.bridge.UnoUrlResolver", localContext)
-
-    ctx = None
-
     # wait until LibreOffice starts and connection is established
-    while ctx == None:
-        try:
-            ctx = resolver.resolve('uno:socket,host=localhost,port=2002;urp;StarOffice.ComponentContext')
-        except Exception as e:
-            pass
+    connection = OfficeConnection('localhost', 2002)
+    connection.connect()
 
     print('Testing IcalImporter...')
 
     # trigger our job
-    testjob = IcalImporter(ctx)
+    testjob = IcalImporter(connection.ctx)
     testjob.trigger(())
 
     print('IcalImporter tested.')
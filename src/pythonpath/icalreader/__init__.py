@@ -0,0 +1,54 @@
+"""Reading events from iCalendar files.
+
+This package is shared by the LibreOffice extension (src/import_ical.py) and
+the standalone converter (src/ical2csv.py). Events are read as a stream, so
+that even very large calendars can be converted with bounded memory.
+
+The actual parsing is done by one of several backends (see
+icalreader.backends): the built-in content line parser, the icalendar package
+or the grammar based parser of the ics library, which is the strictest but
+by far the slowest one.
+"""
+
+from icalreader.backends import (AUTO, BACKENDS, BACKEND_NAMES, Backend,
+                                 available_backends, get_backend)
+from icalreader.cache import RecordCache
+from icalreader.filters import DateRange
+from icalreader.index import EventIndex, open_indexed
+from icalreader.interning import REPEATED_COLUMNS, EncodedValues, ValueDictionary
+from icalreader.mmapreader import MappedCalendar, count_calendars
+from icalreader.parallel import InterpreterContext, default_jobs, read_events_parallel, read_files_parallel
+from icalreader.records import ATTRIBUTES, CALENDAR, EventRecord, begin_order, check_columns
+from icalreader.serial import serial_date, serial_dates, serial_duration, serial_durations
+from icalreader.stream import ParseError, unfold_lines, iter_components
+from icalreader.table import EventTable, TableBuilder
+from icalreader.update import UpdatePlan
+
+
+__all__ = ['ATTRIBUTES', 'AUTO', 'BACKENDS', 'BACKEND_NAMES', 'Backend', 'CALENDAR', 'DateRange',
+           'EncodedValues', 'EventIndex', 'EventRecord', 'EventTable', 'InterpreterContext', 'MappedCalendar',
+           'ParseError',
+           'RecordCache', 'REPEATED_COLUMNS', 'TableBuilder', 'UpdatePlan', 'ValueDictionary',
+           'available_backends',
+           'begin_order', 'check_columns', 'count_calendars', 'default_jobs', 'get_backend', 'open_indexed',
+           'read_events', 'read_events_parallel', 'read_files_parallel', 'serial_date', 'serial_dates',
+           'serial_duration', 'serial_durations', 'unfold_lines', 'iter_components']
+
+
+def read_events(source, backend=AUTO, columns=None, date_range=None, mapped=False):
+    """Yields all events from a path or an open iCalendar file as event records.
+
+    If columns are given, only these attributes of the events are decoded.
+    Events outside of the date range are skipped without being decoded. With
+    mapped set, the source has to be a path, which is read memory mapped
+    (see icalreader.mmapreader)."""
+    backend = get_backend(backend)
+    if mapped:
+        return _read_mapped(source, backend, columns=columns, date_range=date_range)
+    return backend.read_events(source, columns=columns, date_range=date_range)
+
+
+def _read_mapped(filename, backend, **options):
+    """Yields all events of a memory mapped iCalendar file."""
+    with MappedCalendar(filename) as calendar:
+        yield from backend.read_components(calendar.iter_components(), **options)
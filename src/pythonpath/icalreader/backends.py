@@ -0,0 +1,110 @@
+"""Parser backends for reading events from iCalendar files.
+
+Every backend is implemented by a module of this package that provides two
+functions yielding event records with the standard attribute set (see
+icalreader.records): read_events(calendar_file) for an open file and
+read_components(components) for a stream of already tokenized components.
+read_timezones(components) resolves the timezones of a calendar in advance.
+Backends depending on an optional package are only available when that
+package is installed.
+"""
+
+import os
+import importlib
+import importlib.util
+import importlib.metadata
+from contextlib import contextmanager
+
+
+AUTO = 'auto'
+
+
+class Backend:
+    """A parser backend: given a path or stream, it yields event records."""
+
+    def __init__(self, name, module, requires=None, description=''):
+        self.name = name
+        self.module = module
+        self.requires = requires
+        self.description = description
+
+    def __repr__(self):
+        return '<Backend {}>'.format(self.name)
+
+    def is_available(self):
+        """Returns whether all packages necessary for this backend are installed."""
+        return self.requires is None or importlib.util.find_spec(self.requires) is not None
+
+    def version(self):
+        """Returns a string identifying the version of the parser and the
+        package it depends on, which changes whenever the records may change."""
+        module = importlib.import_module(self.module)
+        version = '{}-{}'.format(self.name, module.PARSER_VERSION)
+        if self.requires is not None:
+            try:
+                version += '-{}'.format(importlib.metadata.version(self.requires))
+            except importlib.metadata.PackageNotFoundError:
+                # packages that are vendored with the extension have no metadata
+                version += '-{}'.format(getattr(importlib.import_module(self.requires), '__version__', ''))
+        return version
+
+    def read_events(self, source, **options):
+        """Yields all events from a path or an open iCalendar file."""
+        module = importlib.import_module(self.module)
+        with open_source(source) as calendar_file:
+            yield from module.read_events(calendar_file, **options)
+
+    def read_components(self, components, **options):
+        """Yields all events from a stream of (name, lines) components."""
+        module = importlib.import_module(self.module)
+        return module.read_components(components, **options)
+
+    def read_timezones(self, components):
+        """Returns the timezones defined by a stream of (name, lines)
+        components, which can be passed to read_components()."""
+        module = importlib.import_module(self.module)
+        return module.read_timezones(components)
+
+
+# all backends ordered from the fastest to the slowest one
+BACKENDS = [
+    Backend('fast', 'icalreader.fastparser',
+            description='built-in content line parser'),
+    Backend('icalendar', 'icalreader.icalendarparser', requires='icalendar',
+            description='parser of the icalendar package'),
+    Backend('ics', 'icalreader.icsparser', requires='ics',
+            description='grammar based parser of the ics library (strict)'),
+]
+
+BACKEND_NAMES = [backend.name for backend in BACKENDS]
+
+
+def available_backends():
+    """Returns all backends that can be used with the installed packages."""
+    return [backend for backend in BACKENDS if backend.is_available()]
+
+
+def get_backend(name=AUTO):
+    """Returns the backend with the given name.
+
+    For 'auto', the fastest available backend is chosen."""
+    if name == AUTO:
+        return available_backends()[0]
+    for backend in BACKENDS:
+        if backend.name == name:
+            if not backend.is_available():
+                raise ValueError('Backend {} needs package {}, which is not installed'.format(
+                                 name, backend.requires))
+            return backend
+    raise ValueError('Unknown backend: {}'.format(name))
+
+
+@contextmanager
+def open_source(source):
+    """Opens a path as iCalendar file or passes an open file (or any other
+    iterable of lines) through."""
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as calendar_file:
+            yield calendar_file
+    else:
+        yield source
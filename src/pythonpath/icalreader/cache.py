@@ -0,0 +1,240 @@
+"""Persistent cache of the event records read from iCalendar files.
+
+The records are stored under a key computed from the calendar file, the
+version of the parser and the options that influence the records (columns
+and date range), so an entry is used exactly as long as calling the parser
+again would give the same result. Like the sidecar index (see
+icalreader.index), a file is identified by its path, size, modification time
+and a hash over its beginning and end, so that a cache hit does not have to
+read the whole calendar. Entries are written as a stream of compressed,
+pickled batches of plain value tuples.
+
+The size of the cache directory is limited. When it grows beyond that limit,
+the least recently used entries are removed first.
+"""
+
+import os
+import gzip
+import zlib
+import pickle
+import hashlib
+
+from icalreader.index import default_cache_dir, file_key
+from icalreader.interning import ValueDictionary
+from icalreader.records import CALENDAR, EventRecord, check_columns, fixed_offset
+
+
+CACHE_VERSION = 3
+CACHE_SUFFIX = '.records'
+
+# default limit for the size of the cache directory in bytes
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# number of records pickled together
+_BATCH_SIZE = 1000
+
+# block size for checking the compressed stream of an entry
+_CHECK_BLOCK_SIZE = 1024 * 1024
+
+
+class RecordCache:
+    """Directory of cached event records with a size limit."""
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory or os.path.join(default_cache_dir(), 'records')
+        self.max_size = max_size
+
+    def __repr__(self):
+        return '<RecordCache {}>'.format(self.directory)
+
+    def key(self, filename, backend, columns=None, date_range=None):
+        """Returns the key of the records of a calendar file read with the
+        given backend and options.
+
+        Like the sidecar index, the key only depends on the path, size and
+        modification time of the file and a hash over its beginning and end
+        (see icalreader.index.file_key), so the file is not read completely."""
+        digest = hashlib.sha256()
+        if date_range:
+            dates = [str(date_range.start or ''), str(date_range.end or '')]
+        else:
+            dates = ['', '']
+        current = file_key(filename)
+        options = [str(CACHE_VERSION), os.path.abspath(filename), str(current['size']), str(current['mtime']),
+                   current['hash'], backend.version(), ','.join(check_columns(columns))] + dates
+        digest.update('\n'.join(options).encode('utf-8'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        """Returns the path of the cache entry with the given key."""
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def load(self, key):
+        """Returns the number of calendars in the file along with an iterator
+        over the cached records or None if there is no usable entry for the key.
+
+        A truncated or otherwise corrupt entry is removed."""
+        path = self.path(key)
+        try:
+            f = gzip.open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            header = pickle.load(f)
+        except (OSError, EOFError, ValueError, zlib.error, pickle.UnpicklingError):
+            f.close()
+            self._remove(path)
+            return None
+        if header.get('version') != CACHE_VERSION or header.get('key') != key:
+            f.close()
+            return None
+        if not self._complete(path):
+            f.close()
+            self._remove(path)
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return header['calendars'], self._read_records(f, header['columns'])
+
+    @staticmethod
+    def _complete(path):
+        """Checks whether an entry can be decompressed up to its end.
+
+        This is far cheaper than unpickling the records, which could only
+        notice a truncated entry after some of them have been returned."""
+        try:
+            with gzip.open(path, 'rb') as f:
+                while f.read(_CHECK_BLOCK_SIZE):
+                    pass
+        except (OSError, EOFError, zlib.error):
+            return False
+        return True
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _read_records(self, f, columns):
+        """Yields the records of an opened cache entry.
+
+        Repeated values are shared between the records, like when parsing."""
+        dictionary = ValueDictionary()
+        with f:
+            while True:
+                try:
+                    batch = pickle.load(f)
+                except EOFError:
+                    return
+                for values in batch:
+                    yield EventRecord(**dictionary.intern_values(dict(zip(columns, values))))
+
+    def store(self, key, records, columns=None, calendars=1):
+        """Passes the records through while writing them into the cache.
+
+        The entry is only stored if all records have been read; nothing is
+        stored if reading is aborted or fails. The number of calendars in the
+        file is stored along with the records. The cache only speeds up later
+        runs, so if the entry can not be written, the records are passed
+        through without it."""
+        # the calendar of every record is stored along with its columns
+        columns = check_columns(columns) + [CALENDAR]
+        path = self.path(key)
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            f = gzip.open(temporary, 'wb', compresslevel=1)
+        except OSError:
+            f = None
+        header = {'version': CACHE_VERSION, 'key': key, 'columns': columns, 'calendars': calendars}
+        f = self._write(f, temporary, header)
+        try:
+            batch = []
+            for record in records:
+                if f is not None:
+                    batch.append(tuple(fixed_offset(getattr(record, name)) for name in columns))
+                    if len(batch) == _BATCH_SIZE:
+                        f = self._write(f, temporary, batch)
+                        batch = []
+                yield record
+        except BaseException:
+            if f is not None:
+                self._discard(f, temporary)
+            raise
+        f = self._write(f, temporary, batch)
+        if f is None:
+            return
+        try:
+            f.close()
+            os.replace(temporary, path)
+        except OSError:
+            self._discard(f, temporary)
+            return
+        self.evict()
+
+    def _write(self, f, temporary, value):
+        """Pickles a value into an entry that is being written.
+
+        Returns the file or None, if the entry has been discarded because
+        it could not be written (or had been discarded before)."""
+        if f is None:
+            return None
+        try:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            self._discard(f, temporary)
+            return None
+        return f
+
+    def _discard(self, f, temporary):
+        """Closes and removes an entry that has not been written completely."""
+        try:
+            f.close()
+        except OSError:
+            pass
+        self._remove(temporary)
+
+    def entries(self):
+        """Returns (path, size, last use) of all cache entries, least
+        recently used first."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(CACHE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is within
+        its size limit."""
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+
+    def clear(self):
+        """Removes all entries from the cache."""
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
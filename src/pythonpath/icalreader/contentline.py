@@ -0,0 +1,120 @@
+"""Hand-written parser for single content lines (RFC 5545, section 3.1).
+
+A content line consists of a name, optional parameters and a value:
+
+    DTSTART;TZID="Europe/Berlin":20200101T100000
+
+Parameter values may be quoted, so that they can contain the characters ";",
+":" and ",". The value itself is everything after the first unquoted colon.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+from icalreader.stream import ParseError, split_name
+
+
+NO_PARAMS = {}
+
+_ESCAPES = re.compile(r'\\(.)')
+_ESCAPED = {'n': '\n', 'N': '\n', 'r': '\r', 'R': '\r'}
+_UNESCAPED_COMMA = re.compile(r'(?<!\\),')
+_DURATION = re.compile(r'([-+])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+
+def parse_contentline(line):
+    """Splits a content line into name, parameters and value.
+
+    The parameters are returned as a dict mapping the upper case parameter
+    names to lists of their (unquoted) values."""
+    colon = line.find(':')
+    semicolon = line.find(';')
+    if colon == -1:
+        raise ParseError('Missing value in content line: {}'.format(line))
+    if semicolon == -1 or colon < semicolon:
+        return line[:colon].upper(), NO_PARAMS, line[colon+1:]
+    name = line[:semicolon].upper()
+    params = {}
+    position = semicolon + 1
+    length = len(line)
+    while True:
+        equals = line.find('=', position)
+        if equals == -1:
+            raise ParseError('Invalid parameter in content line: {}'.format(line))
+        param_name = line[position:equals].upper()
+        values = []
+        position = equals + 1
+        while True:
+            if position < length and line[position] == '"':
+                closing = line.find('"', position + 1)
+                if closing == -1:
+                    raise ParseError('Unterminated quote in content line: {}'.format(line))
+                values.append(line[position+1:closing])
+                position = closing + 1
+            else:
+                start = position
+                while position < length and line[position] not in ',;:':
+                    position += 1
+                values.append(line[start:position])
+            if position >= length:
+                raise ParseError('Missing value in content line: {}'.format(line))
+            separator = line[position]
+            position += 1
+            if separator != ',':
+                break
+        params[param_name] = values
+        if separator == ':':
+            return name, params, line[position:]
+
+
+def unescape_text(value):
+    """Resolves the backslash escapes of a TEXT value."""
+    if '\\' not in value:
+        return value
+    return _ESCAPES.sub(lambda m: _ESCAPED.get(m.group(1), m.group(1)), value)
+
+
+def split_text_list(value):
+    """Splits a list of TEXT values at unescaped commas and unescapes them."""
+    if '\\' not in value:
+        return value.split(',')
+    return [unescape_text(v) for v in _UNESCAPED_COMMA.split(value)]
+
+
+def parse_datetime(value, tz=None):
+    """Parses a DATE or DATE-TIME value into an aware datetime.
+
+    Values with a trailing Z are always UTC, otherwise the given timezone is
+    used. Floating times without a timezone are treated as UTC."""
+    value = value.strip()
+    if value[-1:] in 'zZ':
+        value = value[:-1]
+        tz = timezone.utc
+    elif tz is None:
+        tz = timezone.utc
+    try:
+        if len(value) == 8:
+            return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]), tzinfo=tz)
+        if len(value) == 15 and value[8] in 'tT':
+            return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                            int(value[9:11]), int(value[11:13]), int(value[13:15]), tzinfo=tz)
+        if '-' in value or '/' in value:
+            parsed = datetime.fromisoformat(value.replace('/', '-'))
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)
+        if len(value) in (11, 13) and value[8] in 'tT':
+            return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                            int(value[9:11]), int(value[11:13] or 0), tzinfo=tz)
+    except ValueError:
+        pass
+    raise ParseError('Invalid date or time: {}'.format(value))
+
+
+def parse_duration(value):
+    """Parses a DURATION value like -P1DT2H into a timedelta."""
+    match = _DURATION.match(value.strip())
+    if not match or not any(match.groups()[1:]):
+        raise ParseError('Invalid duration: {}'.format(value))
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                         minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
@@ -0,0 +1,229 @@
+"""Reads events with the built-in content line parser.
+
+Only the properties that end up in a requested column are decoded, all other
+lines (and sub-components like alarms) are skipped after looking at their
+name. The values are interpreted the same way the ics library does, e.g. the
+DTSTAMP of an event is used as its creation time.
+"""
+
+from io import StringIO
+from datetime import timedelta, timezone
+
+from dateutil.tz import gettz, tzical
+
+from icalreader.contentline import (split_name, parse_contentline, unescape_text,
+                                    split_text_list, parse_datetime, parse_duration)
+from icalreader.interning import ValueDictionary
+from icalreader.records import ATTRIBUTES, EventRecord, check_columns, required_properties
+from icalreader.stream import ParseError, unfold_lines, iter_components
+
+
+# increased whenever the records returned by this parser change
+PARSER_VERSION = 1
+
+
+class Timezones:
+    """Resolves TZID parameters to tzinfo objects.
+
+    Like the ics library, well-known timezone names are looked up in the
+    timezone database first and VTIMEZONE definitions of the calendar are only
+    used for unknown names. Unresolvable names fall back to UTC."""
+
+    def __init__(self):
+        self.definitions = {}
+        self.cache = {}
+
+    def add_definition(self, lines):
+        """Adds the timezones defined by the lines of a VTIMEZONE component."""
+        # tzical understands neither non-standard nor SEQUENCE lines
+        lines = [l for l in lines if not split_name(l).startswith('X-') and split_name(l) != 'SEQUENCE']
+        text = '\r\n'.join(['BEGIN:VTIMEZONE'] + lines + ['END:VTIMEZONE'])
+        try:
+            parsed = tzical(StringIO(text))
+        except ValueError as e:
+            raise ParseError('Invalid VTIMEZONE: {}'.format(e)) from e
+        for key in parsed.keys():
+            self.definitions[key] = parsed.get(key)
+        self.cache.clear()
+
+    def get(self, tzid):
+        """Returns the tzinfo for a TZID."""
+        try:
+            return self.cache[tzid]
+        except KeyError:
+            tz = gettz(tzid) or self.definitions.get(tzid, timezone.utc)
+            self.cache[tzid] = tz
+            return tz
+
+
+def _datetime(line, timezones):
+    """Decodes a DATE or DATE-TIME property."""
+    _, params, value = parse_contentline(line)
+    tzid = params.get('TZID')
+    return parse_datetime(value, timezones.get(tzid[0]) if tzid else None)
+
+
+def _text(line):
+    """Decodes a TEXT property."""
+    return unescape_text(parse_contentline(line)[2])
+
+
+def _raw(line):
+    """Returns the value of a property without decoding it."""
+    return parse_contentline(line)[2]
+
+
+def _email(line):
+    """Decodes the CAL-ADDRESS of an attendee or organizer."""
+    email = unescape_text(parse_contentline(line)[2])
+    if email[:7].lower() == 'mailto:':
+        email = email[7:]
+    return email
+
+
+def _trigger(line):
+    """Decodes the TRIGGER of an alarm into a timedelta or datetime."""
+    _, params, value = parse_contentline(line)
+    if params.get('VALUE', ['DURATION'])[0].upper() == 'DATE-TIME':
+        return parse_datetime(value)
+    return parse_duration(value)
+
+
+def parse_event(lines, timezones, columns=ATTRIBUTES, properties=None, calendar=0, dictionary=None):
+    """Decodes the lines of a VEVENT component into an event record.
+
+    Only the given columns are decoded, all other attributes of the record
+    are None. The set of properties needed for the columns can be passed in
+    to avoid computing it for every event. The record belongs to the calendar
+    with the given index. Repeated values are shared via the dictionary, if
+    one is given (see icalreader.interning)."""
+    if properties is None:
+        properties = required_properties(columns)
+    found = {}
+    triggers = []
+    with_alarms = 'VALARM' in properties
+    # nesting level of sub-components and whether the current one is an alarm
+    depth, in_alarm = 0, False
+    for line in lines:
+        name = split_name(line)
+        if name == 'BEGIN':
+            depth += 1
+            in_alarm = with_alarms and depth == 1 and line[6:].strip().upper() == 'VALARM'
+        elif name == 'END':
+            depth -= 1
+            in_alarm = False
+        elif depth:
+            if in_alarm and name == 'TRIGGER':
+                triggers.append(line)
+        elif name in properties:
+            found.setdefault(name, []).append(line)
+
+    def first(name):
+        values = found.get(name)
+        return values[0] if values else None
+
+    values = {}
+    for column in columns:
+        if column in values:
+            continue
+        elif column in ('begin', 'end', 'duration'):
+            values['begin'], values['end'], values['duration'] = _timespan(first, timezones)
+        elif column in ('name', 'description', 'location', 'url'):
+            line = first(_TEXT_PROPERTIES[column])
+            values[column] = _text(line) if line else None
+        elif column in ('created', 'last_modified'):
+            line = first('DTSTAMP' if column == 'created' else 'LAST-MODIFIED')
+            values[column] = _datetime(line, timezones) if line else None
+        elif column == 'uid':
+            line = first('UID')
+            values[column] = _raw(line) if line else None
+        elif column == 'transparent':
+            line = first('TRANSP')
+            transparent = _raw(line).strip().upper() if line else None
+            values[column] = transparent == 'TRANSPARENT' if transparent in ('TRANSPARENT', 'OPAQUE') else None
+        elif column == 'alarms':
+            values[column] = tuple(_trigger(line) for line in triggers)
+        elif column == 'attendees':
+            values[column] = tuple(_email(line) for line in found.get('ATTENDEE', ()))
+        elif column == 'categories':
+            categories = []
+            for line in found.get('CATEGORIES', ()):
+                categories.extend(c for c in split_text_list(_raw(line)) if c not in categories)
+            values[column] = tuple(categories)
+        elif column == 'status':
+            line = first('STATUS')
+            values[column] = _raw(line).upper() if line else None
+        elif column == 'organizer':
+            line = first('ORGANIZER')
+            values[column] = _email(line) if line else None
+        elif column == 'classification':
+            line = first('CLASS')
+            values[column] = _raw(line) if line else None
+    if dictionary is not None:
+        dictionary.intern_values(values)
+    return EventRecord(calendar=calendar, **values)
+
+
+_TEXT_PROPERTIES = {'name': 'SUMMARY', 'description': 'DESCRIPTION', 'location': 'LOCATION', 'url': 'URL'}
+
+
+def _timespan(first, timezones):
+    """Decodes begin, end and duration of an event.
+
+    End and duration are derived from each other as done by the ics library."""
+    begin = first('DTSTART')
+    all_day = begin is not None and 'T' not in _raw(begin).upper()
+    begin = _datetime(begin, timezones) if begin else None
+    duration = first('DURATION')
+    duration = parse_duration(_raw(duration)) if duration else None
+    end = first('DTEND')
+    end = _datetime(end, timezones) if end else None
+    if duration and begin is not None:
+        end = begin + duration
+    elif end is None and begin is not None:
+        end = begin + timedelta(days=1) if all_day else begin
+    if not duration and end is not None and begin is not None:
+        duration = end - begin
+    return begin, end, duration
+
+
+def read_components(components, columns=None, date_range=None, interned=True, timezones=None, calendar=0):
+    """Yields the events of a stream of (name, lines) components.
+
+    If columns are given, only these attributes of the events are decoded.
+    Events outside of the date range are skipped without being decoded. If
+    interned is set, repeated values like locations are shared between the
+    events (see icalreader.interning).
+    VTIMEZONE components have to precede the events using them as
+    recommended by RFC 5545. A ('VCALENDAR', index) component starts a
+    further calendar with its own timezones (see icalreader.stream).
+    The timezones of a calendar that have been resolved beforehand (see
+    read_timezones()) are passed in together with the index of the calendar
+    if only some of its events are parsed."""
+    columns = check_columns(columns)
+    properties = required_properties(columns)
+    if timezones is None:
+        timezones = Timezones()
+    dictionary = ValueDictionary() if interned else None
+    for name, lines in components:
+        if name == 'VTIMEZONE':
+            timezones.add_definition(lines)
+        elif name == 'VCALENDAR':
+            calendar, timezones = lines, Timezones()
+        elif not date_range or date_range.matches_lines(lines):
+            yield parse_event(lines, timezones, columns, properties, calendar, dictionary)
+
+
+def read_timezones(components):
+    """Returns the timezones defined by the VTIMEZONE components of a stream
+    of (name, lines) components, as used by read_components()."""
+    timezones = Timezones()
+    for name, lines in components:
+        if name == 'VTIMEZONE':
+            timezones.add_definition(lines)
+    return timezones
+
+
+def read_events(calendar_file, columns=None, date_range=None, interned=True):
+    """Yields all events of an iCalendar file one at a time."""
+    return read_components(iter_components(unfold_lines(calendar_file)), columns, date_range, interned)
@@ -0,0 +1,147 @@
+"""Filters that are applied to the raw lines of a component before decoding.
+
+Checking a filter only needs a glance at a handful of properties, so that
+VEVENT components that are filtered out never have to be decoded.
+"""
+
+from datetime import date, datetime, timedelta
+
+from icalreader.contentline import parse_contentline, parse_duration
+from icalreader.stream import ParseError, split_name
+
+
+# properties looked at for the span of an event
+_RANGE_PROPERTIES = ('DTSTART', 'DTEND', 'DURATION', 'RRULE', 'RDATE')
+
+# end of the span of events recurring forever
+UNBOUNDED = '99991231T235959'
+
+
+def _local_time(value):
+    """Normalizes a DATE or DATE-TIME value to YYYYMMDDTHHMMSS.
+
+    Times are compared as they are written in the file (which is also how
+    they are exported), so the timezone is ignored on purpose."""
+    value = value.strip().rstrip('zZ').upper()
+    if len(value) == 8:
+        return value + 'T000000'
+    if len(value) == 15 and value[8] == 'T':
+        return value
+    if len(value) in (11, 13) and value[8] == 'T':
+        return value.ljust(15, '0')
+    raise ParseError('Invalid date or time: {}'.format(value))
+
+
+def _add_duration(local_time, duration):
+    """Adds a DURATION value to a normalized local time."""
+    moment = datetime.strptime(local_time, '%Y%m%dT%H%M%S') + parse_duration(duration)
+    return moment.strftime('%Y%m%dT%H%M%S')
+
+
+class DateRange:
+    """Selects all events that take place (at least partly) between two dates.
+
+    Both dates are inclusive and may be None for an open range. Recurring
+    events are kept if any of their occurrences may fall into the range; they
+    are not expanded into single occurrences."""
+
+    def __init__(self, start=None, end=None):
+        if isinstance(start, datetime):
+            start = start.date()
+        if isinstance(end, datetime):
+            end = end.date()
+        if start and end and start > end:
+            raise ValueError('Start of date range {} is after its end {}'.format(start, end))
+        self.start = start
+        self.end = end
+        # range as half-open interval of normalized local times
+        self._after = start.strftime('%Y%m%dT000000') if start else None
+        self._before = (end + timedelta(days=1)).strftime('%Y%m%dT000000') if end else None
+
+    def __repr__(self):
+        return '<DateRange {} - {}>'.format(self.start or '...', self.end or '...')
+
+    def __bool__(self):
+        return self.start is not None or self.end is not None
+
+    @classmethod
+    def from_argument(cls, argument):
+        """Creates a date range from an argument like "from=2024-01-01;to=2024-01-31".
+
+        Parts of the argument that do not describe the range are ignored.
+        Returns None if neither start nor end are given."""
+        dates = {}
+        for part in str(argument or '').replace('&', ';').split(';'):
+            key, _, value = part.partition('=')
+            key = key.strip().lower()
+            if key in ('from', 'to') and value.strip():
+                dates[key] = date.fromisoformat(value.strip())
+        if not dates:
+            return None
+        return cls(dates.get('from'), dates.get('to'))
+
+    def matches_span(self, begin, end):
+        """Checks the span of an event as returned by event_span()."""
+        if begin is None:
+            # events without a start can not be placed, so they are kept
+            return True
+        if self._before is not None and begin >= self._before:
+            return False
+        return self._after is None or end > self._after or begin >= self._after
+
+    def matches_lines(self, lines):
+        """Checks the raw lines of a VEVENT component against the date range."""
+        return self.matches_span(*event_span(peek_properties(lines, _RANGE_PROPERTIES)))
+
+
+def peek_properties(lines, names):
+    """Returns the raw values of the given properties of a component.
+
+    Only the first occurrence of each property is returned and properties
+    of sub-components are ignored. Lines of other properties are skipped
+    without being parsed."""
+    initials = set(''.join(n[0] + n[0].lower() for n in names)) | set('BbEe')
+    values = {}
+    depth = 0
+    for line in lines:
+        if line[0] not in initials:
+            continue
+        name = split_name(line)
+        if name == 'BEGIN':
+            depth += 1
+        elif name == 'END':
+            depth -= 1
+        elif depth == 0 and name in names and name not in values:
+            values[name] = parse_contentline(line)[2]
+    return values
+
+
+def event_span(values):
+    """Returns the span of an event as pair of normalized local times.
+
+    The values are the raw properties of the event (see peek_properties).
+    The end is exclusive. For recurring events, the end of the last possible
+    occurrence is returned, which is UNBOUNDED if the recurrence never ends.
+    Events without a start have the span (None, None)."""
+    if 'DTSTART' not in values:
+        return None, None
+    begin = _local_time(values['DTSTART'])
+    if 'DTEND' in values:
+        end = _local_time(values['DTEND'])
+    elif 'DURATION' in values:
+        end = _add_duration(begin, values['DURATION'])
+    elif len(values['DTSTART'].strip()) == 8:
+        # all-day events without end last a single day
+        end = _add_duration(begin, 'P1D')
+    else:
+        end = begin
+    if 'RDATE' in values:
+        return begin, UNBOUNDED
+    if 'RRULE' in values:
+        rule = dict(part.partition('=')[::2] for part in values['RRULE'].upper().split(';'))
+        until = rule.get('UNTIL')
+        if until is None:
+            return begin, UNBOUNDED
+        # the last occurrence starts at the latest at UNTIL
+        end = max(end, _add_duration(_local_time(until), 'PT1S'))
+    return begin, end
@@ -0,0 +1,159 @@
+"""Reads events with the parser of the icalendar package.
+
+The icalendar package is an optional dependency. Every VEVENT component is
+handed to icalendar separately, so that memory usage stays bounded like for
+the other backends. Values are interpreted the same way as by the built-in
+parser (see icalreader.fastparser).
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import icalendar
+
+from icalreader.fastparser import Timezones, read_timezones
+from icalreader.interning import ValueDictionary
+from icalreader.records import ATTRIBUTES, EventRecord, check_columns, required_properties
+from icalreader.stream import ParseError, unfold_lines, iter_components, select_lines
+
+
+# increased whenever the records returned by this parser change
+PARSER_VERSION = 1
+
+
+def _as_list(value):
+    """Returns the values of a property that may occur multiple times as list."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _datetime(component, name, timezones):
+    """Decodes a DATE or DATE-TIME property into an aware datetime."""
+    prop = component.get(name)
+    if prop is None:
+        return None
+    value = prop.dt
+    if not isinstance(value, datetime):
+        # all-day values are interpreted as midnight UTC like by the ics library
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    if value.tzinfo is None:
+        tzid = prop.params.get('TZID')
+        return value.replace(tzinfo=timezones.get(tzid) if tzid else timezone.utc)
+    return value
+
+
+def _text(component, name):
+    """Decodes a TEXT property."""
+    value = component.get(name)
+    return str(value) if value is not None else None
+
+
+def _email(address):
+    """Decodes the CAL-ADDRESS of an attendee or organizer."""
+    email = str(address)
+    if email[:7].lower() == 'mailto:':
+        email = email[7:]
+    return email
+
+
+def _trigger(alarm, timezones):
+    """Decodes the TRIGGER of an alarm into a timedelta or datetime."""
+    trigger = alarm.get('TRIGGER')
+    if trigger is None:
+        return None
+    if isinstance(trigger.dt, timedelta):
+        return trigger.dt
+    return _datetime(alarm, 'TRIGGER', timezones)
+
+
+def parse_event(event, timezones, columns=ATTRIBUTES, calendar=0, dictionary=None):
+    """Converts an icalendar event into an event record.
+
+    Only the given columns are copied, all other attributes of the record are
+    None. The record belongs to the calendar with the given index. Repeated
+    values are shared via the dictionary, if one is given."""
+    begin = _datetime(event, 'DTSTART', timezones)
+    all_day = 'DTSTART' in event and not isinstance(event['DTSTART'].dt, datetime)
+    duration = event.get('DURATION')
+    duration = duration.dt if duration is not None else None
+    end = _datetime(event, 'DTEND', timezones)
+    # end and duration are derived from each other as done by the ics library
+    if duration and begin is not None:
+        end = begin + duration
+    elif end is None and begin is not None:
+        end = begin + timedelta(days=1) if all_day else begin
+    if not duration and end is not None and begin is not None:
+        duration = end - begin
+    transparent = _text(event, 'TRANSP')
+    if transparent is not None:
+        transparent = transparent.upper()
+        transparent = transparent == 'TRANSPARENT' if transparent in ('TRANSPARENT', 'OPAQUE') else None
+    categories = []
+    for prop in _as_list(event.get('CATEGORIES')):
+        categories.extend(str(c) for c in prop.cats if str(c) not in categories)
+    status = _text(event, 'STATUS')
+    organizer = event.get('ORGANIZER')
+    alarms = [c for c in event.subcomponents if c.name == 'VALARM']
+    values = dict(
+        name=_text(event, 'SUMMARY'),
+        begin=begin,
+        end=end,
+        duration=duration,
+        uid=_text(event, 'UID'),
+        description=_text(event, 'DESCRIPTION'),
+        created=_datetime(event, 'DTSTAMP', timezones),
+        last_modified=_datetime(event, 'LAST-MODIFIED', timezones),
+        location=_text(event, 'LOCATION'),
+        url=_text(event, 'URL'),
+        transparent=transparent,
+        alarms=tuple(t for t in (_trigger(a, timezones) for a in alarms) if t is not None),
+        attendees=tuple(_email(a) for a in _as_list(event.get('ATTENDEE'))),
+        categories=tuple(categories),
+        status=status.upper() if status else None,
+        organizer=_email(organizer) if organizer is not None else None,
+        classification=_text(event, 'CLASS'),
+    )
+    values = {column: values[column] for column in columns}
+    if dictionary is not None:
+        dictionary.intern_values(values)
+    return EventRecord(calendar=calendar, **values)
+
+
+def read_components(components, columns=None, date_range=None, interned=True, timezones=None, calendar=0):
+    """Yields the events of a stream of (name, lines) components.
+
+    If columns are given, only the properties needed for them are handed to
+    icalendar. Events outside of the date range are skipped beforehand.
+    VTIMEZONE components have to precede the events using them as
+    recommended by RFC 5545. A ('VCALENDAR', index) component starts a
+    further calendar with its own timezones (see icalreader.stream). If
+    interned is set, repeated values are shared (see icalreader.interning).
+    The timezones of a calendar that have been resolved beforehand (see
+    read_timezones()) are passed in together with the index of the calendar
+    if only some of its events are parsed."""
+    columns = check_columns(columns)
+    properties = required_properties(columns)
+    if timezones is None:
+        timezones = Timezones()
+    dictionary = ValueDictionary() if interned else None
+    for name, lines in components:
+        if name == 'VTIMEZONE':
+            timezones.add_definition(lines)
+            continue
+        if name == 'VCALENDAR':
+            calendar, timezones = lines, Timezones()
+            continue
+        if date_range and not date_range.matches_lines(lines):
+            continue
+        lines = select_lines(lines, properties)
+        text = '\r\n'.join(['BEGIN:VEVENT'] + lines + ['END:VEVENT', ''])
+        try:
+            event = icalendar.Event.from_ical(text)
+        except ValueError as e:
+            raise ParseError(str(e)) from e
+        yield parse_event(event, timezones, columns, calendar, dictionary)
+
+
+def read_events(calendar_file, columns=None, date_range=None, interned=True):
+    """Yields all events of an iCalendar file one at a time."""
+    return read_components(iter_components(unfold_lines(calendar_file)), columns, date_range, interned)
@@ -0,0 +1,93 @@
+"""Reads events with the grammar based parser of the ics library.
+
+This parser is slower than the built-in one, but strictly validates every
+content line against the grammar of RFC 5545.
+"""
+
+from io import StringIO
+
+from dateutil.tz import tzical
+from ics import Event
+from ics.grammar.parse import Container, ContentLine
+from ics.grammar.parse import ParseError as IcsParseError
+from ics.utils import remove_sequence, remove_x
+
+from icalreader.interning import ValueDictionary
+from icalreader.records import check_columns, from_ics_event, required_properties
+from icalreader.stream import ParseError, unfold_lines, iter_components, select_lines
+
+
+# increased whenever the records returned by this parser change
+PARSER_VERSION = 1
+
+
+def _to_container(name, lines):
+    """Builds an ics container for a single component."""
+    tokens = (ContentLine.parse(line) for line in lines + ['END:' + name])
+    return Container.parse(name, tokens)
+
+
+def _add_timezones(timezones, container):
+    """Parses a VTIMEZONE container and adds its timezones to the dict."""
+    # tzical understands neither non-standard nor SEQUENCE lines
+    remove_x(container)
+    remove_sequence(container)
+    parsed = tzical(StringIO(str(container)))
+    for key in parsed.keys():
+        timezones[key] = parsed.get(key)
+
+
+def read_timezones(components):
+    """Returns the timezones defined by the VTIMEZONE components of a stream
+    of (name, lines) components, as used by read_components()."""
+    timezones = {}
+    for name, lines in components:
+        if name == 'VTIMEZONE':
+            try:
+                _add_timezones(timezones, _to_container(name, lines))
+            except (IcsParseError, ValueError) as e:
+                raise ParseError(str(e)) from e
+    return timezones
+
+
+def read_components(components, columns=None, date_range=None, interned=True, timezones=None, calendar=0):
+    """Yields the events of a stream of (name, lines) components.
+
+    VTIMEZONE components are collected when they are encountered, so they
+    have to precede the events using them as recommended by RFC 5545. A
+    ('VCALENDAR', index) component starts a further calendar with its own
+    timezones (see icalreader.stream). If columns are given, only the lines
+    of the properties needed for them are parsed by the grammar. Events
+    outside of the date range are skipped before parsing. If interned is set,
+    repeated values are shared (see icalreader.interning).
+    The timezones of a calendar that have been resolved beforehand (see
+    read_timezones()) are passed in together with the index of the calendar
+    if only some of its events are parsed."""
+    columns = check_columns(columns)
+    properties = required_properties(columns)
+    if timezones is None:
+        timezones = {}
+    dictionary = ValueDictionary() if interned else None
+    for name, lines in components:
+        if name == 'VCALENDAR':
+            calendar, timezones = lines, {}
+            continue
+        if name == 'VEVENT':
+            if date_range and not date_range.matches_lines(lines):
+                continue
+            lines = select_lines(lines, properties)
+        try:
+            container = _to_container(name, lines)
+            if name == 'VTIMEZONE':
+                _add_timezones(timezones, container)
+                continue
+            # the ics library raises ValueError for invalid events, e.g. duplicate properties
+            event = Event._from_container(container, tz=timezones)
+        except (IcsParseError, ValueError) as e:
+            raise ParseError(str(e)) from e
+        yield from_ics_event(event, columns, calendar, dictionary)
+
+
+def read_events(calendar_file, columns=None, date_range=None, interned=True):
+    """Yields all events of an iCalendar file one at a time."""
+    return read_components(iter_components(unfold_lines(calendar_file)), columns, date_range, interned)
@@ -0,0 +1,189 @@
+"""Persistent index of the events of an iCalendar file.
+
+The index holds the byte offsets of all components together with UID,
+start, end and LAST-MODIFIED of every event. It is stored as sidecar file
+next to the calendar (or in a cache directory, if that is not writable), so
+that repeated runs over the same file can seek straight to the events they
+need instead of scanning the whole file again.
+
+An index is only used while size, modification time and a hash over the
+beginning and the end of the calendar file are unchanged.
+"""
+
+import os
+import json
+import hashlib
+from array import array
+
+from icalreader.filters import event_span, peek_properties
+from icalreader.mmapreader import MappedCalendar
+
+
+INDEX_VERSION = 2
+INDEX_SUFFIX = '.idx'
+
+# number of bytes at the beginning and end of a file that are hashed
+_HASHED_BYTES = 65536
+
+# properties that are stored in the index for every event
+_INDEX_PROPERTIES = ('UID', 'DTSTART', 'DTEND', 'DURATION', 'RRULE', 'RDATE', 'LAST-MODIFIED')
+
+
+def default_cache_dir():
+    """Returns the cache directory of this package as given by the XDG Base
+    Directory Specification."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'icalreader')
+
+
+def file_key(filename):
+    """Returns the values identifying the current content of a file.
+
+    Only the first and last bytes of the file are hashed, so that the key
+    can be computed without reading large files completely."""
+    stat = os.stat(filename)
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        digest.update(f.read(_HASHED_BYTES))
+        if stat.st_size > _HASHED_BYTES:
+            f.seek(max(_HASHED_BYTES, stat.st_size - _HASHED_BYTES))
+            digest.update(f.read())
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+
+
+def index_path(filename, cache_dir=None):
+    """Returns the path of the index for a calendar file.
+
+    Without a cache directory, the index is stored next to the calendar."""
+    if cache_dir is None:
+        return filename + INDEX_SUFFIX
+    name = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, name + INDEX_SUFFIX)
+
+
+class EventIndex:
+    """Offsets and key properties of all events of a calendar file."""
+
+    def __init__(self, key, timezone_offsets, event_offsets, uids, begins, ends, last_modified,
+                 calendar_timezones=None, calendar_events=None):
+        self.key = key
+        self.timezone_offsets = timezone_offsets
+        self.event_offsets = event_offsets
+        # indices of the first timezone and event of every calendar in the file
+        self.calendar_timezones = calendar_timezones if calendar_timezones is not None else array('q', [0])
+        self.calendar_events = calendar_events if calendar_events is not None else array('q', [0])
+        self.uids = uids
+        # normalized local times as returned by icalreader.filters.event_span
+        self.begins = begins
+        self.ends = ends
+        self.last_modified = last_modified
+
+    def __len__(self):
+        return len(self.uids)
+
+    @classmethod
+    def build(cls, calendar, key):
+        """Builds the index of an opened and scanned memory mapped calendar."""
+        uids, begins, ends, last_modified = [], [], [], []
+        for i in range(len(calendar)):
+            values = peek_properties(calendar.event_lines(i), _INDEX_PROPERTIES)
+            begin, end = event_span(values)
+            uids.append(values.get('UID'))
+            begins.append(begin)
+            ends.append(end)
+            last_modified.append(values.get('LAST-MODIFIED'))
+        return cls(key, array('q', calendar.timezone_offsets), array('q', calendar.event_offsets),
+                   uids, begins, ends, last_modified, array('q', calendar.calendar_timezones),
+                   array('q', calendar.calendar_events))
+
+    def select(self, date_range=None):
+        """Returns the indices of all events within the date range."""
+        if not date_range:
+            return range(len(self))
+        return [i for i, (begin, end) in enumerate(zip(self.begins, self.ends))
+                if date_range.matches_span(begin, end)]
+
+    def apply(self, calendar):
+        """Sets the component offsets of a memory mapped calendar from the index."""
+        calendar.timezone_offsets = array('q', self.timezone_offsets)
+        calendar.event_offsets = array('q', self.event_offsets)
+        calendar.calendar_timezones = array('q', self.calendar_timezones)
+        calendar.calendar_events = array('q', self.calendar_events)
+
+    def save(self, path):
+        """Writes the index to a file."""
+        data = {
+            'version': INDEX_VERSION,
+            'key': self.key,
+            'timezone_offsets': self.timezone_offsets.tolist(),
+            'event_offsets': self.event_offsets.tolist(),
+            'calendar_timezones': self.calendar_timezones.tolist(),
+            'calendar_events': self.calendar_events.tolist(),
+            'uids': self.uids,
+            'begins': self.begins,
+            'ends': self.ends,
+            'last_modified': self.last_modified,
+        }
+        # write into a temporary file first, so that no half written index is left behind
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path, key):
+        """Reads an index from a file.
+
+        Returns None if the file does not exist, can not be read or belongs
+        to a different version of the calendar file."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != INDEX_VERSION or data.get('key') != key:
+            return None
+        return cls(key, array('q', data['timezone_offsets']), array('q', data['event_offsets']),
+                   data['uids'], data['begins'], data['ends'], data['last_modified'],
+                   array('q', data['calendar_timezones']), array('q', data['calendar_events']))
+
+
+def open_indexed(filename, cache_dir=None, encoding='utf-8', errors='strict'):
+    """Opens a memory mapped calendar with the help of its persistent index.
+
+    If an up to date index exists, the calendar is not scanned at all.
+    Otherwise the calendar is scanned and the new index is stored next to
+    the calendar or, if that fails, in the cache directory. Returns the
+    opened calendar and its index."""
+    key = file_key(filename)
+    paths = [index_path(filename, cache_dir)] if cache_dir else \
+            [index_path(filename), index_path(filename, default_cache_dir())]
+    calendar = MappedCalendar(filename, encoding, errors)
+    for path in paths:
+        index = EventIndex.load(path, key)
+        if index is not None:
+            calendar.open(scan=False)
+            index.apply(calendar)
+            return calendar, index
+    calendar.open()
+    try:
+        index = EventIndex.build(calendar, key)
+    except BaseException:
+        calendar.close()
+        raise
+    for path in paths:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            index.save(path)
+            break
+        except OSError:
+            # the index only speeds up later runs, so it is fine if it can not be stored
+            continue
+    return calendar, index
@@ -0,0 +1,82 @@
+"""Sharing values that repeat across many events.
+
+Locations, organizers, status, classification and categories usually take
+only a few distinct values (e.g. the rooms of a room calendar), but every
+parsed event would hold its own copy of them. The readers therefore look up
+these values in a dictionary per column, so that every distinct value is
+stored only once, and writers cache the encoded form of every distinct value
+(e.g. the text of a CSV field) instead of encoding it again for every event.
+
+Both dictionaries are bounded, so that columns with mostly unique values do
+not keep all of their values in memory while events are streamed.
+"""
+
+
+# columns whose values are shared between events
+REPEATED_COLUMNS = ('location', 'status', 'organizer', 'classification', 'categories')
+
+# distinct values kept per column
+MAX_VALUES = 4096
+
+
+class ValueDictionary:
+    """Keeps a single instance of every distinct value of the repeated columns."""
+
+    def __init__(self, max_values=MAX_VALUES):
+        self.max_values = max_values
+        self.values = {name: {} for name in REPEATED_COLUMNS}
+
+    def __repr__(self):
+        return '<ValueDictionary {}>'.format(', '.join('{} {}'.format(len(values), name)
+                                                       for name, values in self.values.items()))
+
+    def intern(self, name, value):
+        """Returns the stored instance equal to a value of a column.
+
+        New values are stored as long as the column has room for them."""
+        values = self.values.get(name)
+        if values is None or value is None:
+            return value
+        try:
+            return values[value]
+        except KeyError:
+            if len(values) < self.max_values:
+                values[value] = value
+            return value
+
+    def intern_values(self, values):
+        """Replaces the values of the repeated columns within a dict of
+        column values by their stored instances and returns the dict."""
+        for name in REPEATED_COLUMNS:
+            if name in values:
+                values[name] = self.intern(name, values[name])
+        return values
+
+
+class EncodedValues:
+    """Caches the encoded forms of the distinct values of the repeated columns.
+
+    The encode function is called once for every distinct value, values of
+    other columns are encoded every time."""
+
+    def __init__(self, encode, max_values=MAX_VALUES):
+        self.encode = encode
+        self.max_values = max_values
+        self.encoded = {name: {} for name in REPEATED_COLUMNS}
+
+    def __repr__(self):
+        return '<EncodedValues {}>'.format(', '.join('{} {}'.format(len(encoded), name)
+                                                     for name, encoded in self.encoded.items()))
+
+    def get(self, name, value):
+        """Returns the encoded form of a value of a column."""
+        encoded = self.encoded.get(name)
+        if encoded is None:
+            return self.encode(value)
+        try:
+            return encoded[value]
+        except KeyError:
+            result = self.encode(value)
+            if len(encoded) < self.max_values:
+                encoded[value] = result
+            return result
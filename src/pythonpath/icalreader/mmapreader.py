@@ -0,0 +1,230 @@
+"""Memory mapped access to the events of an iCalendar file.
+
+The file is mapped into memory and scanned once for the byte offsets of all
+VTIMEZONE and VEVENT components. Nothing is decoded during the scan, so the
+number of events is known almost immediately. Events are only decoded when
+they are read, each from its own slice of the mapped file, without ever
+creating a string of the whole file.
+
+Files may contain multiple concatenated calendars, which are found by the
+same scan. The components of every calendar are kept apart, so that the
+timezones defined by a calendar are only used for its own events.
+
+The BEGIN and END lines of components are found regardless of their case,
+and a byte order mark at the beginning of the file is skipped.
+"""
+
+import re
+import mmap
+from array import array
+from bisect import bisect_right
+
+from icalreader.stream import ParseError, unfold_lines
+
+
+# byte order mark of UTF-8, which some applications write at the beginning of files
+_BOM = b'\xef\xbb\xbf'
+
+# compiled patterns of lines starting with a token, see _line_pattern()
+_line_patterns = {}
+
+
+def _line_pattern(token):
+    """Returns the pattern of a line break followed by a token in any case.
+
+    The line break as literal prefix keeps the search about as fast as a
+    plain bytes.find()."""
+    pattern = _line_patterns.get(token)
+    if pattern is None:
+        pattern = _line_patterns[token] = re.compile(b'\n' + re.escape(token), re.IGNORECASE)
+    return pattern
+
+
+class MappedCalendar:
+    """Index of the components of a memory mapped iCalendar file."""
+
+    def __init__(self, filename, encoding='utf-8', errors='strict'):
+        self.filename = filename
+        self.encoding = encoding
+        self.errors = errors
+        self._file = None
+        self._map = None
+        self._view = None
+        # offset of the first line, behind a byte order mark
+        self._start = 0
+        # byte offsets of the first and behind the last byte of components
+        self.timezone_offsets = array('q')
+        self.event_offsets = array('q')
+        # indices of the first timezone and the first event of every calendar
+        self.calendar_timezones = array('q')
+        self.calendar_events = array('q')
+
+    def __enter__(self):
+        if self._map is None:
+            self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.event_offsets) // 2
+
+    @property
+    def calendar_count(self):
+        """Number of calendars in the file."""
+        return len(self.calendar_events)
+
+    def open(self, scan=True):
+        """Maps the file into memory and scans it for components.
+
+        The scan can be skipped, if the offsets of all components are taken
+        from an up to date index (see icalreader.index)."""
+        self._file = open(self.filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can not be mapped
+            self.close()
+            raise ParseError('File does not contain a calendar')
+        self._view = memoryview(self._map)
+        self._start = len(_BOM) if self._map[:len(_BOM)] == _BOM else 0
+        if scan:
+            self.scan()
+
+    def close(self):
+        """Releases the mapping and closes the file."""
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _find_line(self, token, position, end=-1):
+        """Returns the offset of the next line starting with token (in any case) or -1."""
+        mapped = self._map
+        if end == -1:
+            end = len(mapped)
+        start = self._start
+        if position <= start and start + len(token) <= end and mapped[start:start+len(token)].upper() == token:
+            return start
+        match = _line_pattern(token).search(mapped, max(position - 1, 0), end)
+        return -1 if match is None else match.start() + 1
+
+    def _line_end(self, position):
+        """Returns the offset behind the line break of the line at position."""
+        end = self._map.find(b'\n', position)
+        return len(self._map) if end == -1 else end + 1
+
+    def _scan_component(self, name, offsets, begin, end):
+        """Collects the offsets of all components with the given name."""
+        begin_token, end_token = b'BEGIN:' + name, b'END:' + name
+        position = begin
+        while True:
+            start = self._find_line(begin_token, position, end)
+            if start == -1:
+                return
+            stop = self._find_line(end_token, start, end)
+            if stop == -1:
+                raise ParseError('Missing END:{} for component at byte {}'.format(name.decode(), start))
+            position = self._line_end(stop)
+            offsets.append(start)
+            offsets.append(position)
+
+    def scan(self):
+        """Scans the mapped file for the offsets of all calendars and their components."""
+        del self.timezone_offsets[:]
+        del self.event_offsets[:]
+        del self.calendar_timezones[:]
+        del self.calendar_events[:]
+        for calendar, end in self._scan_calendars():
+            self.calendar_timezones.append(len(self.timezone_offsets) // 2)
+            self.calendar_events.append(len(self))
+            self._scan_component(b'VTIMEZONE', self.timezone_offsets, calendar, end)
+            self._scan_component(b'VEVENT', self.event_offsets, calendar, end)
+        if not self.calendar_events:
+            raise ParseError('File does not contain a calendar')
+
+    def _scan_calendars(self):
+        """Yields the offsets of the BEGIN and END lines of all calendars."""
+        position = 0
+        while True:
+            calendar = self._find_line(b'BEGIN:VCALENDAR', position)
+            if calendar == -1:
+                return
+            end = self._find_line(b'END:VCALENDAR', calendar)
+            if end == -1:
+                raise ParseError('Unexpected end of file')
+            if self._find_line(b'BEGIN:VCALENDAR', calendar + 1, end) != -1:
+                raise ParseError('Nested VCALENDAR found')
+            yield calendar, end
+            position = self._line_end(end)
+
+    def calendar_of(self, index):
+        """Returns the index of the calendar of the event with the given index."""
+        return bisect_right(self.calendar_events, index) - 1
+
+    def component_lines(self, start, end):
+        """Decodes the component at the given offsets into its content lines.
+
+        The lines of the component itself (BEGIN and END) are removed."""
+        text = str(self._view[start:end], self.encoding, self.errors)
+        lines = list(unfold_lines(text.split('\n')))
+        return lines[1:-1]
+
+    def event_lines(self, index):
+        """Returns the content lines of the event with the given index."""
+        offsets = self.event_offsets
+        return self.component_lines(offsets[2*index], offsets[2*index+1])
+
+    def select(self, date_range=None):
+        """Returns the indices of all events within the date range.
+
+        Only the properties needed by the date range are looked at (see
+        icalreader.filters.DateRange.matches_lines), so this is far cheaper
+        than parsing the events."""
+        if not date_range:
+            return range(len(self))
+        return [i for i in range(len(self)) if date_range.matches_lines(self.event_lines(i))]
+
+    def calendar_components(self, calendar):
+        """Yields the ('VCALENDAR', index) marker and all VTIMEZONE components of a calendar."""
+        yield 'VCALENDAR', calendar
+        offsets = self.timezone_offsets
+        first = self.calendar_timezones[calendar]
+        if calendar + 1 < self.calendar_count:
+            last = self.calendar_timezones[calendar + 1]
+        else:
+            last = len(offsets) // 2
+        for i in range(first, last):
+            yield 'VTIMEZONE', self.component_lines(offsets[2*i], offsets[2*i+1])
+
+    def iter_components(self, events=None):
+        """Yields all components as (name, lines) like icalreader.stream.iter_components.
+
+        The events of every calendar are preceded by the marker of the
+        calendar and all of its VTIMEZONE components, regardless of their
+        position in the file. If the indices of events are given (in
+        ascending order), only these events are decoded and yielded and
+        calendars without any of them are skipped."""
+        current = None
+        for index in range(len(self)) if events is None else events:
+            calendar = self.calendar_of(index)
+            if calendar != current:
+                yield from self.calendar_components(calendar)
+                current = calendar
+            yield 'VEVENT', self.event_lines(index)
+
+
+def count_calendars(filename):
+    """Returns the number of calendars in a file without scanning for their components."""
+    calendar = MappedCalendar(filename)
+    calendar.open(scan=False)
+    try:
+        return sum(1 for _ in calendar._scan_calendars())
+    finally:
+        calendar.close()
@@ -0,0 +1,172 @@
+"""Parsing large calendars with multiple processes.
+
+The events of a memory mapped calendar (see icalreader.mmapreader) are split
+at VEVENT boundaries into chunks, which are parsed by a pool of worker
+processes. Every worker maps the file itself, so only byte offsets are sent
+to the workers. The VTIMEZONE definitions are extracted once and handed to
+every worker when it is started, which resolves them only once for all of
+its chunks. Chunks never span multiple calendars of a file, so that every
+chunk is parsed with the timezones of its calendar.
+"""
+
+import os
+import threading
+import multiprocessing.context
+from multiprocessing import spawn
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from icalreader.backends import get_backend
+from icalreader.mmapreader import MappedCalendar
+from icalreader.records import portable
+
+
+# minimal number of events in a chunk, smaller chunks cost more than they gain
+MIN_CHUNK_SIZE = 200
+
+# number of chunks per worker, so that workers finishing early get more work
+CHUNKS_PER_JOB = 4
+
+# number of chunks per worker that are submitted ahead of the chunk being yielded
+PENDING_CHUNKS_PER_JOB = 2
+
+# state of a worker process, set once by _init_worker()
+_worker = {}
+
+# held while the interpreter of multiprocessing is changed to start a process
+_executable_lock = threading.Lock()
+
+
+def default_jobs():
+    """Returns the number of available CPU cores."""
+    return os.cpu_count() or 1
+
+
+def _init_worker(filename, encoding, errors, calendars, backend, options):
+    """Opens the calendar in a worker process.
+
+    For every calendar of the file, calendars holds its marker and
+    VTIMEZONE components, whose timezones are resolved right away."""
+    calendar = MappedCalendar(filename, encoding, errors)
+    calendar.open(scan=False)
+    backend = get_backend(backend)
+    _worker.update(calendar=calendar, timezones=[backend.read_timezones(c) for c in calendars],
+                   backend=backend, options=options)
+
+
+def _parse_chunk(chunk):
+    """Parses the events at the given offsets of a calendar in a worker process."""
+    calendar = _worker['calendar']
+    index, offsets = chunk
+    components = (('VEVENT', calendar.component_lines(offsets[i], offsets[i+1])) for i in range(0, len(offsets), 2))
+    records = _worker['backend'].read_components(components, timezones=_worker['timezones'][index],
+                                                 calendar=index, **_worker['options'])
+    return [portable(r) for r in records]
+
+
+def _read_file(filename, backend, errors, options):
+    """Parses all events of a calendar file in a worker."""
+    with MappedCalendar(filename, errors=errors) as calendar:
+        records = get_backend(backend).read_components(calendar.iter_components(), **options)
+        return [portable(r) for r in records]
+
+
+def read_events_parallel(calendar, jobs=None, backend='auto', events=None, chunk_size=None, **options):
+    """Yields the events of an opened memory mapped calendar parsed by multiple processes.
+
+    The events are yielded in the order of the file. If the indices of events
+    are given, only these events are parsed. Only a few chunks per worker are
+    submitted ahead, so that the parsed events are not piling up while the
+    caller is busy. Further options (columns, date_range) are passed to the
+    backend."""
+    jobs = jobs or default_jobs()
+    indices = range(len(calendar)) if events is None else list(events)
+    if chunk_size is None:
+        chunk_size = max(MIN_CHUNK_SIZE, len(indices) // (jobs * CHUNKS_PER_JOB) + 1)
+    calendars = [list(calendar.calendar_components(i)) for i in range(calendar.calendar_count)]
+    initargs = (calendar.filename, calendar.encoding, calendar.errors, calendars,
+                get_backend(backend).name, options)
+    pending = deque()
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=initargs) as executor:
+        try:
+            for chunk in _chunks(calendar, indices, chunk_size):
+                pending.append(executor.submit(_parse_chunk, chunk))
+                if len(pending) > jobs * PENDING_CHUNKS_PER_JOB:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # chunks that are not needed anymore are not parsed at all
+            for future in pending:
+                future.cancel()
+
+
+def _chunks(calendar, indices, chunk_size):
+    """Yields the calendar index and event offsets of chunks of consecutive
+    events, which are split at the boundaries of calendars."""
+    offsets = calendar.event_offsets
+    for index, events in groupby(indices, calendar.calendar_of):
+        events = list(events)
+        for start in range(0, len(events), chunk_size):
+            yield index, [x for i in events[start:start+chunk_size] for x in (offsets[2*i], offsets[2*i+1])]
+
+
+def read_files_parallel(filenames, jobs=None, backend='auto', executor=None, errors='strict', **options):
+    """Yields pairs of filename and list of events of calendar files parsed concurrently.
+
+    Every file is parsed as a whole by one worker of a pool of processes, so
+    the overall time depends on the number of cores rather than the number
+    of files. The files are yielded in the given order as soon as they (and
+    all files before them) are parsed. If an executor is given (e.g. a pool
+    of threads where processes can not be started), it is used instead and
+    shut down at the end as well. Further options (columns, date_range) are
+    passed to the backend."""
+    filenames = list(filenames)
+    if executor is None:
+        executor = ProcessPoolExecutor(max(1, min(jobs or default_jobs(), len(filenames))))
+    backend = get_backend(backend).name
+    futures = []
+    try:
+        futures = [executor.submit(_read_file, filename, backend, errors, options) for filename in filenames]
+        for filename, future in zip(filenames, futures):
+            yield filename, future.result()
+    finally:
+        # files that are not needed anymore are not parsed at all
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class InterpreterContext(multiprocessing.context.SpawnContext):
+    """Context of multiprocessing starting its processes with a given Python interpreter.
+
+    multiprocessing knows only one interpreter for the whole process (see
+    multiprocessing.set_executable), which is shared with all other code
+    running in the same process, like everything within LibreOffice. This
+    context sets it only while starting one of its own processes."""
+
+    def __init__(self, executable):
+        super().__init__()
+        self.executable = executable
+
+    def Process(self, *args, **kwargs):
+        process = _InterpreterProcess(*args, **kwargs)
+        process.executable = self.executable
+        return process
+
+
+class _InterpreterProcess(multiprocessing.context.SpawnProcess):
+    """Process started with the interpreter of an InterpreterContext."""
+
+    executable = None
+
+    @staticmethod
+    def _Popen(process_obj):
+        with _executable_lock:
+            previous = spawn.get_executable()
+            spawn.set_executable(process_obj.executable)
+            try:
+                return multiprocessing.context.SpawnProcess._Popen(process_obj)
+            finally:
+                spawn.set_executable(previous)
@@ -0,0 +1,127 @@
+"""Event records as handed out by the readers of this package."""
+
+from datetime import datetime, timezone
+
+import attr
+
+
+# all attributes of an event that are exported, in the order of the columns
+ATTRIBUTES = ['name', 'begin', 'end', 'duration', 'uid', 'description', 'created',
+              'last_modified', 'location', 'url', 'transparent', 'alarms',
+              'attendees', 'categories', 'status', 'organizer', 'classification']
+
+# index of the VCALENDAR of an event within its file, only exported for files with multiple calendars
+CALENDAR = 'calendar'
+
+# properties (and sub-components) of a VEVENT needed for each attribute
+ATTRIBUTE_PROPERTIES = {
+    'name': ('SUMMARY',),
+    'begin': ('DTSTART',),
+    'end': ('DTSTART', 'DTEND', 'DURATION'),
+    'duration': ('DTSTART', 'DTEND', 'DURATION'),
+    'uid': ('UID',),
+    'description': ('DESCRIPTION',),
+    'created': ('DTSTAMP',),
+    'last_modified': ('LAST-MODIFIED',),
+    'location': ('LOCATION',),
+    'url': ('URL',),
+    'transparent': ('TRANSP',),
+    'alarms': ('VALARM',),
+    'attendees': ('ATTENDEE',),
+    'categories': ('CATEGORIES',),
+    'status': ('STATUS',),
+    'organizer': ('ORGANIZER',),
+    'classification': ('CLASS',),
+}
+
+
+def check_columns(columns):
+    """Returns the list of columns to export, all attributes if columns is None.
+
+    Raises a ValueError for unknown column names."""
+    if columns is None:
+        return list(ATTRIBUTES)
+    unknown = [c for c in columns if c not in ATTRIBUTES]
+    if unknown:
+        raise ValueError('Unknown columns: {}'.format(', '.join(unknown)))
+    return list(columns)
+
+
+def required_properties(columns):
+    """Returns the names of all properties needed for the given columns."""
+    return frozenset(p for c in check_columns(columns) for p in ATTRIBUTE_PROPERTIES[c])
+
+
+@attr.s(these=dict([(name, attr.ib(default=None)) for name in ATTRIBUTES] + [(CALENDAR, attr.ib(default=0))]),
+        slots=True, frozen=True, eq=False, repr=False, weakref_slot=False)
+class EventRecord:
+    """Holds the exported attributes of a single event.
+
+    Values are plain Python types: str for text, datetime for points in time,
+    timedelta for durations, bool for the transparency and tuples for
+    properties with multiple values (alarm triggers, attendee and category
+    names). Missing values are None or an empty tuple. Besides these
+    attributes, every record holds the index of its calendar.
+
+    Records are immutable and only hold their slots (no dict and no weak
+    references), so that many of them can be kept in memory, e.g. for
+    sorting. Constructing them is cheaper than setting the attributes one by
+    one."""
+
+    def __repr__(self):
+        return '<EventRecord {!r} at {}>'.format(self.name, self.begin)
+
+
+def fixed_offset(value):
+    """Replaces the timezone of a datetime (also within a tuple) by its fixed
+    UTC offset.
+
+    Timezones defined by VTIMEZONE components can not be pickled, but the
+    fixed offset is sufficient for the exported values."""
+    if isinstance(value, datetime) and value.tzinfo is not None and type(value.tzinfo) is not timezone:
+        return value.replace(tzinfo=timezone(value.utcoffset()))
+    if isinstance(value, tuple):
+        converted = tuple(fixed_offset(v) for v in value)
+        # tuples without timezones are kept, so that shared values stay shared
+        return converted if any(c is not v for c, v in zip(converted, value)) else value
+    return value
+
+
+def portable(record):
+    """Returns a copy of a record with fixed UTC offsets (see fixed_offset())."""
+    return EventRecord(**{name: fixed_offset(getattr(record, name)) for name in record.__slots__})
+
+
+def begin_order(record):
+    """Sort key ordering records by their begin, records without begin last."""
+    if record.begin is None:
+        return (True, 0.0)
+    return (False, record.begin.timestamp())
+
+
+def from_ics_event(event, columns=None, calendar=0, dictionary=None):
+    """Converts an event of the ics library into an event record.
+
+    If columns are given, only these attributes are copied. Repeated values
+    are shared via the dictionary, if one is given (see
+    icalreader.interning)."""
+    values = {name: _ics_value(event, name) for name in check_columns(columns)}
+    if dictionary is not None:
+        dictionary.intern_values(values)
+    return EventRecord(calendar=calendar, **values)
+
+
+def _ics_value(event, name):
+    """Returns a single attribute of an ics event as stored in a record."""
+    value = getattr(event, name)
+    if name == 'alarms':
+        # alarms are represented by their trigger
+        return tuple(getattr(a.trigger, 'datetime', a.trigger) for a in value)
+    elif name == 'attendees':
+        return tuple(a.email for a in value)
+    elif name == 'categories':
+        return tuple(value)
+    elif name == 'organizer':
+        return value.email if value else None
+    # Arrow objects are converted into datetime
+    return getattr(value, 'datetime', value)
@@ -0,0 +1,67 @@
+"""Conversion of points in time and durations into serial numbers.
+
+Spreadsheets store points in time as serial day numbers counted from a null
+date and durations as fractions of days. Whole columns are converted in a
+single batch, vectorized with NumPy if it is installed. Without NumPy, the
+same values are computed in plain Python.
+
+Points in time are converted with the time as shown in the calendar file,
+regardless of their timezone, which is how they are exported everywhere.
+"""
+
+from datetime import datetime, timedelta
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# day zero of the serial numbers (default null date of LibreOffice Calc)
+NULL_DATE = datetime(1899, 12, 30)
+
+_DAY = timedelta(days=1)
+
+# below this number of values, converting into arrays costs more than it gains
+_MIN_VECTORIZED = 64
+
+
+def serial_date(value):
+    """Returns the serial day number of a datetime."""
+    return (value.replace(tzinfo=None) - NULL_DATE) / _DAY
+
+
+def serial_duration(value):
+    """Returns a timedelta as fraction of days."""
+    return value / _DAY
+
+
+def serial_dates(values, empty=''):
+    """Converts a sequence of datetimes into serial day numbers.
+
+    Missing values (None) are replaced by empty."""
+    if numpy is None or len(values) < _MIN_VECTORIZED:
+        return [serial_date(v) if v else empty for v in values]
+    times = numpy.array([v.replace(tzinfo=None) if v else None for v in values], dtype='datetime64[us]')
+    days = (times - numpy.datetime64(NULL_DATE, 'us')) / numpy.timedelta64(1, 'D')
+    return _with_empty(days.tolist(), numpy.isnat(times).tolist(), empty)
+
+
+def serial_durations(values, empty=''):
+    """Converts a sequence of timedeltas into fractions of days.
+
+    Missing values (None) and zero durations are replaced by empty, like
+    all empty values are exported."""
+    if numpy is None or len(values) < _MIN_VECTORIZED:
+        return [serial_duration(v) if v else empty for v in values]
+    durations = numpy.array(values, dtype='timedelta64[us]')
+    days = durations / numpy.timedelta64(1, 'D')
+    missing = numpy.isnat(durations) | (durations == numpy.timedelta64(0, 'us'))
+    return _with_empty(days.tolist(), missing.tolist(), empty)
+
+
+def _with_empty(numbers, missing, empty):
+    """Replaces the numbers at all positions of missing values by empty."""
+    if any(missing):
+        return [empty if m else n for n, m in zip(numbers, missing)]
+    return numbers
@@ -0,0 +1,56 @@
+"""Distributing events over multiple worksheets.
+
+A worksheet of LibreOffice Calc holds at most 1,048,576 rows, so large
+calendars have to be split. Events are either split by row count only (a
+new sheet is started whenever a sheet is full) or by the year or month of
+their begin. Sheets of a year or month that would overflow are split by row
+count as well.
+"""
+
+from collections import Counter
+
+
+# rows of a sheet below the header row
+MAX_ROWS = 1048575
+
+ROWS = 'rows'
+YEAR = 'year'
+MONTH = 'month'
+SPLIT_POLICIES = (ROWS, YEAR, MONTH)
+
+
+class Sharding:
+    """Assigns events to shards, identified by a base name and a part number.
+
+    The base name is the year or month of the event (or None if the event
+    has no begin) or an empty string if only split by row count. Parts are
+    counted from 0 for every base name."""
+
+    def __init__(self, policy=ROWS, max_rows=MAX_ROWS):
+        if policy not in SPLIT_POLICIES:
+            raise ValueError('Unknown split policy: {}'.format(policy))
+        if not 0 < max_rows <= MAX_ROWS:
+            raise ValueError('Rows per sheet must be between 1 and {}'.format(MAX_ROWS))
+        self.policy = policy
+        self.max_rows = max_rows
+        self.counts = Counter()
+
+    def __repr__(self):
+        return '<Sharding by {}, {} rows per sheet>'.format(self.policy, self.max_rows)
+
+    def base_name(self, record):
+        """Returns the base name of the shard of an event."""
+        if self.policy == ROWS:
+            return ''
+        if record.begin is None:
+            return None
+        if self.policy == YEAR:
+            return record.begin.strftime('%Y')
+        return record.begin.strftime('%Y-%m')
+
+    def assign(self, record):
+        """Returns the shard (base name, part) of the next event."""
+        base = self.base_name(record)
+        part = self.counts[base] // self.max_rows
+        self.counts[base] += 1
+        return base, part
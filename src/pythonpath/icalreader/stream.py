@@ -0,0 +1,143 @@
+"""Streaming tokenizer for iCalendar files.
+
+The functions in this module never hold more than a single component of the
+calendar in memory. Physical lines are unfolded incrementally and every
+VEVENT (and VTIMEZONE) component is handed out as soon as its END line has
+been read.
+"""
+
+from itertools import chain
+
+
+class ParseError(ValueError):
+    """Raised when an iCalendar file is structurally invalid."""
+
+
+def unfold_lines(physical_lines):
+    """Yields logical content lines from an iterable of physical lines.
+
+    Lines starting with a space or a tab are continuations of the previous
+    line (RFC 5545, section 3.1). Empty lines are ignored, like a byte order
+    mark at the beginning of the first line."""
+    parts = []
+    physical_lines = iter(physical_lines)
+    first = next(physical_lines, None)
+    if first is not None:
+        physical_lines = chain([first.lstrip('\ufeff')], physical_lines)
+    for line in physical_lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        if parts and line[0] in ' \t':
+            parts.append(line[1:])
+            continue
+        if parts:
+            yield parts[0] if len(parts) == 1 else ''.join(parts)
+        parts = [line]
+    if parts:
+        yield parts[0] if len(parts) == 1 else ''.join(parts)
+
+
+def split_name(line):
+    """Returns the upper case name of a content line without parsing it."""
+    end = len(line)
+    for separator in ';:':
+        position = line.find(separator)
+        if position != -1 and position < end:
+            end = position
+    return line[:end].upper()
+
+
+def _component_name(line, keyword):
+    """Returns the component name if line is a BEGIN or END line, else None."""
+    if line[:len(keyword)].upper() == keyword:
+        return line[len(keyword):].strip().upper()
+    return None
+
+
+def iter_components(content_lines, components=('VCALENDAR', 'VTIMEZONE', 'VEVENT')):
+    """Yields all requested components of a calendar as (name, lines) tuples.
+
+    The lines of a component do not contain its own BEGIN and END lines, but
+    all lines of nested components (e.g. VALARM). Components that are not
+    requested (VTODO, VJOURNAL, ...) are skipped without being collected.
+
+    Files may contain multiple concatenated calendars. If VCALENDAR is
+    requested, the beginning of every calendar is marked by a tuple
+    ('VCALENDAR', index), so that the timezones of every calendar can be
+    kept apart. Otherwise a second calendar raises a NotImplementedError."""
+    calendars = 0
+    in_calendar = False
+    # name of the top level component that is currently read and its lines
+    current, lines, depth = None, None, 0
+    for line in content_lines:
+        if current is not None:
+            end = _component_name(line, 'END:') if line[0] in 'Ee' else None
+            if end is not None:
+                if depth == 0:
+                    if end != current:
+                        raise ParseError('Expected END:{}, got {}'.format(current, line))
+                    if lines is not None:
+                        yield current, lines
+                    current, lines = None, None
+                    continue
+                depth -= 1
+            elif line[0] in 'Bb' and _component_name(line, 'BEGIN:') is not None:
+                depth += 1
+            if lines is not None:
+                lines.append(line)
+            continue
+        begin = _component_name(line, 'BEGIN:')
+        if begin == 'VCALENDAR':
+            if in_calendar:
+                raise ParseError('Nested VCALENDAR found')
+            calendars += 1
+            if 'VCALENDAR' in components:
+                yield 'VCALENDAR', calendars - 1
+            elif calendars > 1:
+                raise NotImplementedError('Multiple calendars in one file are not supported')
+            in_calendar = True
+        elif begin is not None:
+            if not in_calendar:
+                raise ParseError('Component {} outside of VCALENDAR'.format(begin))
+            current = begin
+            lines = [] if begin in components else None
+            depth = 0
+        elif _component_name(line, 'END:') == 'VCALENDAR':
+            in_calendar = False
+        elif not in_calendar:
+            raise ParseError('Content line outside of VCALENDAR: {}'.format(line))
+    if current is not None or in_calendar:
+        raise ParseError('Unexpected end of file')
+    if calendars == 0:
+        raise ParseError('File does not contain a calendar')
+
+
+def select_lines(lines, names):
+    """Returns only those lines of a component that belong to the given
+    properties or sub-components.
+
+    Dropped lines are not parsed at all, so that e.g. long descriptions or
+    alarms that are not needed do not cost any decoding time."""
+    selected = []
+    # nesting level of the sub-component that is currently kept or skipped
+    depth, keep = 0, False
+    for line in lines:
+        name = split_name(line)
+        if name == 'BEGIN':
+            if depth == 0:
+                keep = line[6:].strip().upper() in names
+            depth += 1
+        elif name == 'END':
+            depth -= 1
+            if depth == 0 and keep:
+                keep = False
+                selected.append(line)
+                continue
+        elif depth == 0:
+            if name in names:
+                selected.append(line)
+            continue
+        if keep:
+            selected.append(line)
+    return selected
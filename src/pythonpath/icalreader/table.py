@@ -0,0 +1,207 @@
+"""Columnar tables of events.
+
+An EventTable holds the events of a calendar column by column instead of as
+one record per event: points in time and durations as arrays of 64 bit
+integers (microseconds), all other attributes dictionary encoded as arrays
+of codes into the list of their distinct values. Sorting and marshalling
+whole columns (via a function called once per distinct value) are
+vectorized with NumPy if it is installed. Without NumPy, the columns are
+kept in arrays of the standard library and processed in plain Python.
+
+Points in time are stored as the time shown in the calendar file
+(microseconds since 1970-01-01, regardless of the timezone) together with
+their UTC offset in seconds, so that exported values are the same as those
+of the records while sorting uses the actual instants.
+"""
+
+from array import array
+from datetime import datetime, timedelta
+
+from icalreader.records import CALENDAR, check_columns
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# columns with points in time and durations, which are stored as integers
+TIME_COLUMNS = ('begin', 'end', 'created', 'last_modified')
+DURATION_COLUMNS = ('duration',)
+
+# integer standing for a missing point in time or duration (NaT of NumPy)
+MISSING = -2**63
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_SECOND = timedelta(seconds=1)
+
+
+def _key(value):
+    """Returns the key of a value in the dictionary of its column.
+
+    Points in time within tuples (alarm triggers) that are equal as instants
+    but differ in their offset are shown differently, so they are kept apart."""
+    if isinstance(value, tuple):
+        return tuple((v, v.utcoffset()) if isinstance(v, datetime) else v for v in value)
+    return value
+
+
+class TableBuilder:
+    """Collects event records column by column into an EventTable."""
+
+    def __init__(self, columns=None):
+        self.columns = check_columns(columns) + [CALENDAR]
+        self.length = 0
+        self.times = {name: array('q') for name in self.columns
+                      if name in TIME_COLUMNS or name in DURATION_COLUMNS}
+        self.offsets = {name: array('i') for name in self.columns if name in TIME_COLUMNS}
+        self.codes = {name: array('i') for name in self.columns if name not in self.times}
+        self.values = {name: [] for name in self.codes}
+        self._dictionaries = {name: {} for name in self.codes}
+
+    def append(self, record):
+        """Adds the values of a record to the columns."""
+        for name, times in self.times.items():
+            value = getattr(record, name)
+            offsets = self.offsets.get(name)
+            if value is None:
+                times.append(MISSING)
+                if offsets is not None:
+                    offsets.append(0)
+            elif offsets is None:
+                times.append(value // _MICROSECOND)
+            else:
+                times.append((value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND)
+                offset = value.utcoffset()
+                offsets.append(offset // _SECOND if offset else 0)
+        for name, codes in self.codes.items():
+            value = getattr(record, name)
+            key = _key(value)
+            dictionary = self._dictionaries[name]
+            code = dictionary.get(key)
+            if code is None:
+                code = dictionary[key] = len(self.values[name])
+                self.values[name].append(value)
+            codes.append(code)
+        self.length += 1
+
+    def extend(self, records):
+        """Adds the values of all records to the columns."""
+        for record in records:
+            self.append(record)
+
+    def finish(self):
+        """Returns the table of all added records."""
+        self._dictionaries = None
+        return EventTable(self.columns, self.length, _vectors(self.times), _vectors(self.offsets),
+                          _vectors(self.codes), self.values)
+
+
+def _vectors(columns):
+    """Converts arrays of the standard library into NumPy arrays, if NumPy is installed."""
+    if numpy is None:
+        return columns
+    return {name: numpy.frombuffer(column, dtype=numpy.int64 if column.typecode == 'q' else numpy.int32)
+            if len(column) else numpy.zeros(0, dtype=numpy.int64 if column.typecode == 'q' else numpy.int32)
+            for name, column in columns.items()}
+
+
+def _take(column, indices):
+    """Returns the values of a column at the given indices."""
+    if numpy is not None:
+        return column[indices]
+    return array(column.typecode, [column[i] for i in indices])
+
+
+class EventTable:
+    """Events of a calendar stored column by column (see TableBuilder)."""
+
+    def __init__(self, columns, length, times, offsets, codes, values):
+        self.columns = columns
+        self.length = length
+        # microseconds of points in time (as shown in the file) and durations
+        self.times = times
+        # UTC offsets in seconds of the points in time
+        self.offsets = offsets
+        # codes into the lists of distinct values of all other columns
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return '<EventTable {} events, {} columns>'.format(len(self), len(self.columns))
+
+    @classmethod
+    def build(cls, records, columns=None):
+        """Builds the table of a stream of records.
+
+        If columns are given, only these attributes (and the calendar) are
+        stored."""
+        builder = TableBuilder(columns)
+        builder.extend(records)
+        return builder.finish()
+
+    def take(self, indices):
+        """Returns a new table with the events at the given indices."""
+        return EventTable(self.columns, len(indices),
+                          {name: _take(column, indices) for name, column in self.times.items()},
+                          {name: _take(column, indices) for name, column in self.offsets.items()},
+                          {name: _take(column, indices) for name, column in self.codes.items()},
+                          self.values)
+
+    def sort_order(self):
+        """Returns the indices of the events ordered by their begin, events
+        without begin last, like sorting records by records.begin_order().
+
+        Events with the same begin keep their order."""
+        begin, offsets = self.times['begin'], self.offsets['begin']
+        if numpy is not None:
+            instants = numpy.where(begin == MISSING, numpy.iinfo(numpy.int64).max,
+                                   begin - offsets.astype(numpy.int64) * 1000000)
+            return numpy.argsort(instants, kind='stable')
+        return sorted(range(len(self)), key=lambda i: (True, 0) if begin[i] == MISSING else
+                      (False, begin[i] - offsets[i] * 1000000))
+
+    def sorted(self):
+        """Returns a new table with the events ordered by their begin."""
+        return self.take(self.sort_order())
+
+    def map_column(self, name, function):
+        """Returns the values of a column converted by a function.
+
+        The function is called only once for every distinct value of the
+        column. Points in time are passed without timezone, as shown in the
+        calendar file, and missing values as None."""
+        if name in self.codes:
+            mapped = [function(v) for v in self.values[name]]
+            codes = self.codes[name]
+        else:
+            decode = _duration if name in DURATION_COLUMNS else _point_in_time
+            if numpy is not None:
+                distinct, codes = numpy.unique(self.times[name], return_inverse=True)
+                mapped = [function(decode(v)) for v in distinct.tolist()]
+            else:
+                cache = {}
+                mapped, codes = [], []
+                for v in self.times[name]:
+                    code = cache.get(v)
+                    if code is None:
+                        code = cache[v] = len(mapped)
+                        mapped.append(function(decode(v)))
+                    codes.append(code)
+        if numpy is not None:
+            return numpy.array(mapped + [None], dtype=object)[:-1][codes].tolist()
+        return [mapped[c] for c in codes]
+
+
+def _point_in_time(value):
+    """Converts microseconds into a point in time without timezone."""
+    return None if value == MISSING else _EPOCH + timedelta(microseconds=value)
+
+
+def _duration(value):
+    """Converts microseconds into a duration."""
+    return None if value == MISSING else timedelta(microseconds=value)
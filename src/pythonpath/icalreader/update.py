@@ -0,0 +1,73 @@
+"""Planning the update of previously imported events.
+
+An update compares the events of a calendar with the rows of an earlier
+import, matched by UID. Only events that are new or whose LAST-MODIFIED
+differs from the imported value have to be decoded and written again; rows
+whose UID no longer exists in the calendar are reported as deleted.
+
+Recurring events may share their UID with their modified occurrences, so
+events with the same UID are matched to the rows with that UID in order.
+"""
+
+from collections import defaultdict
+
+
+class UpdatePlan:
+    """Changed, new and deleted events of a calendar compared to imported rows."""
+
+    def __init__(self):
+        # pairs of (event index, row) of events that have to be written again
+        self.changed = []
+        # indices of events without an imported row
+        self.new = []
+        # rows whose events are no longer part of the calendar
+        self.deleted = []
+        # number of events that are unchanged
+        self.unchanged = 0
+
+    def __repr__(self):
+        return '<UpdatePlan {} changed, {} new, {} deleted, {} unchanged>'.format(
+            len(self.changed), len(self.new), len(self.deleted), self.unchanged)
+
+    def __bool__(self):
+        return bool(self.changed or self.new or self.deleted)
+
+    @classmethod
+    def build(cls, index, rows, events=None, revision=None):
+        """Compares the events of a calendar with the imported rows.
+
+        The index is an icalreader.index.EventIndex of the calendar and rows
+        is a sequence of (uid, last modified) pairs as imported, with the
+        position in the sequence as row number. If events are given, only
+        these indices (e.g. of a date range) are compared and rows are only
+        reported as deleted if their UID is not part of the calendar at all.
+        The revision function converts the raw LAST-MODIFIED value of an
+        event into the form stored in the rows; events without
+        LAST-MODIFIED are always written again."""
+        plan = cls()
+        imported = defaultdict(list)
+        for row, (uid, _) in enumerate(rows):
+            if uid:
+                imported[uid].append(row)
+        # rows are assigned in order to events with the same UID
+        for row_list in imported.values():
+            row_list.reverse()
+        for i in range(len(index)) if events is None else events:
+            uid = index.uids[i]
+            row_list = imported.get(uid)
+            if not row_list:
+                plan.new.append(i)
+                continue
+            row = row_list.pop()
+            last_modified = index.last_modified[i]
+            if last_modified is not None and revision is not None:
+                last_modified = revision(last_modified)
+            if last_modified is None or last_modified != rows[row][1]:
+                plan.changed.append((i, row))
+            else:
+                plan.unchanged += 1
+        # without selection, every row that was not matched is deleted
+        known = set(index.uids) if events is not None else ()
+        plan.deleted = sorted(row for uid, row_list in imported.items() if uid not in known
+                              for row in row_list)
+        return plan
@@ -0,0 +1,62 @@
+import sys
+import types
+from pathlib import Path
+from unittest import mock
+
+# the scripts and the iCalendar reader are not installed as packages
+SRC = Path(__file__).resolve().parent.parent / 'src'
+sys.path.insert(0, str(SRC / 'pythonpath'))
+sys.path.insert(0, str(SRC))
+
+DATA = Path(__file__).resolve().parent / 'data'
+
+
+class UnoException(Exception):
+    pass
+
+
+class RuntimeException(UnoException):
+    pass
+
+
+class NoConnectException(UnoException):
+    pass
+
+
+def uno_modules():
+    """Returns stubs of all modules imported by the extension from LibreOffice."""
+    def module(name, **attributes):
+        stub = types.ModuleType(name)
+        stub.__dict__.update(attributes)
+        return stub
+
+    def get_component_context():
+        # like at installation time, when there is no context
+        raise RuntimeException()
+
+    class Locale:
+        Language = Country = ''
+
+    return {
+        'uno': module('uno', getComponentContext=get_component_context, fileUrlToSystemPath=str,
+                      systemPathToFileUrl=str),
+        'msgbox': module('msgbox'),
+        'unohelper': module('unohelper', Base=type('Base', (), {}),
+                            ImplementationHelper=mock.MagicMock),
+        'com': module('com'),
+        'com.sun': module('com.sun'),
+        'com.sun.star': module('com.sun.star'),
+        'com.sun.star.util': module('com.sun.star.util', DateTime=object, Time=object),
+        'com.sun.star.lang': module('com.sun.star.lang', Locale=Locale),
+        'com.sun.star.uno': module('com.sun.star.uno', Exception=UnoException, RuntimeException=RuntimeException),
+        'com.sun.star.beans': module('com.sun.star.beans', PropertyValue=types.SimpleNamespace),
+        'com.sun.star.connection': module('com.sun.star.connection', NoConnectException=NoConnectException),
+        'com.sun.star.task': module('com.sun.star.task', XJobExecutor=type('XJobExecutor', (), {})),
+        'com.sun.star.awt': module('com.sun.star.awt', XActionListener=type('XActionListener', (), {})),
+        'com.sun.star.sheet': module('com.sun.star.sheet'),
+        'com.sun.star.sheet.SheetLinkMode': module('com.sun.star.sheet.SheetLinkMode', NONE=0, VALUE=1),
+        'com.sun.star.ui': module('com.sun.star.ui'),
+        'com.sun.star.ui.dialogs': module('com.sun.star.ui.dialogs'),
+        'com.sun.star.ui.dialogs.TemplateDescription': module('com.sun.star.ui.dialogs.TemplateDescription',
+                                                              FILEOPEN_SIMPLE=0),
+    }
@@ -0,0 +1,209 @@
+import os
+from datetime import date
+
+import pytest
+
+from icalreader import DateRange, RecordCache, get_backend, read_events
+from icalreader import cache as cache_module
+
+
+def calendar_lines(events):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+    for i in range(events):
+        lines += ['BEGIN:VEVENT', 'UID:{}'.format(i), 'SUMMARY:Event {}'.format(i % 7),
+                  'DTSTART:20240301T{:02d}0000Z'.format(i % 24), 'END:VEVENT']
+    return lines + ['END:VCALENDAR']
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    path = tmp_path / 'calendar.ics'
+    path.write_text('\r\n'.join(calendar_lines(2500)) + '\r\n')
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RecordCache(str(tmp_path / 'cache'))
+
+
+class Backend:
+    def __init__(self, version):
+        self._version = version
+
+    def version(self):
+        return self._version
+
+
+def store(cache, calendar, columns=None):
+    key = cache.key(calendar, get_backend('fast'), columns)
+    records = list(cache.store(key, read_events(calendar, columns=columns), columns, calendars=1))
+    return key, records
+
+
+def summary(records):
+    return [(r.uid, r.name, r.begin, r.calendar) for r in records]
+
+
+@pytest.mark.parametrize('options', [
+    {'columns': ['name']},
+    {'date_range': DateRange(date(2024, 3, 1))},
+    {'date_range': DateRange(end=date(2024, 3, 1))},
+    {'backend': Backend('other')},
+])
+def test_key_depends_on_options(cache, calendar, options):
+    default = {'backend': Backend('fast'), 'columns': None, 'date_range': None}
+    assert cache.key(calendar, **default) == cache.key(calendar, **default)
+    assert cache.key(calendar, **dict(default, **options)) != cache.key(calendar, **default)
+
+
+def test_key_depends_on_file(cache, calendar, tmp_path):
+    backend = get_backend('fast')
+    key = cache.key(calendar, backend)
+    # the same size, but another modification time
+    stat = os.stat(calendar)
+    os.utime(calendar, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.key(calendar, backend) != key
+    copy = tmp_path / 'copy.ics'
+    copy.write_bytes(open(calendar, 'rb').read())
+    os.utime(copy, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.key(str(copy), backend) != key
+
+
+def test_key_does_not_read_the_whole_file(cache, calendar, monkeypatch):
+    read = []
+    original = open
+
+    class File:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.f.close()
+
+        def seek(self, offset):
+            self.f.seek(offset)
+
+        def read(self, size=-1):
+            data = self.f.read(size)
+            read.append(len(data))
+            return data
+
+    monkeypatch.setattr('builtins.open', lambda *args, **kwargs: File(original(*args, **kwargs)))
+    cache.key(calendar, get_backend('fast'))
+    assert sum(read) < os.path.getsize(calendar)
+
+
+def test_store_and_load(cache, calendar):
+    key, records = store(cache, calendar)
+    calendars, cached = cache.load(key)
+    assert calendars == 1
+    assert summary(cached) == summary(records)
+
+
+def test_selected_columns(cache, calendar):
+    key, records = store(cache, calendar, ['name'])
+    _calendars, cached = cache.load(key)
+    cached = list(cached)
+    assert [r.name for r in cached] == [r.name for r in records]
+    assert cached[0].begin is None
+
+
+def test_missing_entry(cache, calendar):
+    assert cache.load(cache.key(calendar, get_backend('fast'))) is None
+
+
+def test_aborted_read_is_not_stored(cache, calendar):
+    key = cache.key(calendar, get_backend('fast'))
+    records = cache.store(key, read_events(calendar))
+    next(records)
+    records.close()
+    assert cache.load(key) is None
+    assert os.listdir(cache.directory) == []
+
+
+def test_failing_write_keeps_records(cache, calendar, monkeypatch):
+    dumped = []
+
+    def dump(value, f, protocol):
+        if dumped:
+            raise OSError('No space left on device')
+        dumped.append(value)
+    monkeypatch.setattr(cache_module.pickle, 'dump', dump)
+    key = cache.key(calendar, get_backend('fast'))
+    records = list(cache.store(key, read_events(calendar)))
+    assert len(records) == 2500
+    assert os.listdir(cache.directory) == []
+
+
+def test_unwritable_directory_keeps_records(tmp_path, calendar):
+    (tmp_path / 'file').write_text('')
+    cache = RecordCache(str(tmp_path / 'file' / 'cache'))
+    key = cache.key(calendar, get_backend('fast'))
+    assert len(list(cache.store(key, read_events(calendar)))) == 2500
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:len(data) // 2],
+    lambda data: data[:-4],
+    lambda data: data[:20] + bytes(len(data) - 20),
+    lambda data: b'',
+])
+def test_corrupt_entries_are_removed(cache, calendar, damage):
+    key, _records = store(cache, calendar)
+    path = cache.path(key)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(damage(data))
+    assert cache.load(key) is None
+    assert not os.path.exists(path)
+
+
+def test_entries_of_other_versions_are_ignored(cache, calendar, monkeypatch):
+    key, _records = store(cache, calendar)
+    monkeypatch.setattr(cache_module, 'CACHE_VERSION', cache_module.CACHE_VERSION + 1)
+    assert cache.load(key) is None
+
+
+def entry(cache, name, size, used):
+    path = cache.path(name)
+    with open(path, 'wb') as f:
+        f.write(bytes(size))
+    os.utime(path, ns=(used, used))
+    return path
+
+
+def test_evict_least_recently_used(cache):
+    os.makedirs(cache.directory)
+    old = entry(cache, 'old', 400, 10**18)
+    new = entry(cache, 'new', 400, 3 * 10**18)
+    middle = entry(cache, 'middle', 400, 2 * 10**18)
+    cache.max_size = 1000
+    cache.evict()
+    assert not os.path.exists(old)
+    assert os.path.exists(middle) and os.path.exists(new)
+    cache.max_size = 0
+    cache.evict()
+    assert cache.entries() == []
+
+
+def test_load_marks_entry_as_used(cache, calendar):
+    key, _records = store(cache, calendar)
+    path = cache.path(key)
+    os.utime(path, ns=(0, 0))
+    os.makedirs(cache.directory, exist_ok=True)
+    other = entry(cache, 'other', 100, 10**18)
+    cache.load(key)
+    cache.max_size = os.path.getsize(path)
+    cache.evict()
+    assert os.path.exists(path) and not os.path.exists(other)
+
+
+def test_clear(cache, calendar):
+    store(cache, calendar)
+    cache.clear()
+    assert cache.entries() == []
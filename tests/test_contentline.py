@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from dateutil.tz import gettz
+
+from icalreader.contentline import (parse_contentline, parse_datetime, parse_duration, split_text_list,
+                                    unescape_text)
+from icalreader.stream import ParseError, unfold_lines
+
+
+def test_unfold_lines_joins_continuations():
+    lines = ['SUMMARY:A long\r\n', '  summary\r\n', '\twith tab\r\n', 'UID:1\r\n']
+    assert list(unfold_lines(lines)) == ['SUMMARY:A long summarywith tab', 'UID:1']
+
+
+def test_unfold_lines_skips_empty_lines():
+    assert list(unfold_lines(['UID:1\n', '\r\n', '   \n', 'UID:2'])) == ['UID:1', 'UID:2']
+
+
+def test_unescape_text():
+    assert unescape_text(r'a\, b\; c\nd\Ne\\f') == 'a, b; c\nd\ne\\f'
+    assert unescape_text('plain') == 'plain'
+
+
+def test_split_text_list_keeps_escaped_commas():
+    assert split_text_list('a,b') == ['a', 'b']
+    assert split_text_list(r'Room 1\, Building A,Lab\;2') == ['Room 1, Building A', 'Lab;2']
+
+
+def test_parse_contentline_without_parameters():
+    assert parse_contentline('summary:Lunch: Pizza; Salad') == ('SUMMARY', {}, 'Lunch: Pizza; Salad')
+
+
+def test_parse_contentline_quoted_parameters():
+    name, params, value = parse_contentline('ORGANIZER;CN="Doe; Jane: Head";ROLE=CHAIR:mailto:jane@example.org')
+    assert name == 'ORGANIZER'
+    assert params == {'CN': ['Doe; Jane: Head'], 'ROLE': ['CHAIR']}
+    assert value == 'mailto:jane@example.org'
+
+
+def test_parse_contentline_multiple_parameter_values():
+    _name, params, value = parse_contentline('ATTENDEE;MEMBER="mailto:a@x.org","mailto:b@x.org":mailto:c@x.org')
+    assert params == {'MEMBER': ['mailto:a@x.org', 'mailto:b@x.org']}
+    assert value == 'mailto:c@x.org'
+
+
+@pytest.mark.parametrize('line', ['SUMMARY', 'DTSTART;TZID="Europe/Berlin:20240101T100000', 'X;Y:1'])
+def test_parse_contentline_invalid(line):
+    with pytest.raises(ParseError):
+        parse_contentline(line)
+
+
+def test_parse_datetime_date():
+    assert parse_datetime('20240501') == datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def test_parse_datetime_utc():
+    assert parse_datetime('20240301T140000Z', gettz('Europe/Berlin')) == \
+        datetime(2024, 3, 1, 14, tzinfo=timezone.utc)
+
+
+def test_parse_datetime_with_timezone():
+    value = parse_datetime('20240715T100000', gettz('Europe/Berlin'))
+    assert value.replace(tzinfo=None) == datetime(2024, 7, 15, 10)
+    assert value.utcoffset() == timedelta(hours=2)
+
+
+def test_parse_datetime_floating_is_utc():
+    assert parse_datetime('20240715T100000') == datetime(2024, 7, 15, 10, tzinfo=timezone.utc)
+
+
+def test_parse_datetime_invalid():
+    with pytest.raises(ParseError):
+        parse_datetime('2024013')
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('PT15M', timedelta(minutes=15)),
+    ('-PT15M', -timedelta(minutes=15)),
+    ('P1W', timedelta(weeks=1)),
+    ('P1DT2H3M4S', timedelta(days=1, hours=2, minutes=3, seconds=4)),
+    ('+P2D', timedelta(days=2)),
+])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+@pytest.mark.parametrize('value', ['P', 'PT', '15M', 'P1H'])
+def test_parse_duration_invalid(value):
+    with pytest.raises(ParseError):
+        parse_duration(value)
@@ -0,0 +1,97 @@
+"""Tests of the batch conversion with the UNO modules replaced by stubs."""
+
+import sys
+import queue
+from unittest import mock
+
+import pytest
+from click.testing import CliRunner
+
+from conftest import NoConnectException, RuntimeException, UnoException, uno_modules
+
+
+@pytest.fixture
+def convert_ods(monkeypatch):
+    for name, stub in uno_modules().items():
+        monkeypatch.setitem(sys.modules, name, stub)
+    for name in ('convert_ods', 'import_ical'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    import convert_ods
+    yield convert_ods
+    for name in ('convert_ods', 'import_ical'):
+        sys.modules.pop(name, None)
+
+
+def job_queue(*files):
+    jobs = queue.Queue()
+    for name in files:
+        jobs.put((name, name + '.ods'))
+    return jobs
+
+
+def test_failed_files_do_not_stop_the_worker(convert_ods, monkeypatch):
+    errors = {'io.ics': UnoException('IOException'), 'os.ics': OSError('disk full')}
+
+    def convert(connection, icalendar_file, *args):
+        if icalendar_file in errors:
+            raise errors[icalendar_file]
+    monkeypatch.setattr(convert_ods, 'convert', convert)
+    failed = []
+    convert_ods.work(mock.Mock(), job_queue('io.ics', 'os.ics', 'fine.ics'), 'ods', None, 2, failed)
+    assert failed == ['io.ics', 'os.ics']
+
+
+def test_files_left_when_the_office_can_not_be_restarted(convert_ods, monkeypatch):
+    monkeypatch.setattr(convert_ods, 'convert', mock.Mock(side_effect=RuntimeException()))
+    connection = mock.Mock(**{'is_alive.return_value': False, 'reconnect.side_effect': NoConnectException()})
+    jobs = job_queue('first.ics', 'second.ics', 'third.ics')
+    failed = []
+    convert_ods.work(connection, jobs, 'ods', None, 2, failed)
+    assert failed == ['first.ics']
+    assert convert_ods.drain(jobs) == ['second.ics', 'third.ics']
+    assert jobs.empty()
+
+
+@pytest.fixture
+def offices(convert_ods, monkeypatch):
+    """Replaces the offices by mocks and returns the created connections."""
+    created = []
+
+    def connection(host, port, program=None):
+        created.append((host, port))
+        return mock.Mock()
+    monkeypatch.setattr(convert_ods, 'OfficeConnection', connection)
+    monkeypatch.setattr(convert_ods, 'convert', mock.Mock())
+    return created
+
+
+@pytest.mark.parametrize('connect, expected', [
+    ('otherhost:2010', ('otherhost', 2010)),
+    ('otherhost', ('otherhost', 2005)),
+    (':2010', ('localhost', 2010)),
+])
+def test_connect_option(convert_ods, offices, tmp_path, connect, expected):
+    calendar = tmp_path / 'calendar.ics'
+    calendar.write_text('')
+    result = CliRunner().invoke(convert_ods.convert_ods, ['--connect', connect, '--port', '2005', str(calendar)])
+    assert result.exit_code == 0, result.output
+    assert offices == [expected]
+
+
+def test_invalid_port(convert_ods, offices, tmp_path):
+    calendar = tmp_path / 'calendar.ics'
+    calendar.write_text('')
+    result = CliRunner().invoke(convert_ods.convert_ods, ['--connect', 'otherhost:office', str(calendar)])
+    assert result.exit_code == 2
+    assert 'office is not a valid port' in result.output
+
+
+def test_output_dir_is_created(convert_ods, offices, tmp_path):
+    calendar = tmp_path / 'calendar.ics'
+    calendar.write_text('')
+    output_dir = tmp_path / 'out' / 'sheets'
+    result = CliRunner().invoke(convert_ods.convert_ods, ['--output-dir', str(output_dir), str(calendar)])
+    assert result.exit_code == 0, result.output
+    assert output_dir.is_dir()
+    convert_ods.convert.assert_called_once()
+    assert convert_ods.convert.call_args.args[2] == str(output_dir / 'calendar.ods')
@@ -0,0 +1,109 @@
+import csv
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from icalreader import BACKENDS, get_backend
+from icalreader.fastparser import Timezones, parse_event, read_events
+
+from conftest import DATA
+
+
+CALENDAR = DATA / 'calendar.ics'
+
+
+def read_records(backend='fast', **options):
+    return list(get_backend(backend).read_events(str(CALENDAR), **options))
+
+
+def read_rows(path):
+    """Reads a written CSV file, ignoring the order of attendees and categories,
+    which the ics library keeps in sets."""
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        for name in ('attendees', 'categories'):
+            row[name] = sorted(row[name].split(', '))
+    return rows
+
+
+def test_read_events():
+    records = read_records()
+    assert [r.uid for r in records] == ['meeting-1@example.org', 'holiday-1@example.org',
+                                         'workshop-1@example.org', 'call-1@example.org']
+
+
+def test_folded_and_escaped_text():
+    meeting = read_records()[0]
+    assert meeting.name == 'Planning, budget; and a very long summary that is folded overtwo physical lines'
+    assert meeting.description == 'First line\nsecond line'
+    assert meeting.location == 'Room 1, Building A'
+    assert meeting.categories == ('Meeting', 'Budget')
+
+
+def test_quoted_parameters():
+    meeting = read_records()[0]
+    assert meeting.organizer == 'jane@example.org'
+    assert meeting.attendees == ('john@example.org',)
+
+
+def test_tzid_begin_and_end():
+    meeting = read_records()[0]
+    assert meeting.begin.replace(tzinfo=None) == datetime(2024, 1, 15, 10)
+    assert meeting.begin.utcoffset() == timedelta(hours=1)
+    assert meeting.duration == timedelta(hours=1, minutes=30)
+
+
+def test_vtimezone_definition():
+    workshop = read_records()[2]
+    assert workshop.begin.replace(tzinfo=None) == datetime(2024, 7, 10, 9)
+    assert workshop.begin.utcoffset() == timedelta(hours=2)
+
+
+def test_all_day_event_lasts_one_day():
+    holiday = read_records()[1]
+    assert holiday.begin == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert holiday.end == datetime(2024, 5, 2, tzinfo=timezone.utc)
+    assert holiday.transparent is True
+
+
+def test_duration_gives_end():
+    workshop = read_records()[2]
+    assert workshop.duration == timedelta(hours=2, minutes=30)
+    assert workshop.end.replace(tzinfo=None) == datetime(2024, 7, 10, 11, 30)
+
+
+def test_utc_times():
+    call = read_records()[3]
+    assert call.begin == datetime(2024, 3, 1, 14, tzinfo=timezone.utc)
+    assert call.end - call.begin == timedelta(minutes=30)
+
+
+def test_alarm_trigger():
+    assert read_records()[0].alarms == (-timedelta(minutes=15),)
+
+
+def test_selected_columns_only():
+    meeting = read_records(columns=['name', 'begin'])[0]
+    assert meeting.begin is not None
+    assert meeting.location is None and meeting.categories is None
+
+
+def test_unknown_tzid_falls_back_to_utc():
+    record = parse_event(['DTSTART;TZID=Nowhere/Unknown:20240101T100000'], Timezones())
+    assert record.begin == datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+
+
+def test_read_events_from_lines():
+    lines = ['BEGIN:VCALENDAR', 'BEGIN:VEVENT', 'SUMMARY:Only', 'END:VEVENT', 'END:VCALENDAR']
+    assert [r.name for r in read_events(lines)] == ['Only']
+
+
+@pytest.mark.parametrize('backend', ['ics', 'icalendar'])
+def test_csv_parity(backend, tmp_path):
+    if not any(b.name == backend and b.is_available() for b in BACKENDS):
+        pytest.skip('{} is not installed'.format(backend))
+    import ical2csv
+    ical2csv.write_csv_file(read_records(), tmp_path / 'fast.csv')
+    ical2csv.write_csv_file(read_records(backend), tmp_path / 'other.csv')
+    assert read_rows(tmp_path / 'fast.csv') == read_rows(tmp_path / 'other.csv')
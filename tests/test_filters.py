@@ -0,0 +1,126 @@
+from datetime import date, datetime
+
+import pytest
+
+from icalreader import DateRange, read_events
+from icalreader.filters import UNBOUNDED, event_span, peek_properties
+
+
+MARCH = DateRange(date(2024, 3, 1), date(2024, 3, 31))
+
+
+def matches(date_range, *lines):
+    return date_range.matches_lines(['UID:1'] + list(lines))
+
+
+@pytest.mark.parametrize('lines, expected', [
+    # ends exactly when the range starts
+    (('DTSTART:20240229T230000', 'DTEND:20240301T000000'), False),
+    # ends one second into the range
+    (('DTSTART:20240229T230000', 'DTEND:20240301T000001'), True),
+    # without end, starting exactly when the range starts
+    (('DTSTART:20240301T000000',), True),
+    (('DTSTART:20240331T235959', 'DTEND:20240401T010000'), True),
+    # starts exactly when the range ends
+    (('DTSTART:20240401T000000', 'DTEND:20240401T010000'), False),
+    # covers the whole range
+    (('DTSTART:20240201T000000', 'DTEND:20240501T000000'), True),
+    (('DTSTART:20240228T100000', 'DURATION:P2D'), True),
+    (('DTSTART:20240228T100000', 'DURATION:PT1H'), False),
+])
+def test_range_boundaries(lines, expected):
+    assert matches(MARCH, *lines) is expected
+
+
+@pytest.mark.parametrize('lines, expected', [
+    # an all-day event without end lasts until the next day
+    (('DTSTART;VALUE=DATE:20240229',), False),
+    (('DTSTART;VALUE=DATE:20240301',), True),
+    (('DTSTART;VALUE=DATE:20240331',), True),
+    (('DTSTART;VALUE=DATE:20240401',), False),
+    (('DTSTART;VALUE=DATE:20240228', 'DTEND;VALUE=DATE:20240302'), True),
+    (('DTSTART;VALUE=DATE:20240228', 'DTEND;VALUE=DATE:20240301'), False),
+])
+def test_all_day_events(lines, expected):
+    assert matches(MARCH, *lines) is expected
+
+
+@pytest.mark.parametrize('lines, expected', [
+    # times are compared as written in the file, regardless of the timezone
+    (('DTSTART;TZID=America/New_York:20240331T230000',), True),
+    (('DTSTART;TZID="Europe/Berlin":20240401T003000',), False),
+    (('DTSTART;TZID=Europe/Berlin:20240229T230000', 'DTEND;TZID=Europe/Berlin:20240301T003000'), True),
+    (('DTSTART:20240331T230000Z',), True),
+])
+def test_tzid_start_times(lines, expected):
+    assert matches(MARCH, *lines) is expected
+
+
+@pytest.mark.parametrize('lines, expected', [
+    # starts before the range, but occurs until within the range
+    (('DTSTART:20240101T100000', 'DTEND:20240101T110000', 'RRULE:FREQ=WEEKLY;UNTIL=20240305T100000Z'), True),
+    (('DTSTART;VALUE=DATE:20240101', 'RRULE:FREQ=DAILY;UNTIL=20240301'), True),
+    (('DTSTART:20240101T100000', 'RRULE:FREQ=WEEKLY;UNTIL=20240215T100000Z'), False),
+    # recurrences without end or with additional dates are always kept
+    (('DTSTART:20240101T100000', 'RRULE:FREQ=WEEKLY;COUNT=4'), True),
+    (('DTSTART:20240101T100000', 'RRULE:FREQ=WEEKLY'), True),
+    (('DTSTART:20240101T100000', 'RDATE:20240102T100000'), True),
+    # recurrences never take place before their start
+    (('DTSTART:20240415T100000', 'RRULE:FREQ=WEEKLY'), False),
+])
+def test_recurring_events(lines, expected):
+    assert matches(MARCH, *lines) is expected
+
+
+def test_events_without_start_are_kept():
+    assert matches(MARCH, 'SUMMARY:Unplaced')
+
+
+def test_open_ranges():
+    assert matches(DateRange(date(2024, 3, 1)), 'DTSTART:20300101T000000')
+    assert not matches(DateRange(date(2024, 3, 1)), 'DTSTART:20240229T100000')
+    assert matches(DateRange(end=date(2024, 3, 31)), 'DTSTART:19700101T000000')
+    assert not matches(DateRange(end=date(2024, 3, 31)), 'DTSTART:20240401T100000')
+    assert not DateRange()
+
+
+def test_properties_of_alarms_are_ignored():
+    lines = ['DTSTART:20240101T100000', 'BEGIN:VALARM', 'DURATION:P100D', 'END:VALARM']
+    assert peek_properties(lines, ('DTSTART', 'DURATION')) == {'DTSTART': '20240101T100000'}
+    assert not matches(MARCH, *lines)
+
+
+def test_event_span():
+    assert event_span({}) == (None, None)
+    assert event_span({'DTSTART': '20240101'}) == ('20240101T000000', '20240102T000000')
+    assert event_span({'DTSTART': '20240101T1000', 'RRULE': 'FREQ=DAILY'}) == ('20240101T100000', UNBOUNDED)
+
+
+def test_invalid_range():
+    with pytest.raises(ValueError):
+        DateRange(date(2024, 3, 31), date(2024, 3, 1))
+
+
+def test_datetimes_are_cut_to_dates():
+    date_range = DateRange(datetime(2024, 3, 1, 12), datetime(2024, 3, 31, 12))
+    assert (date_range.start, date_range.end) == (date(2024, 3, 1), date(2024, 3, 31))
+
+
+def test_from_argument():
+    date_range = DateRange.from_argument('sheet=2;from=2024-03-01&to=2024-03-31')
+    assert (date_range.start, date_range.end) == (date(2024, 3, 1), date(2024, 3, 31))
+    assert DateRange.from_argument('sheet=2') is None
+
+
+@pytest.mark.parametrize('backend', ['fast', 'icalendar', 'ics'])
+def test_backends_skip_events_outside(backend):
+    pytest.importorskip({'fast': 'icalreader', 'icalendar': 'icalendar', 'ics': 'ics'}[backend])
+    lines = ['BEGIN:VCALENDAR',
+             'BEGIN:VEVENT', 'UID:1', 'SUMMARY:Before', 'DTSTART:20240220T100000Z', 'END:VEVENT',
+             'BEGIN:VEVENT', 'UID:2', 'SUMMARY:Within', 'DTSTART:20240310T100000Z', 'END:VEVENT',
+             'BEGIN:VEVENT', 'UID:3', 'SUMMARY:Weekly', 'DTSTART:20240201T100000Z',
+             'RRULE:FREQ=WEEKLY;UNTIL=20240307T100000Z', 'END:VEVENT',
+             'BEGIN:VEVENT', 'UID:4', 'SUMMARY:After', 'DTSTART:20240410T100000Z', 'END:VEVENT',
+             'END:VCALENDAR']
+    records = read_events(lines, backend, date_range=MARCH)
+    assert [r.name for r in records] == ['Within', 'Weekly']
@@ -0,0 +1,52 @@
+import pytest
+
+import ical2csv
+from icalreader import RecordCache
+
+
+def calendar_lines(name):
+    return ['BEGIN:VCALENDAR', 'VERSION:2.0', 'BEGIN:VEVENT', 'UID:{}'.format(name), 'SUMMARY:{}'.format(name),
+            'DTSTART:20240101T100000Z', 'END:VEVENT', 'END:VCALENDAR']
+
+
+@pytest.fixture
+def two_calendars(tmp_path):
+    path = tmp_path / 'two.ics'
+    path.write_text('\r\n'.join(calendar_lines('First') + calendar_lines('Second')) + '\r\n')
+    return str(path)
+
+
+@pytest.fixture
+def no_scan(monkeypatch):
+    def count_calendars(filename):
+        raise AssertionError('the calendar file is scanned for its calendars')
+    monkeypatch.setattr(ical2csv, 'count_calendars', count_calendars)
+
+
+@pytest.mark.parametrize('options', [{}, {'mapped': True}, {'indexed': True}])
+def test_calendar_count(two_calendars, tmp_path, options):
+    calendars, events = ical2csv.open_ical_file(two_calendars, cache=RecordCache(str(tmp_path / 'cache')),
+                                                **options)
+    assert calendars == 2
+    assert [(e.name, e.calendar) for e in events] == [('First', 0), ('Second', 1)]
+
+
+def test_cache_hits_are_not_scanned(two_calendars, tmp_path, request):
+    cache = RecordCache(str(tmp_path / 'cache'))
+    calendars, events = ical2csv.open_ical_file(two_calendars, cache=cache)
+    list(events)
+    request.getfixturevalue('no_scan')
+    calendars, events = ical2csv.open_ical_file(two_calendars, cache=cache)
+    assert calendars == 2
+    assert [e.calendar for e in events] == [0, 1]
+
+
+@pytest.mark.parametrize('options', [{'mapped': True}, {'indexed': True}, {'jobs': 2}])
+def test_mapped_files_are_not_scanned(two_calendars, no_scan, options):
+    calendars, events = ical2csv.open_ical_file(two_calendars, **options)
+    assert calendars == 2
+    assert len(list(events)) == 2
+
+
+def test_read_ical_file_does_not_count(two_calendars, no_scan):
+    assert [e.name for e in ical2csv.read_ical_file(two_calendars)] == ['First', 'Second']
@@ -0,0 +1,24 @@
+import pytest
+
+from icalreader import ParseError
+
+icsparser = pytest.importorskip('icalreader.icsparser')
+
+
+def read(*event_lines):
+    lines = ['BEGIN:VCALENDAR', 'BEGIN:VEVENT'] + list(event_lines) + ['END:VEVENT', 'END:VCALENDAR']
+    return list(icsparser.read_events(lines))
+
+
+def test_read_event():
+    assert [r.name for r in read('UID:1', 'SUMMARY:Lunch')] == ['Lunch']
+
+
+@pytest.mark.parametrize('lines', [
+    ('UID:1', 'CATEGORIES:A', 'CATEGORIES:B'),
+    ('UID:1', 'BEGIN:VALARM', 'ACTION:DISPLAY', 'TRIGGER:-PT5M', 'END:VALARM'),
+    ('UID:1', 'DTSTART;X=1'),
+])
+def test_invalid_events_raise_parse_error(lines):
+    with pytest.raises(ParseError):
+        read(*lines)
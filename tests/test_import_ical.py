@@ -0,0 +1,228 @@
+"""Tests of the LibreOffice extension with the UNO modules replaced by stubs.
+
+The worksheet is simulated by FakeSheet, all other UNO objects by mocks."""
+
+import csv
+import sys
+import types
+from datetime import date
+from unittest import mock
+
+import pytest
+
+from icalreader import ATTRIBUTES, read_events
+
+from conftest import uno_modules
+
+
+@pytest.fixture
+def import_ical(monkeypatch):
+    for name, stub in uno_modules().items():
+        monkeypatch.setitem(sys.modules, name, stub)
+    monkeypatch.delitem(sys.modules, 'import_ical', raising=False)
+    import import_ical
+    yield import_ical
+    sys.modules.pop('import_ical', None)
+
+
+class FakeRange:
+    """A range of cells of a FakeSheet."""
+
+    def __init__(self, sheet, left, top, right, bottom):
+        self.sheet = sheet
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+
+    def getDataArray(self):
+        return tuple(tuple(self.sheet.cells.get((column, row), '') for column in range(self.left, self.right + 1))
+                     for row in range(self.top, self.bottom + 1))
+
+    def setDataArray(self, rows):
+        assert len(rows) == self.bottom - self.top + 1
+        for row, values in enumerate(rows, self.top):
+            assert len(values) == self.right - self.left + 1
+            for column, value in enumerate(values, self.left):
+                self.sheet.cells[column, row] = value
+
+    def getRangeAddress(self):
+        return types.SimpleNamespace(StartRow=self.top, EndRow=self.bottom)
+
+
+class FakeCell:
+    CharHeight = 10
+
+    def __init__(self, sheet, column, row):
+        self.__dict__.update(sheet=sheet, column=column, row=row)
+
+    def __setattr__(self, name, value):
+        assert name == 'String'
+        self.sheet.cells[self.column, self.row] = value
+
+
+class FakeSheet:
+    """A worksheet holding the values of its cells in a dict."""
+
+    def __init__(self):
+        self.cells = {}
+
+    def getCellRangeByPosition(self, left, top, right, bottom):
+        return FakeRange(self, left, top, right, bottom)
+
+    def getCellByPosition(self, column, row):
+        return FakeCell(self, column, row)
+
+    def getColumns(self):
+        return mock.MagicMock()
+
+    def createCursor(self):
+        last_row = max((row for _column, row in self.cells), default=0)
+        return mock.Mock(**{'getRangeAddress.return_value': types.SimpleNamespace(EndRow=last_row)})
+
+    def row(self, row):
+        return [self.cells.get((column, row), '') for column in range(len(ATTRIBUTES) + 1)]
+
+
+def office_with(sheet):
+    """Returns a context of an office whose current document shows the sheet."""
+    ctx = mock.MagicMock()
+    ctx.getByName.return_value.getPackageLocation.return_value = ''
+    doc = ctx.ServiceManager.createInstanceWithContext.return_value.getCurrentComponent.return_value
+    doc.getCurrentController.return_value.getActiveSheet.return_value = sheet
+    return ctx
+
+
+def write_calendar(path, events):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+    for uid, name, modified in events:
+        lines += ['BEGIN:VEVENT', 'UID:{}'.format(uid), 'SUMMARY:{}'.format(name),
+                  'DTSTAMP:20240101T000000Z', 'DTSTART:20240201T{:02d}0000Z'.format(len(lines) % 24),
+                  'LAST-MODIFIED:{}'.format(modified), 'END:VEVENT']
+    path.write_text('\r\n'.join(lines + ['END:VCALENDAR']) + '\r\n')
+    return str(path)
+
+
+def test_update_table(import_ical, tmp_path):
+    events = [('event-{}'.format(i), 'Event {}'.format(i), '20240101T120000Z') for i in range(300)]
+    old_file = write_calendar(tmp_path / 'old.ics', events)
+    # the new calendar has a changed, a deleted and a new event
+    events[10] = ('event-10', 'Changed event', '20240301T120000Z')
+    del events[20]
+    events.append(('event-new', 'New event', '20240301T120000Z'))
+    new_file = write_calendar(tmp_path / 'new.ics', events)
+
+    sheet = FakeSheet()
+    importer = import_ical.IcalImporter(office_with(sheet), interactive=False)
+    sheet.getCellRangeByPosition(0, 0, len(ATTRIBUTES) - 1, 0).setDataArray((tuple(ATTRIBUTES),))
+    rows = importer.marshal_rows(list(read_events(old_file)), ATTRIBUTES)
+    sheet.getCellRangeByPosition(0, 1, len(ATTRIBUTES) - 1, len(rows)).setDataArray(rows)
+    unchanged = sheet.row(1)
+
+    assert importer.update_table(office_with(sheet), new_file, mark_deleted=True)
+
+    name = ATTRIBUTES.index('name')
+    deleted = len(ATTRIBUTES)
+    assert sheet.row(0)[deleted] == 'deleted'
+    assert sheet.row(1) == unchanged
+    assert sheet.row(11)[name] == 'Changed event'
+    assert sheet.row(21)[name] == 'Event 20' and sheet.row(21)[deleted] == 'True'
+    assert sheet.row(301)[name] == 'New event'
+    assert [r for r in range(1, 302) if sheet.row(r)[deleted]] == [21]
+
+
+def csv_import(import_ical, shards, cancel_at=None):
+    """Writes rows of the given number per shard with the CSV writer and
+    loads them, reporting to an interactive progress.
+
+    Returns the values shown by the progress indicator and the loaded shards."""
+    sheets = {}
+    ctx = office_with(FakeSheet())
+    doc = mock.MagicMock()
+    total = sum(shards)
+    columns = ['name']
+    with import_ical.CsvWriter(lambda shard: sheets.setdefault(shard, mock.MagicMock()), mock.Mock(),
+                               columns) as writer:
+        with import_ical.ImportProgress(ctx, doc, 'Import', total, mock.Mock(),
+                                        final=total if writer.LOADS_ON_FINISH else 0) as progress:
+            indicator = progress.indicator
+            for shard, rows in enumerate(shards):
+                writer.write(shard, [('Event',)] * rows)
+                progress.advance(rows)
+            if cancel_at is not None:
+                # the user cancels while the given number of files has been linked
+                links = []
+
+                def link(*args):
+                    links.append(args)
+                    if len(links) == cancel_at:
+                        progress.cancelled = True
+                for shard in range(len(shards)):
+                    writer.open_sheet(shard).link.side_effect = link
+            loaded = writer.finish(progress)
+    return [c.args[0] for c in indicator.setValue.call_args_list], loaded, indicator
+
+
+def test_csv_loading_is_part_of_the_progress(import_ical):
+    values, loaded, indicator = csv_import(import_ical, [30, 10])
+    indicator.start.assert_called_once_with('Import', 80)
+    # writing the rows only reaches half of the progress
+    assert values[:2] == [30, 40]
+    assert max(values[:-1]) < 80 and values[-1] == 80
+    assert sorted(loaded) == [0, 1]
+
+
+def test_cancel_while_loading_csv_files(import_ical):
+    _values, loaded, _indicator = csv_import(import_ical, [10, 10, 10], cancel_at=1)
+    assert list(loaded) == [0]
+
+
+@pytest.mark.parametrize('executable', ['', None])
+def test_file_pool_without_executable(import_ical, monkeypatch, executable):
+    monkeypatch.setattr(sys, 'executable', executable)
+    with import_ical.file_pool(2) as pool:
+        assert isinstance(pool, import_ical.ThreadPoolExecutor)
+
+
+def test_file_pool_without_interpreter(import_ical, monkeypatch, tmp_path):
+    monkeypatch.setattr(sys, 'executable', str(tmp_path / 'soffice.bin'))
+    with import_ical.file_pool(2) as pool:
+        assert isinstance(pool, import_ical.ThreadPoolExecutor)
+
+
+def test_file_pool_with_interpreter(import_ical, monkeypatch, tmp_path):
+    (tmp_path / 'python').write_text('')
+    monkeypatch.setattr(sys, 'executable', str(tmp_path / 'soffice.bin'))
+    with import_ical.file_pool(2) as pool:
+        assert pool._mp_context.executable == str(tmp_path / 'python')
+
+
+def test_csv_numbers_in_fixed_point(import_ical):
+    duration = 1 / 86400 / 1.2
+    with import_ical.CsvWriter(mock.Mock(), mock.Mock(), ['begin', 'duration', 'name', 'calendar']) as writer:
+        writer.write(0, [(45292.5, duration, '1e-05', 1), (45292.0, -0.25, '', 0)])
+        f = writer.files[0][1]
+        f.close()
+        with open(f.name, newline='') as csv_file:
+            rows = list(csv.reader(csv_file))
+    assert rows[1:] == [['45292.5', '0.000009645061728', '1e-05', '1'], ['45292', '-0.25', '', '0']]
+    assert float(rows[1][1]) == pytest.approx(duration, abs=1e-15)
+
+
+def test_progress_of_date_range(import_ical, tmp_path, monkeypatch):
+    lines = ['BEGIN:VCALENDAR']
+    for day in range(1, 29):
+        lines += ['BEGIN:VEVENT', 'UID:{}'.format(day), 'DTSTART:202402{:02d}T100000Z'.format(day), 'END:VEVENT']
+    calendar = tmp_path / 'calendar.ics'
+    calendar.write_text('\r\n'.join(lines + ['END:VCALENDAR']) + '\r\n')
+    totals = []
+
+    class Progress(import_ical.ImportProgress):
+        def __init__(self, ctx, doc, title, total, *args, **kwargs):
+            totals.append(total)
+            super().__init__(ctx, doc, title, total, *args, **kwargs)
+    monkeypatch.setattr(import_ical, 'ImportProgress', Progress)
+    sheet = FakeSheet()
+    importer = import_ical.IcalImporter(office_with(sheet), interactive=False)
+    date_range = import_ical.DateRange(date(2024, 2, 10), date(2024, 2, 14))
+    assert importer.fill_table(office_with(sheet), str(calendar), date_range)
+    uid = ATTRIBUTES.index('uid')
+    assert [sheet.row(r)[uid] for r in range(1, 7)] == ['10', '11', '12', '13', '14', '']
+    assert totals == [5]
@@ -0,0 +1,120 @@
+import os
+from datetime import date
+
+import pytest
+
+from icalreader import DateRange, EventIndex, MappedCalendar, open_indexed
+from icalreader import index as index_module
+from icalreader.index import file_key, index_path
+
+
+def calendar_lines(summary='Event'):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+    for i in range(3):
+        lines += ['BEGIN:VEVENT', 'UID:{}'.format(i), 'SUMMARY:{} {}'.format(summary, i),
+                  'DTSTART:2024030{}T100000Z'.format(i + 1), 'END:VEVENT']
+    return lines + ['END:VCALENDAR']
+
+
+def write(path, summary='Event'):
+    path.write_text('\r\n'.join(calendar_lines(summary)) + '\r\n')
+    return str(path)
+
+
+@pytest.fixture
+def calendar(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return write(tmp_path / 'calendar.ics')
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Counts how often an index is built by scanning a calendar."""
+    calls = []
+    build = EventIndex.build.__func__
+
+    def counting_build(cls, calendar, key):
+        calls.append(key)
+        return build(cls, calendar, key)
+    monkeypatch.setattr(EventIndex, 'build', classmethod(counting_build))
+    return calls
+
+
+def names(calendar):
+    with calendar:
+        return [dict(line.split(':', 1) for line in calendar.event_lines(i))['SUMMARY']
+                for i in range(len(calendar))]
+
+
+def test_index_is_reused(calendar, builds):
+    first, index = open_indexed(calendar)
+    first.close()
+    assert os.path.exists(index_path(calendar))
+    again, index = open_indexed(calendar)
+    assert len(builds) == 1
+    assert names(again) == ['Event 0', 'Event 1', 'Event 2']
+    assert index.uids == ['0', '1', '2']
+
+
+def test_index_is_rebuilt_after_modification(calendar, builds, tmp_path):
+    open_indexed(calendar)[0].close()
+    # the same size, but other content
+    write(tmp_path / 'calendar.ics', 'Party')
+    again, _index = open_indexed(calendar)
+    assert len(builds) == 2
+    assert names(again) == ['Party 0', 'Party 1', 'Party 2']
+
+
+def test_index_is_rebuilt_with_same_modification_time(calendar, builds, tmp_path):
+    stat = os.stat(calendar)
+    open_indexed(calendar)[0].close()
+    write(tmp_path / 'calendar.ics', 'Party')
+    os.utime(calendar, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.stat(calendar).st_size == stat.st_size
+    again, _index = open_indexed(calendar)
+    assert len(builds) == 2
+    assert names(again) == ['Party 0', 'Party 1', 'Party 2']
+
+
+def test_changes_in_the_middle_of_large_files(tmp_path, monkeypatch):
+    # only the beginning and the end of a file are hashed
+    monkeypatch.setattr(index_module, '_HASHED_BYTES', 16)
+    path = tmp_path / 'calendar.ics'
+    write(path)
+    key = file_key(str(path))
+    stat = os.stat(str(path))
+    write(path, 'Party')
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert file_key(str(path)) == key
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert file_key(str(path)) != key
+
+
+def test_unwritable_sidecar_falls_back_to_cache_dir(calendar, builds, tmp_path):
+    # a directory in place of the sidecar file can not be replaced by the index
+    os.mkdir(index_path(calendar))
+    open_indexed(calendar)[0].close()
+    cached = index_path(calendar, str(tmp_path / 'cache' / 'icalreader'))
+    assert os.path.isfile(cached)
+    assert os.listdir(index_path(calendar)) == []
+    assert sorted(os.listdir(str(tmp_path))) == ['cache', 'calendar.ics', 'calendar.ics.idx']
+    open_indexed(calendar)[0].close()
+    assert len(builds) == 1
+
+
+def test_corrupt_index_is_rebuilt(calendar, builds):
+    open_indexed(calendar)[0].close()
+    with open(index_path(calendar), 'w') as f:
+        f.write('{"version": ')
+    again, index = open_indexed(calendar)
+    again.close()
+    assert len(builds) == 2
+    assert len(index) == 3
+
+
+def test_index_is_like_scanning(calendar):
+    indexed, index = open_indexed(calendar)
+    with indexed, MappedCalendar(calendar) as scanned:
+        assert list(indexed.iter_components()) == list(scanned.iter_components())
+        assert list(index.select(DateRange(date(2024, 3, 2)))) == [1, 2]
+        assert list(index.select()) == [0, 1, 2]
@@ -0,0 +1,58 @@
+from icalreader import EncodedValues, ValueDictionary
+from icalreader.interning import MAX_VALUES
+
+
+def copy(text):
+    """Returns an equal string that is not the same object."""
+    return ''.join(list(text))
+
+
+def test_equal_values_are_shared():
+    dictionary = ValueDictionary()
+    first = dictionary.intern('location', copy('Room 1'))
+    second = dictionary.intern('location', copy('Room 1'))
+    assert second is first
+    categories = dictionary.intern('categories', (copy('A'), copy('B')))
+    assert dictionary.intern('categories', (copy('A'), copy('B'))) is categories
+
+
+def test_other_columns_are_not_kept():
+    dictionary = ValueDictionary()
+    name = copy('Meeting')
+    assert dictionary.intern('name', name) is name
+    assert dictionary.intern('location', None) is None
+    assert 'name' not in dictionary.values
+
+
+def test_dictionary_overflow():
+    dictionary = ValueDictionary()
+    kept = [dictionary.intern('location', 'Room {}'.format(i)) for i in range(MAX_VALUES)]
+    overflow = copy('Room {}'.format(MAX_VALUES))
+    assert dictionary.intern('location', overflow) is overflow
+    assert dictionary.intern('location', copy(overflow)) is not overflow
+    assert len(dictionary.values['location']) == MAX_VALUES
+    # values stored before the dictionary was full are still shared
+    assert dictionary.intern('location', copy('Room 0')) is kept[0]
+    assert dictionary.intern('location', copy('Room {}'.format(MAX_VALUES - 1))) is kept[-1]
+
+
+def test_intern_values():
+    dictionary = ValueDictionary(max_values=1)
+    first = dictionary.intern_values({'name': 'A', 'location': copy('Room')})
+    second = dictionary.intern_values({'name': 'B', 'location': copy('Room'), 'status': 'CONFIRMED'})
+    assert second['location'] is first['location']
+    assert second == {'name': 'B', 'location': 'Room', 'status': 'CONFIRMED'}
+
+
+def test_encoded_values_overflow():
+    calls = []
+
+    def encode(value):
+        calls.append(value)
+        return str(value).upper()
+    encoded = EncodedValues(encode, max_values=2)
+    assert [encoded.get('location', v) for v in ['a', 'b', 'a', 'c', 'c', 'b']] == ['A', 'B', 'A', 'C', 'C', 'B']
+    # the third distinct value does not fit and is encoded every time
+    assert calls == ['a', 'b', 'c', 'c']
+    assert [encoded.get('name', 'x') for _ in range(2)] == ['X', 'X']
+    assert calls[-2:] == ['x', 'x']
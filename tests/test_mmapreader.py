@@ -0,0 +1,92 @@
+from datetime import date
+
+import pytest
+
+from icalreader import DateRange, MappedCalendar, ParseError, count_calendars, iter_components, read_events
+from icalreader.stream import unfold_lines
+
+
+EVENTS = ['BEGIN:VEVENT', 'UID:1', 'SUMMARY:First', 'DTSTART:20240301T100000Z', 'END:VEVENT',
+          'Begin:VEvent', 'UID:2', 'SUMMARY:Second', 'DTSTART:20240310T100000Z', 'BEGIN:VALARM',
+          'TRIGGER:-PT15M', 'END:VALARM', 'End:VEvent']
+
+
+def write(path, lines, newline='\r\n', prefix=''):
+    path.write_bytes((prefix + newline.join(lines) + newline).encode('utf-8'))
+    return str(path)
+
+
+def lower_components(lines):
+    return [line.lower() if line.upper().startswith(('BEGIN:', 'END:')) else line for line in lines]
+
+
+def components(filename):
+    with MappedCalendar(filename) as calendar:
+        return list(calendar.iter_components())
+
+
+@pytest.mark.parametrize('lines', [
+    ['BEGIN:VCALENDAR', 'VERSION:2.0'] + EVENTS + ['END:VCALENDAR'],
+    lower_components(['BEGIN:VCALENDAR', 'VERSION:2.0'] + EVENTS + ['END:VCALENDAR']),
+])
+@pytest.mark.parametrize('newline', ['\r\n', '\n'])
+@pytest.mark.parametrize('prefix', ['', '﻿'])
+def test_like_stream(tmp_path, lines, newline, prefix):
+    path = write(tmp_path / 'calendar.ics', lines, newline, prefix)
+    with open(path, encoding='utf-8') as f:
+        expected = list(iter_components(unfold_lines(f)))
+    assert components(path) == expected
+    assert [name for name, _lines in expected] == ['VCALENDAR', 'VEVENT', 'VEVENT']
+
+
+def test_lower_case_events_are_read(tmp_path):
+    lines = lower_components(['BEGIN:VCALENDAR'] + EVENTS + ['END:VCALENDAR'])
+    path = write(tmp_path / 'calendar.ics', lines, prefix='﻿')
+    assert [r.uid for r in read_events(path, mapped=True)] == ['1', '2']
+    assert [r.uid for r in read_events(open(path, encoding='utf-8'))] == ['1', '2']
+    assert count_calendars(path) == 1
+
+
+def test_tokens_within_lines_are_ignored(tmp_path):
+    lines = ['BEGIN:VCALENDAR', 'BEGIN:VEVENT', 'UID:1', 'DESCRIPTION:Write BEGIN:VEVENT into', ' END:VEVENT',
+             'END:VEVENT', 'END:VCALENDAR']
+    path = write(tmp_path / 'calendar.ics', lines)
+    (name, event), = components(path)[1:]
+    assert name == 'VEVENT'
+    assert event == ['UID:1', 'DESCRIPTION:Write BEGIN:VEVENT intoEND:VEVENT']
+
+
+def test_multiple_calendars(tmp_path):
+    lines = ['BEGIN:VCALENDAR'] + EVENTS[:5] + ['END:VCALENDAR', 'begin:vcalendar'] + EVENTS[5:] + ['end:vcalendar']
+    path = write(tmp_path / 'calendar.ics', lines, prefix='﻿')
+    with MappedCalendar(path) as calendar:
+        assert calendar.calendar_count == 2
+        assert [calendar.calendar_of(i) for i in range(len(calendar))] == [0, 1]
+    assert count_calendars(path) == 2
+
+
+@pytest.mark.parametrize('content', ['', '\r\n\r\n', 'Not a calendar\r\n', 'BEGIN:VEVENT\r\nEND:VEVENT\r\n',
+                                     '﻿'])
+def test_files_without_calendar(tmp_path, content):
+    path = tmp_path / 'calendar.ics'
+    path.write_bytes(content.encode('utf-8'))
+    with pytest.raises(ParseError):
+        components(str(path))
+
+
+@pytest.mark.parametrize('lines', [
+    ['BEGIN:VCALENDAR', 'BEGIN:VEVENT', 'UID:1'],
+    ['BEGIN:VCALENDAR', 'BEGIN:VEVENT', 'UID:1', 'END:VEVENT'],
+    ['BEGIN:VCALENDAR', 'BEGIN:VCALENDAR', 'END:VCALENDAR', 'END:VCALENDAR'],
+])
+def test_invalid_structure(tmp_path, lines):
+    path = write(tmp_path / 'calendar.ics', lines)
+    with pytest.raises(ParseError):
+        components(path)
+
+
+def test_select(tmp_path):
+    path = write(tmp_path / 'calendar.ics', ['BEGIN:VCALENDAR'] + EVENTS + ['END:VCALENDAR'])
+    with MappedCalendar(path) as calendar:
+        assert list(calendar.select()) == [0, 1]
+        assert calendar.select(DateRange(date(2024, 3, 5))) == [1]
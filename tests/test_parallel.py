@@ -0,0 +1,89 @@
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from multiprocessing import spawn
+
+import pytest
+
+from icalreader import parallel
+from icalreader import (InterpreterContext, MappedCalendar, get_backend, read_events, read_events_parallel,
+                        read_files_parallel)
+
+
+def calendar_lines(offset, events):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0',
+             'BEGIN:VTIMEZONE', 'TZID:Custom/Zone', 'BEGIN:STANDARD', 'DTSTART:19700101T000000',
+             'TZOFFSETFROM:{}'.format(offset), 'TZOFFSETTO:{}'.format(offset), 'END:STANDARD', 'END:VTIMEZONE']
+    for i in range(events):
+        lines += ['BEGIN:VEVENT', 'UID:{}-{}'.format(offset, i), 'SUMMARY:Event {}'.format(i),
+                  'DTSTART;TZID=Custom/Zone:20240101T{:02d}0000'.format(i % 24), 'END:VEVENT']
+    return lines + ['END:VCALENDAR']
+
+
+@pytest.fixture
+def two_calendars(tmp_path):
+    path = tmp_path / 'two.ics'
+    path.write_text('\r\n'.join(calendar_lines('+0100', 7) + calendar_lines('+0500', 5)) + '\r\n')
+    return str(path)
+
+
+def summary(records):
+    return [(r.uid, r.begin.replace(tzinfo=None), r.begin.utcoffset(), r.calendar) for r in records]
+
+
+@pytest.mark.parametrize('backend', ['fast', 'icalendar', 'ics'])
+def test_read_components_with_resolved_timezones(backend):
+    pytest.importorskip({'fast': 'icalreader', 'icalendar': 'icalendar', 'ics': 'ics'}[backend])
+    backend = get_backend(backend)
+    lines = calendar_lines('+0500', 1)
+    timezones = backend.read_timezones([('VTIMEZONE', lines[3:9])])
+    event = [('VEVENT', lines[11:14])]
+    record, = backend.read_components(event, timezones=timezones, calendar=1)
+    assert record.begin.utcoffset() == timedelta(hours=5)
+    assert record.calendar == 1
+
+
+def test_parallel_like_sequential(two_calendars):
+    expected = summary(read_events(two_calendars))
+    assert [offset for _uid, _begin, offset, _index in expected] == [timedelta(hours=1)] * 7 + [timedelta(hours=5)] * 5
+    with MappedCalendar(two_calendars) as calendar:
+        assert summary(read_events_parallel(calendar, jobs=2, chunk_size=3)) == expected
+
+
+def test_chunks_are_submitted_ahead_within_bounds(two_calendars, monkeypatch):
+    submitted = []
+
+    class Pool(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            submitted.append(args)
+            return super().submit(fn, *args, **kwargs)
+    monkeypatch.setattr(parallel, 'ProcessPoolExecutor', Pool)
+    with MappedCalendar(two_calendars) as calendar:
+        records = read_events_parallel(calendar, jobs=2, chunk_size=1)
+        next(records)
+        assert len(submitted) == 2 * parallel.PENDING_CHUNKS_PER_JOB + 1
+        assert len(list(records)) == 11
+    assert len(submitted) == 12
+
+
+def test_files_parsed_with_an_interpreter_context(two_calendars):
+    previous = spawn.get_executable()
+    pool = ProcessPoolExecutor(2, mp_context=InterpreterContext(sys.executable))
+    (filename, records), = read_files_parallel([two_calendars], executor=pool)
+    assert filename == two_calendars
+    assert summary(records) == summary(read_events(two_calendars))
+    # the interpreter of multiprocessing is only set while starting a worker
+    assert spawn.get_executable() == previous
+
+
+def test_files_not_needed_are_not_parsed(two_calendars, monkeypatch):
+    parsed = []
+
+    def read_file(filename, *args):
+        parsed.append(filename)
+        return []
+    monkeypatch.setattr(parallel, '_read_file', read_file)
+    files = read_files_parallel([two_calendars] * 50, executor=ThreadPoolExecutor(1))
+    next(files)
+    files.close()
+    assert len(parsed) < 50
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from icalreader import serial_date, serial_dates, serial_duration, serial_durations
+from icalreader import serial as serial_module
+
+
+BERLIN = timezone(timedelta(hours=1))
+
+
+def dates(count):
+    values = [datetime(1899, 12, 30), datetime(1900, 3, 1, 12, tzinfo=timezone.utc), None,
+              datetime(2024, 2, 29, 23, 59, 59, 999999, tzinfo=BERLIN)]
+    values += [datetime(2024, 1, 1) + timedelta(days=i, seconds=i * 7, microseconds=i) for i in range(count)]
+    return values[:count]
+
+
+def durations(count):
+    values = [timedelta(0), None, timedelta(microseconds=1), -timedelta(minutes=15)]
+    values += [timedelta(hours=i, seconds=0.5 * i) for i in range(count)]
+    return values[:count]
+
+
+def test_serial_date():
+    assert serial_date(datetime(1899, 12, 30)) == 0
+    assert serial_date(datetime(1900, 1, 1, 12)) == 2.5
+    # the time is taken as shown, regardless of the timezone
+    assert serial_date(datetime(2024, 1, 1, tzinfo=BERLIN)) == serial_date(datetime(2024, 1, 1))
+
+
+def test_serial_duration():
+    assert serial_duration(timedelta(hours=6)) == 0.25
+
+
+@pytest.mark.parametrize('convert, values', [(serial_dates, dates), (serial_durations, durations)])
+def test_vectorized_like_plain(convert, values, monkeypatch):
+    pytest.importorskip('numpy')
+    # 63 values are converted in plain Python, 64 and more with NumPy
+    plain = convert(values(63), empty=None)
+    vectorized = convert(values(64), empty=None)
+    assert vectorized[:63] == plain
+    assert all(type(v) is float for v in vectorized if v is not None)
+    monkeypatch.setattr(serial_module, 'numpy', None)
+    assert convert(values(64), empty=None) == vectorized
+
+
+@pytest.mark.parametrize('count', [63, 64])
+def test_empty_values(count):
+    converted = serial_dates(dates(count))
+    assert converted[2] == ''
+    converted = serial_durations(durations(count))
+    assert converted[:2] == ['', '']
+    assert converted[3] == -15 / 1440
+
+
+@pytest.mark.parametrize('count', [63, 64])
+def test_without_empty_values(count):
+    values = [datetime(2024, 1, 1) + timedelta(hours=i) for i in range(count)]
+    assert serial_dates(values) == [serial_date(v) for v in values]
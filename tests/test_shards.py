@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from icalreader.shards import MAX_ROWS, MONTH, ROWS, YEAR, Sharding
+
+
+BERLIN = timezone(timedelta(hours=1))
+
+
+def event(begin=None):
+    return SimpleNamespace(begin=begin)
+
+
+def test_full_sheet():
+    sharding = Sharding()
+    record = event(datetime(2024, 1, 1))
+    assert {sharding.assign(record) for _ in range(MAX_ROWS)} == {('', 0)}
+    assert sharding.assign(record) == ('', 1)
+
+
+@pytest.mark.parametrize('max_rows', [1, 3])
+def test_split_by_rows(max_rows):
+    sharding = Sharding(ROWS, max_rows)
+    parts = [sharding.assign(event()) for _ in range(7)]
+    assert parts == [('', i // max_rows) for i in range(7)]
+
+
+@pytest.mark.parametrize('policy, expected', [
+    (YEAR, ['2023', '2023', '2024', '2024']),
+    (MONTH, ['2023-12', '2023-12', '2024-01', '2024-01']),
+])
+def test_turn_of_the_year(policy, expected):
+    sharding = Sharding(policy)
+    begins = [datetime(2023, 12, 31, 0, 0), datetime(2023, 12, 31, 23, 59, 59, tzinfo=timezone.utc),
+              datetime(2024, 1, 1, 0, 0),
+              # already 2024 as shown in the file, although still 2023 in UTC
+              datetime(2024, 1, 1, 0, 30, tzinfo=BERLIN)]
+    assert [sharding.assign(event(b)) for b in begins] == [(name, 0) for name in expected]
+
+
+def test_overflowing_month_is_split_by_rows():
+    sharding = Sharding(MONTH, 2)
+    begins = [datetime(2024, 1, 1), datetime(2024, 1, 31), datetime(2024, 2, 1), datetime(2024, 1, 15)]
+    assert [sharding.assign(event(b)) for b in begins] == [('2024-01', 0), ('2024-01', 0), ('2024-02', 0),
+                                                            ('2024-01', 1)]
+
+
+def test_events_without_begin():
+    sharding = Sharding(YEAR, 1)
+    assert [sharding.assign(event()) for _ in range(2)] == [(None, 0), (None, 1)]
+
+
+@pytest.mark.parametrize('policy, max_rows', [('week', MAX_ROWS), (ROWS, 0), (ROWS, MAX_ROWS + 1)])
+def test_invalid_settings(policy, max_rows):
+    with pytest.raises(ValueError):
+        Sharding(policy, max_rows)
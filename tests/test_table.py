@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from icalreader import EventRecord, EventTable, begin_order
+from icalreader import table as table_module
+
+
+BERLIN = timezone(timedelta(hours=1))
+NEW_YORK = timezone(timedelta(hours=-5))
+
+RECORDS = [
+    EventRecord(uid='late', name='Late', begin=datetime(2024, 3, 2, 9, tzinfo=NEW_YORK),
+                duration=timedelta(hours=1)),
+    EventRecord(uid='unplaced', name='Unplaced'),
+    EventRecord(uid='early', name='Early', begin=datetime(2024, 3, 2, 9, tzinfo=BERLIN),
+                end=datetime(2024, 3, 2, 10, tzinfo=BERLIN), duration=timedelta(hours=1)),
+    # the same instant as early, but shown in another timezone
+    EventRecord(uid='same', name='Same', begin=datetime(2024, 3, 2, 8, tzinfo=timezone.utc)),
+    EventRecord(uid='old', name='Early', begin=datetime(1999, 12, 31, 23, 59, 59, 999999, tzinfo=timezone.utc),
+                categories=('Old', 'Party'), alarms=(datetime(1999, 12, 31, tzinfo=timezone.utc),)),
+    EventRecord(uid='unplaced-2', name='Unplaced', duration=timedelta(0)),
+]
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    """Builds tables with NumPy or with the arrays of the standard library."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(table_module, 'numpy', None)
+    return request.param
+
+
+def build(records=RECORDS):
+    return EventTable.build(records, ['uid', 'name', 'begin', 'end', 'duration', 'categories', 'alarms'])
+
+
+def as_list(values):
+    return [int(v) for v in values]
+
+
+def test_sort_order(backend):
+    order = as_list(build().sort_order())
+    assert order == sorted(range(len(RECORDS)), key=lambda i: begin_order(RECORDS[i]))
+    assert [RECORDS[i].uid for i in order] == ['old', 'early', 'same', 'late', 'unplaced', 'unplaced-2']
+
+
+def test_sorted(backend):
+    table = build().sorted()
+    assert len(table) == len(RECORDS)
+    assert table.map_column('uid', str) == ['old', 'early', 'same', 'late', 'unplaced', 'unplaced-2']
+    # points in time are shown as in the file
+    assert table.map_column('begin', lambda v: v) == [
+        datetime(1999, 12, 31, 23, 59, 59, 999999), datetime(2024, 3, 2, 9), datetime(2024, 3, 2, 8),
+        datetime(2024, 3, 2, 9), None, None]
+
+
+def test_map_column_calls_function_once_per_value(backend):
+    calls = []
+
+    def marshal(value):
+        calls.append(value)
+        return str(value)
+    assert build().map_column('name', marshal) == ['Late', 'Unplaced', 'Early', 'Same', 'Early', 'Unplaced']
+    assert sorted(calls) == ['Early', 'Late', 'Same', 'Unplaced']
+    calls.clear()
+    assert build().map_column('duration', marshal) == ['1:00:00', 'None', '1:00:00', 'None', 'None', '0:00:00']
+    assert len(calls) == 3
+
+
+def test_tuples_are_kept(backend):
+    table = build()
+    assert table.map_column('categories', lambda v: v)[4] == ('Old', 'Party')
+    assert table.map_column('alarms', lambda v: v)[4] == RECORDS[4].alarms
+
+
+def test_empty_table(backend):
+    table = build([])
+    assert len(table) == 0
+    assert as_list(table.sort_order()) == []
+    assert table.sorted().map_column('begin', str) == []
+
+
+def test_parity():
+    pytest.importorskip('numpy')
+    vectorized = build()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(table_module, 'numpy', None)
+        plain = build()
+        plain_order = as_list(plain.sort_order())
+        plain_columns = {name: plain.sorted().map_column(name, repr) for name in plain.columns}
+    assert as_list(vectorized.sort_order()) == plain_order
+    assert {name: vectorized.sorted().map_column(name, repr) for name in vectorized.columns} == plain_columns